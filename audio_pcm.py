@@ -0,0 +1,86 @@
+import os
+import shutil
+import subprocess
+import threading
+from transcript_cache import audio_fingerprint
+
+SAMPLE_RATE = 16000
+PCM_SUFFIX = ".f32"
+DEFAULT_PCM_DIR = os.environ.get("YT_TRANSCRIBER_PCM_DIR",
+                                 os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "pcm"))
+DEFAULT_PCM_MB = int(os.environ.get("YT_TRANSCRIBER_PCM_MB", "4096"))
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+# -------------------------------------------------
+# Jednorazowe dekodowanie do surowego PCM 16 kHz mono float32
+# -------------------------------------------------
+# Plik .f32 to dokładnie to, czego oczekuje Whisper - model dostaje go jako
+# tablicę zmapowaną w pamięci (np.memmap), bez ponownego dekodowania przy
+# kolejnych przebiegach i w procesach dekodujących fragmenty.
+def is_pcm(path):
+    return str(path).endswith(PCM_SUFFIX)
+
+def pcm_duration(pcm_path):
+    return os.path.getsize(pcm_path) / 4 / SAMPLE_RATE
+
+def decode_to_pcm(audio_path, cache_dir=None, max_mb=None):
+    if is_pcm(audio_path):
+        return audio_path
+    cache_dir = cache_dir or DEFAULT_PCM_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    pcm_path = os.path.join(cache_dir, audio_fingerprint(audio_path) + PCM_SUFFIX)
+
+    with _locks_lock:
+        lock = _locks.setdefault(pcm_path, threading.Lock())
+    with lock:
+        if os.path.exists(pcm_path):
+            os.utime(pcm_path)
+            return pcm_path
+        tmp_path = f"{pcm_path}.{os.getpid()}.tmp"
+        try:
+            if shutil.which("ffmpeg"):
+                subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", audio_path, "-vn",
+                                "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", tmp_path], check=True)
+            else:
+                # Bez ffmpeg: dekoder PyAV dołączony do faster-whisper
+                from faster_whisper.audio import decode_audio
+                decode_audio(audio_path, sampling_rate=SAMPLE_RATE).astype("float32").tofile(tmp_path)
+            os.replace(tmp_path, pcm_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    prune_pcm_cache(cache_dir, DEFAULT_PCM_MB if max_mb is None else max_mb, keep=pcm_path)
+    return pcm_path
+
+def load_pcm(pcm_path, start=0, end=None):
+    # Widok na próbki [start, end) bez wczytywania całego pliku do RAM
+    import numpy as np
+    audio = np.memmap(pcm_path, dtype=np.float32, mode="r")
+    return audio[start:end]
+
+def prune_pcm_cache(cache_dir, max_mb, keep=None):
+    files = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(PCM_SUFFIX):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    limit = max_mb * 1024 * 1024
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+# -------------------------------------------------
+# Kalibracja ustawień dekodowania dla tego hosta
+# -------------------------------------------------
+# Krótki klip referencyjny jest transkrybowany dla każdej kombinacji
+# compute_type x cpu_threads x num_workers x beam_size. Wynik (latencja,
+# przepustowość, WER względem najdokładniejszego ustawienia) trafia do profilu
+# hosta; ModelManager stosuje wybrane ustawienia przy ładowaniu modelu.
+# Jawne zmienne FASTER_WHISPER_* mają pierwszeństwo przed profilem.
+
+PROFILE_VERSION = 1
+DEFAULT_TUNING_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "tuning")
+# FASTER_WHISPER_TUNING=0 wyłącza stosowanie profilu
+TUNING_ENABLED = os.environ.get("FASTER_WHISPER_TUNING", "1") != "0"
+TARGETS = ("throughput", "latency")
+DEFAULT_MAX_WER = 0.05
+COMPUTE_TYPES = {"cpu": ("int8", "int8_float32", "float32"), "cuda": ("int8_float16", "float16", "int8")}
+# Ustawienie wzorcowe (najdokładniejsze) - względem niego liczony jest WER kandydatów
+REFERENCE = {"cpu": {"compute_type": "float32", "beam_size": 5}, "cuda": {"compute_type": "float16", "beam_size": 5}}
+SETTINGS = ("compute_type", "cpu_threads", "num_workers", "beam_size")
+SAMPLE_RATE = 16000
+
+def machine_info():
+    return {"host": socket.gethostname(), "cpus": os.cpu_count(), "arch": platform.machine()}
+
+def profile_path():
+    host = re.sub(r"[^A-Za-z0-9_.-]", "_", socket.gethostname()) or "host"
+    return os.environ.get("FASTER_WHISPER_TUNING_FILE", os.path.join(DEFAULT_TUNING_DIR, f"{host}.json"))
+
+def profile_key(model, device):
+    return f"{model}:{device}"
+
+# -------------------------------------------------
+# Odczyt profilu (serwer, przy każdym ładowaniu modelu)
+# -------------------------------------------------
+_profile = {"path": None, "mtime": None, "data": None}
+_profile_lock = threading.Lock()
+
+def load_profile(path=None):
+    # Wczytany profil albo None; ponowny odczyt tylko po zmianie pliku
+    path = path or profile_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _profile_lock:
+        if _profile["path"] == path and _profile["mtime"] == mtime:
+            return _profile["data"]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        # Profil z innej maszyny (np. skopiowany katalog domowy) jest ignorowany
+        if data is not None and (data.get("version") != PROFILE_VERSION or data.get("machine") != machine_info()):
+            data = None
+        _profile.update(path=path, mtime=mtime, data=data)
+        return data
+
+def tuned_settings(model, device):
+    # {"compute_type", "cpu_threads", "num_workers", "beam_size"} z profilu albo {}
+    if not TUNING_ENABLED:
+        return {}
+    profile = load_profile()
+    if profile is None:
+        return {}
+    entry = profile.get("models", {}).get(profile_key(model, device))
+    return dict(entry["settings"]) if entry and entry.get("settings") else {}
+
+def save_profile(profile, path=None):
+    path = path or profile_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def empty_profile():
+    return {"version": PROFILE_VERSION, "machine": machine_info(), "models": {}}
+
+# -------------------------------------------------
+# Dokładność i wybór ustawień
+# -------------------------------------------------
+def normalize_words(text):
+    return re.findall(r"\w+", text.lower())
+
+def word_error_rate(reference, hypothesis):
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Odległość edycyjna na słowach, jeden wiersz tablicy naraz
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+def select_settings(results, target="throughput", max_wer=DEFAULT_MAX_WER):
+    # throughput: najwięcej sekund audio na sekundę przy num_workers zadaniach naraz;
+    # latency: najkrótszy pojedynczy przebieg. Zawsze w granicy max_wer - a gdy nic
+    # się nie mieści, najdokładniejsze ustawienie.
+    if target not in TARGETS:
+        raise ValueError(f"Nieznany cel: {target} (dostępne: {', '.join(TARGETS)})")
+    if not results:
+        return None
+    accurate = [r for r in results if r["wer"] <= max_wer]
+    if not accurate:
+        best = min(results, key=lambda r: (r["wer"], r["latency_seconds"]))
+    elif target == "throughput":
+        best = max(accurate, key=lambda r: (r["throughput"], -r["latency_seconds"]))
+    else:
+        best = min(accurate, key=lambda r: (r["latency_seconds"], -r["throughput"]))
+    return {name: best[name] for name in SETTINGS}
+
+# -------------------------------------------------
+# Pomiar
+# -------------------------------------------------
+def available_cpus():
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+def supported_compute_types(device):
+    preferred = COMPUTE_TYPES.get(device, COMPUTE_TYPES["cpu"])
+    try:
+        import ctranslate2
+        available = ctranslate2.get_supported_compute_types(device)
+    except Exception:
+        return list(preferred)
+    return [c for c in preferred if c in available]
+
+def candidate_grid(device, compute_types=None, threads=None, workers=None, beams=None):
+    cpus = available_cpus()
+    compute_types = compute_types or supported_compute_types(device)
+    # Na GPU liczba wątków CPU nie ma znaczenia (0 = domyślna)
+    threads = threads or ([0] if device == "cuda" else sorted({max(1, cpus // 4), max(1, cpus // 2), cpus}))
+    workers = workers or [1, 2]
+    beams = beams or [1, 2, 5]
+    return [dict(zip(SETTINGS, values)) for values in product(compute_types, threads, workers, beams)]
+
+def default_loader(model, device, compute_type, cpu_threads, num_workers):
+    from faster_whisper import WhisperModel
+    return WhisperModel(model, device=device, compute_type=compute_type, cpu_threads=cpu_threads,
+                        num_workers=num_workers)
+
+def transcribe_text(whisper_model, audio, beam_size, language):
+    segments, info = whisper_model.transcribe(audio, beam_size=beam_size, language=language)
+    return "".join(seg.text for seg in segments), info
+
+def measure(whisper_model, audio, beam_size, language, parallel=1, repeat=2):
+    # (tekst, mediana latencji pojedynczego przebiegu, przepustowość w s audio / s)
+    clip_seconds = len(audio) / SAMPLE_RATE
+    text, _ = transcribe_text(whisper_model, audio, beam_size, language)  # rozgrzewka
+    latencies = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        transcribe_text(whisper_model, audio, beam_size, language)
+        latencies.append(time.perf_counter() - start)
+    latency = statistics.median(latencies)
+    if parallel <= 1:
+        return text, latency, clip_seconds / latency
+    # num_workers > 1 ma sens tylko przy równoległych wywołaniach - tak jak w puli serwera
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda _: transcribe_text(whisper_model, audio, beam_size, language), range(parallel)))
+        wall = time.perf_counter() - start
+    return text, latency, parallel * clip_seconds / wall
+
+def calibrate(model, device, audio, grid, language=None, repeat=2, loader=None, on_result=None):
+    # Zwraca {"reference": {...}, "results": [...]}; model ładowany raz na (compute_type, wątki, num_workers)
+    loader = loader or default_loader
+    clip_seconds = len(audio) / SAMPLE_RATE
+    reference = REFERENCE.get(device, REFERENCE["cpu"])
+    whisper_model = loader(model, device, reference["compute_type"], 0, 1)
+    reference_text, info = transcribe_text(whisper_model, audio, reference["beam_size"], language)
+    # Język wykrywany raz - wszystkie kandydaty dekodują w tych samych warunkach
+    language = language or info.language
+    del whisper_model
+
+    results = []
+    grid = sorted(grid, key=lambda s: (s["compute_type"], s["cpu_threads"], s["num_workers"], s["beam_size"]))
+    loaded_key = None
+    whisper_model = None
+    for settings in grid:
+        key = (settings["compute_type"], settings["cpu_threads"], settings["num_workers"])
+        try:
+            if key != loaded_key:
+                whisper_model = None
+                start = time.perf_counter()
+                whisper_model = loader(model, device, *key)
+                load_seconds = time.perf_counter() - start
+                loaded_key = key
+            text, latency, throughput = measure(whisper_model, audio, settings["beam_size"], language,
+                                                settings["num_workers"], repeat)
+        except Exception as e:
+            # Np. compute_type nieobsługiwany przez to urządzenie - kandydat pomijany
+            loaded_key = None
+            if on_result:
+                on_result({**settings, "error": str(e)})
+            continue
+        result = {**settings, "latency_seconds": round(latency, 4), "throughput": round(throughput, 4),
+                  "rtf": round(latency / clip_seconds, 4), "wer": round(word_error_rate(reference_text, text), 4),
+                  "load_seconds": round(load_seconds, 2)}
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return {"reference": {**reference, "language": language, "clip_seconds": round(clip_seconds, 2),
+                          "text": reference_text}, "results": results}
+
+def load_clip(path, seconds):
+    from audio_pcm import decode_to_pcm, load_pcm
+    return load_pcm(decode_to_pcm(path), 0, int(seconds * SAMPLE_RATE))
+
+# -------------------------------------------------
+# CLI: python autotune.py calibrate --clip mowa.wav --models small,large-v3 | select --target latency | show
+# -------------------------------------------------
+def parse_list(value, cast=str):
+    return [cast(v.strip()) for v in value.split(",") if v.strip()] if value else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kalibracja ustawień Faster-Whisper dla tego hosta")
+    parser.add_argument("--profile", default=None, help="plik profilu (domyślnie FASTER_WHISPER_TUNING_FILE "
+                                                        "albo ~/.cache/yt_transcriber/tuning/HOST.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    calibrate_cmd = sub.add_parser("calibrate", help="zmierz ustawienia i zapisz profil")
+    calibrate_cmd.add_argument("--clip", required=True, help="nagranie z mową (używane pierwsze --seconds sekund)")
+    calibrate_cmd.add_argument("--seconds", type=float, default=30.0)
+    calibrate_cmd.add_argument("--models", default="small", help="warianty, np. small,large-v3")
+    calibrate_cmd.add_argument("--device", default="cpu", choices=("cpu", "cuda"))
+    calibrate_cmd.add_argument("--language", default=None)
+    calibrate_cmd.add_argument("--compute-types", default=None, help="np. int8,float32 (domyślnie obsługiwane)")
+    calibrate_cmd.add_argument("--threads", default=None, help="np. 4,8,16 (domyślnie 1/4, 1/2 i wszystkie rdzenie)")
+    calibrate_cmd.add_argument("--workers", default="1,2", help="num_workers, np. 1,2")
+    calibrate_cmd.add_argument("--beams", default="1,2,5", help="beam_size, np. 1,5")
+    calibrate_cmd.add_argument("--repeat", type=int, default=2)
+    for cmd in (calibrate_cmd, sub.add_parser("select", help="wybierz ponownie z zapisanych pomiarów")):
+        cmd.add_argument("--target", default="throughput", choices=TARGETS)
+        cmd.add_argument("--max-wer", type=float, default=DEFAULT_MAX_WER,
+                         help="dopuszczalny WER względem ustawienia wzorcowego")
+    sub.add_parser("show", help="pokaż profil")
+    args = parser.parse_args(argv)
+
+    path = args.profile or profile_path()
+    profile = load_profile(path) or empty_profile()
+    if args.command == "show":
+        print(json.dumps({"path": path, **profile}, ensure_ascii=False, indent=2))
+        return 0
+
+    if args.command == "calibrate":
+        audio = load_clip(args.clip, args.seconds)
+        grid = candidate_grid(args.device, parse_list(args.compute_types), parse_list(args.threads, int),
+                              parse_list(args.workers, int), parse_list(args.beams, int))
+
+        def report(result):
+            settings = " ".join(f"{name}={result[name]}" for name in SETTINGS)
+            if "error" in result:
+                print(f"  {settings}: błąd: {result['error']}", file=sys.stderr)
+            else:
+                print(f"  {settings}: {result['latency_seconds']:.2f} s, {result['throughput']:.1f}x, "
+                      f"WER {result['wer']:.3f}")
+
+        for model in parse_list(args.models):
+            print(f"{model} ({args.device}): {len(grid)} ustawień")
+            measured = calibrate(model, args.device, audio, grid, args.language, args.repeat, on_result=report)
+            profile["models"][profile_key(model, args.device)] = {**measured, "updated": time.time()}
+
+    for entry in profile["models"].values():
+        entry["settings"] = select_settings(entry["results"], args.target, args.max_wer)
+        entry["target"] = args.target
+        entry["max_wer"] = args.max_wer
+    for key, entry in profile["models"].items():
+        print(f"{key}: {entry['settings']}")
+    print(f"Profil zapisany: {save_profile(profile, path)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
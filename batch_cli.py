@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from download_manager import DOWNLOAD_PARALLEL, FRAGMENT_PARALLEL, shared_downloads
+from transcriber_core import base_path, downloads_dir, TranscriptionJob, start_faster_server, stop_faster_server
+from transcript_cache import TranscriptCache, youtube_video_id
+
+# Tryb wsadowy bez GUI (bez importu Qt):
+#   python batch_cli.py URL|PLIK|KATALOG ... [--list lista.txt] [--formats txt,srt]
+# Pobieranie, transkrypcja i eksport działają jako osobne etapy połączone
+# ograniczonymi kolejkami - pobieranie pliku N+1 trwa w czasie transkrypcji pliku N.
+
+MEDIA_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".mkv", ".avi", ".mov"}
+ENGINES = {"local": "Faster-Whisper (lokalny)", "openai": "OpenAI (online)"}
+STOP = object()
+
+# -------------------------------------------------
+# Wejście: adresy, playlisty, pliki i katalogi
+# -------------------------------------------------
+def read_list(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def expand_playlist(url, downloads=None, mode="mp3"):
+    # Pojedynczy film YouTube nie wymaga zapytania o metadane, adres znany z indeksu pobrań też nie
+    if youtube_video_id(url) and "list=" not in url:
+        return [url]
+    if downloads is not None and downloads.lookup(url, mode) is not None:
+        return [url]
+    import yt_dlp
+    with yt_dlp.YoutubeDL({"extract_flat": "in_playlist", "quiet": True, "no_warnings": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    entries = (info or {}).get("entries")
+    if not entries:
+        return [url]
+    urls = []
+    for entry in entries:
+        entry_url = entry and (entry.get("webpage_url") or entry.get("url"))
+        if entry_url:
+            urls.append(entry_url)
+    return urls
+
+def expand_inputs(inputs, downloads=None, mode="mp3"):
+    # Zwraca (źródła, błędy) - nieosiągalny lub nieobsługiwany adres nie przerywa całej partii
+    sources, errors = [], []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS:
+                        sources.append(os.path.abspath(os.path.join(root, name)))
+        elif os.path.isfile(item):
+            sources.append(os.path.abspath(item))
+        else:
+            try:
+                sources.extend(expand_playlist(item, downloads, mode))
+            except Exception as e:
+                errors.append((item, str(e)))
+    # Kolejność zachowana, duplikaty pominięte
+    return list(dict.fromkeys(sources)), errors
+
+# -------------------------------------------------
+# Manifest (wznawianie przerwanych partii)
+# -------------------------------------------------
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"items": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def get(self, source):
+        with self._lock:
+            return dict(self.data["items"].get(source, {}))
+
+    def update(self, source, **fields):
+        with self._lock:
+            self.data["items"].setdefault(source, {}).update(fields)
+            self._save()
+
+    def set_summary(self, summary):
+        with self._lock:
+            self.data["summary"] = summary
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+# -------------------------------------------------
+# Etapy potoku
+# -------------------------------------------------
+class BatchItem:
+    def __init__(self, index, source, job):
+        self.index = index
+        self.source = source
+        self.job = job
+        self.error = None
+
+class Pipeline:
+    def __init__(self, manifest, total, verbose=False):
+        self.manifest = manifest
+        self.total = total
+        self.verbose = verbose
+        self.busy = {}
+        self.failed = 0
+        self.done = 0
+        self.from_cache = 0
+        self.audio_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def log(self, item, message):
+        print(f"[{item.index}/{self.total}] {message}", flush=True)
+
+    def start_stage(self, name, fn, workers, inbox, outbox):
+        def worker():
+            while True:
+                item = inbox.get()
+                if item is STOP:
+                    inbox.put(STOP)  # dla pozostałych wątków etapu
+                    return
+                start = time.perf_counter()
+                try:
+                    fn(item)
+                except Exception as e:
+                    item.error = f"{name}: {e}"
+                    self.log(item, f"Błąd ({name}): {e}")
+                    self.manifest.update(item.source, status="failed", error=item.error)
+                    item.job.finish(error=item.error)
+                    with self._lock:
+                        self.failed += 1
+                    continue
+                finally:
+                    with self._lock:
+                        self.busy[name] = self.busy.get(name, 0.0) + time.perf_counter() - start
+                if outbox is not None:
+                    outbox.put(item)
+
+        threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for t in threads:
+            t.start()
+
+        def closer():
+            for t in threads:
+                t.join()
+            if outbox is not None:
+                outbox.put(STOP)
+
+        closing = threading.Thread(target=closer, name=f"{name}-closer", daemon=True)
+        closing.start()
+        return closing
+
+    def download(self, item):
+        item.job.prepare()
+        self.manifest.update(item.source, status="downloaded", audio_path=item.job.audio_path,
+                             base_name=item.job.base_name)
+        self.log(item, f"Pobrano: {item.job.base_name}")
+
+    def transcribe(self, item):
+        cached = item.job.cached is not None
+        item.job.transcribe_source()
+        seconds = item.job.audio_seconds()
+        with self._lock:
+            self.audio_seconds += seconds
+            self.from_cache += cached
+        self.manifest.update(item.source, status="transcribed", audio_seconds=seconds, cached=cached)
+        self.log(item, f"Transkrypcja gotowa ({seconds / 60:.1f} min audio{', z pamięci podręcznej' if cached else ''})")
+
+    def export(self, item):
+        outputs = item.job.export()
+        self.manifest.update(item.source, status="done", outputs=outputs, error=None)
+        item.job.finish()
+        with self._lock:
+            self.done += 1
+        self.log(item, f"Zapisano: {', '.join(os.path.basename(p) for p in outputs)}")
+
+# -------------------------------------------------
+# Start
+# -------------------------------------------------
+def load_openai_key(explicit):
+    if explicit:
+        return explicit
+    if os.environ.get("OPENAI_API_KEY"):
+        return os.environ["OPENAI_API_KEY"]
+    path = os.path.join(base_path, "openai_api_key.txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    return ""
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Wsadowa transkrypcja adresów URL, playlist i plików bez GUI")
+    parser.add_argument("inputs", nargs="*", help="adresy URL, playlisty, pliki lub katalogi z multimediami")
+    parser.add_argument("--list", action="append", default=[], help="plik z listą adresów/ścieżek (jeden w wierszu)")
+    parser.add_argument("--out", default=downloads_dir, help="katalog wyjściowy")
+    parser.add_argument("--formats", default="txt,srt", help="formaty zapisu: txt,docx,srt,html,vtt,json")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="local", help="silnik transkrypcji")
+    parser.add_argument("--variant", default="small", help="wariant Whispera (silnik local)")
+    parser.add_argument("--device", default="cpu", choices=["cpu", "cuda"])
+    parser.add_argument("--translate", action="store_true", help="transkrypcja + tłumaczenie (OpenAI)")
+    parser.add_argument("--openai-key", default=None)
+    parser.add_argument("--parallel-chunks", type=int, default=0,
+                        help="długie nagrania: liczba procesów dekodujących fragmenty równolegle (0 = wyłączone)")
+    parser.add_argument("--pcm", action="store_true",
+                        help="bez konwersji do MP3: oryginalne audio dekodowane raz do PCM 16 kHz (pamięć podręczna)")
+    parser.add_argument("--draft", default=None, metavar="MODEL",
+                        help="najpierw szybki szkic małym modelem (np. base) w plikach *.draft.*, potem dokładny wynik")
+    parser.add_argument("--keep-server", action="store_true",
+                        help="zostaw serwer Faster-Whisper w tle (kolejne uruchomienia użyją go ponownie)")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_PARALLEL,
+                        help="równoległe pobierania (ponowne adresy są brane z indeksu OUT/index.sqlite)")
+    parser.add_argument("--fragments", type=int, default=FRAGMENT_PARALLEL,
+                        help="fragmenty HLS/DASH pobierane równolegle w ramach jednego pliku")
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--export-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=2, help="pojemność kolejek między etapami")
+    parser.add_argument("--manifest", default=None, help="plik manifestu (domyślnie OUT/batch_manifest.json)")
+    parser.add_argument("--no-resume", action="store_true", help="przetwórz ponownie pozycje oznaczone jako gotowe")
+    parser.add_argument("-v", "--verbose", action="store_true", help="wypisuj komunikaty postępu i segmenty")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    inputs = list(args.inputs)
+    for path in args.list:
+        inputs.extend(read_list(path))
+    if not inputs:
+        print("Podaj adresy URL, pliki lub katalogi (albo --list).", file=sys.stderr)
+        return 2
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    os.makedirs(args.out, exist_ok=True)
+    manifest = Manifest(args.manifest or os.path.join(args.out, "batch_manifest.json"))
+    downloads = shared_downloads(args.out, args.download_workers, args.fragments)
+    sources, errors = expand_inputs(inputs, downloads, "original" if args.pcm else "mp3")
+    total = len(sources) + len(errors)
+    pipeline = Pipeline(manifest, total, verbose=args.verbose)
+    for source, error in errors:
+        print(f"Błąd (playlist): {source}: {error}", file=sys.stderr, flush=True)
+        manifest.update(source, status="failed", error=f"playlist: {error}")
+    pipeline.failed = len(errors)
+    cache = TranscriptCache()
+    openai_key = load_openai_key(args.openai_key)
+    transcription_model = ENGINES[args.engine]
+    translation_model = "OpenAI (ASR+ST)" if args.translate else "Brak"
+
+    items = []
+    skipped = 0
+    for index, source in enumerate(sources, start=1):
+        state = manifest.get(source)
+        if state.get("status") == "done" and not args.no_resume:
+            skipped += 1
+            continue
+        # Wznowienie: plik pobrany w poprzednim przebiegu nie jest pobierany ponownie,
+        # ale adres zostaje (id filmu i źródło w wynikach oraz w indeksie wyszukiwania)
+        url = None if os.path.isfile(source) else source
+        local_file = None if url else source
+        if url and state.get("audio_path") and os.path.exists(state["audio_path"]):
+            local_file = state["audio_path"]
+        item = BatchItem(index, source, None)
+
+        def status(message, item=item):
+            if pipeline.verbose:
+                pipeline.log(item, message)
+
+        item.job = TranscriptionJob(url, local_file, transcription_model, args.variant,
+                                    translation_model, args.device, None, None, formats, openai_key,
+                                    out_dir=args.out, status=status, cache=cache,
+                                    parallel_chunks=args.parallel_chunks, pcm_pipeline=args.pcm,
+                                    draft_model=args.draft)
+        items.append(item)
+        manifest.update(source, status="queued")
+
+    print(f"Pozycji: {total}, do przetworzenia: {len(items)}, pominięte (gotowe): {skipped}", flush=True)
+    started = time.perf_counter()
+    if items and args.engine == "local" and not args.translate:
+        start_faster_server(daemon=args.keep_server or None)
+
+    try:
+        fetches = queue.Queue()
+        transcriptions = queue.Queue(maxsize=args.queue_size)
+        exports = queue.Queue(maxsize=args.queue_size)
+        stages = [
+            pipeline.start_stage("download", pipeline.download, args.download_workers, fetches, transcriptions),
+            pipeline.start_stage("transcribe", pipeline.transcribe, args.transcribe_workers, transcriptions, exports),
+            pipeline.start_stage("export", pipeline.export, args.export_workers, exports, None),
+        ]
+        for item in items:
+            fetches.put(item)
+        fetches.put(STOP)
+        for stage in stages:
+            stage.join()
+    finally:
+        stop_faster_server()
+
+    wall = time.perf_counter() - started
+    summary = {
+        "items": total,
+        "done": pipeline.done,
+        "failed": pipeline.failed,
+        "skipped": skipped,
+        "from_cache": pipeline.from_cache,
+        "downloads": dict(downloads.stats),
+        "audio_seconds": round(pipeline.audio_seconds, 1),
+        "wall_seconds": round(wall, 1),
+        "realtime_factor": round(pipeline.audio_seconds / wall, 2) if wall else 0.0,
+        "items_per_minute": round(pipeline.done / wall * 60, 2) if wall else 0.0,
+        "stage_busy_seconds": {name: round(value, 1) for name, value in pipeline.busy.items()},
+    }
+    manifest.set_summary(summary)
+    print("== Podsumowanie ==")
+    print(f"Gotowe: {summary['done']}, błędy: {summary['failed']}, pominięte: {skipped}, "
+          f"z pamięci podręcznej: {summary['from_cache']}")
+    print(f"Audio: {summary['audio_seconds'] / 3600:.2f} h w {summary['wall_seconds']:.1f} s "
+          f"({summary['realtime_factor']}x czasu rzeczywistego, {summary['items_per_minute']} poz./min)")
+    print(f"Pobrane: {downloads.stats['downloads']}, z dysku (indeks pobrań): {downloads.stats['hits']}")
+    print("Czas pracy etapów: " + ", ".join(f"{k} {v} s" for k, v in summary["stage_busy_seconds"].items()))
+    return 1 if pipeline.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,710 @@
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Benchmark potoku transkrypcji - działa offline, na wygenerowanym audio
+# i z atrapą WhisperModel zamiast prawdziwego modelu:
+#   python benchmark.py --output wyniki.json
+#   python benchmark.py --compare poprzednie.json --output wyniki.json
+#   python benchmark.py --real-model small      (model pobrany lokalnie)
+
+SAMPLE_RATE = 16000
+
+# -------------------------------------------------
+# Syntetyczne audio
+# -------------------------------------------------
+def synth_samples(kind, seconds, seed=0):
+    rng = random.Random(seed)
+    total = int(seconds * SAMPLE_RATE)
+    if kind == "tone":
+        return (0.3 * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE) for i in range(total))
+    if kind == "noise":
+        return (rng.uniform(-0.2, 0.2) for _ in range(total))
+
+    # "speech": sylaby (nośna 120-250 Hz z obwiednią) przedzielone pauzami
+    def speech():
+        produced = 0
+        while produced < total:
+            syllable = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+            pitch = rng.uniform(120, 250)
+            for i in range(min(syllable, total - produced)):
+                envelope = math.sin(math.pi * i / syllable)
+                yield 0.4 * envelope * (math.sin(2 * math.pi * pitch * i / SAMPLE_RATE)
+                                        + 0.3 * math.sin(4 * math.pi * pitch * i / SAMPLE_RATE))
+            produced += syllable
+            pause = int(rng.choice((0.05, 0.08, 0.1, 0.6)) * SAMPLE_RATE)
+            for _ in range(min(pause, max(0, total - produced))):
+                yield 0.0
+            produced += pause
+    return speech()
+
+def write_wav(path, kind, seconds, seed=0):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        block = []
+        for sample in synth_samples(kind, seconds, seed):
+            block.append(int(max(-1.0, min(1.0, sample)) * 32767))
+            if len(block) >= SAMPLE_RATE:
+                w.writeframes(struct.pack(f"<{len(block)}h", *block))
+                block = []
+        if block:
+            w.writeframes(struct.pack(f"<{len(block)}h", *block))
+    return path
+
+def audio_seconds(audio):
+    if hasattr(audio, "shape"):
+        return audio.shape[0] / SAMPLE_RATE
+    audio = str(audio)
+    if audio.endswith(".wav"):
+        with wave.open(audio, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    if audio.endswith(".f32"):
+        return os.path.getsize(audio) / 4 / SAMPLE_RATE
+    return os.path.getsize(audio) / 16000  # ~128 kbps
+
+# -------------------------------------------------
+# Atrapa WhisperModel
+# -------------------------------------------------
+class StubWhisperModel:
+    # Zwraca segment co segment_seconds audio i "dekoduje" z zadanym współczynnikiem
+    # czasu rzeczywistego (rtf = czas dekodowania / czas audio)
+    def __init__(self, rtf=0.01, segment_seconds=5.0, load_seconds=0.0):
+        self.rtf = rtf
+        self.segment_seconds = segment_seconds
+        time.sleep(load_seconds)
+
+    def transcribe(self, audio, language=None, **kwargs):
+        duration = audio_seconds(audio)
+        info = SimpleNamespace(duration=duration, language=language or "en", language_probability=1.0)
+
+        def segments():
+            start = 0.0
+            index = 0
+            while start < duration:
+                end = min(duration, start + self.segment_seconds)
+                time.sleep((end - start) * self.rtf)
+                index += 1
+                yield SimpleNamespace(start=start, end=end, text=f" Segment numer {index} z tekstem testowym.")
+                start = end
+        return segments(), info
+
+def stub_loader(rtf):
+    return lambda model, device, compute_type: StubWhisperModel(rtf)
+
+def stub_segments(count, seconds=4.0):
+    return [{"start": i * seconds, "end": (i + 1) * seconds,
+             "text": f" Segment {i} <z> & znakami \"specjalnymi\" oraz dłuższym tekstem do eksportu."}
+            for i in range(count)]
+
+# -------------------------------------------------
+# Pomiary
+# -------------------------------------------------
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def summarize(latencies):
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 4),
+            "p50": round(pick(0.5), 4), "p95": round(pick(0.95), 4), "max": round(ordered[-1], 4)}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ServerUnderTest:
+    # faster_server uruchomiony w tym samym procesie, z atrapą (lub prawdziwym) modelem
+    def __init__(self, rtf, real_model=False, allowed_dir=None):
+        os.environ.setdefault("FASTER_WHISPER_CACHE", "0")
+        os.environ.setdefault("FASTER_WHISPER_MAX_QUEUE", "64")
+        import uvicorn
+        import faster_server
+        if not real_model:
+            faster_server.models.loader = stub_loader(rtf)
+        if allowed_dir:
+            # Pliki testowe leżą w katalogu tymczasowym - poza domyślną listą katalogów dla "path"
+            faster_server.ALLOWED_DIRS = [os.path.realpath(allowed_dir)]
+        self.module = faster_server
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(faster_server.app, host="127.0.0.1", port=self.port,
+                                                    log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+def post_transcribe(url, audio_path, model, use_path):
+    import requests
+    data = {"model": model, "device": "cpu"}
+    start = time.perf_counter()
+    if use_path:
+        r = requests.post(f"{url}/transcribe", data={**data, "path": os.path.abspath(audio_path)})
+    else:
+        with open(audio_path, "rb") as f:
+            r = requests.post(f"{url}/transcribe", files={"file": f}, data=data)
+    return time.perf_counter() - start, r.status_code
+
+def timed_ok(url, audio_path, model, use_path):
+    # Czas udanego żądania - odrzucone (403, 429...) nie mogą trafić do wyników jako pomiar
+    latency, status = post_transcribe(url, audio_path, model, use_path)
+    if status != 200:
+        raise RuntimeError(f"/transcribe ({'path' if use_path else 'upload'}) zwrócił HTTP {status}")
+    return latency
+
+def time_to_first_segment(url, audio_path, model):
+    import requests
+    start = time.perf_counter()
+    first = None
+    with requests.post(f"{url}/transcribe/stream", data={"model": model, "device": "cpu",
+                                                         "path": os.path.abspath(audio_path)}, stream=True) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"/transcribe/stream zwrócił HTTP {r.status_code}")
+        for line in r.iter_lines():
+            if line and first is None and json.loads(line).get("type") == "segment":
+                first = time.perf_counter() - start
+    if first is None:
+        raise RuntimeError("/transcribe/stream nie zwrócił żadnego segmentu")
+    return first, time.perf_counter() - start
+
+def bench_server(workdir, durations, clients_list, requests_per_client, rtf, model, real_model):
+    results = {}
+    with ServerUnderTest(rtf, real_model, allowed_dir=workdir) as server:
+        for seconds in durations:
+            audio = write_wav(os.path.join(workdir, f"speech_{seconds:g}s.wav"), "speech", seconds)
+            timed_ok(server.url, audio, model, True)  # załadowanie modelu poza pomiarem
+            entry = {}
+
+            ttfs, total = time_to_first_segment(server.url, audio, model)
+            entry["time_to_first_segment"] = round(ttfs, 4)
+            entry["stream_total"] = round(total, 4)
+
+            via_path = [timed_ok(server.url, audio, model, True) for _ in range(3)]
+            via_upload = [timed_ok(server.url, audio, model, False) for _ in range(3)]
+            entry["upload_overhead"] = round(min(via_upload) - min(via_path), 4)
+            entry["file_mb"] = round(os.path.getsize(audio) / 1e6, 2)
+
+            for clients in clients_list:
+                latencies, statuses = [], []
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=clients) as executor:
+                    futures = [executor.submit(post_transcribe, server.url, audio, model, True)
+                               for _ in range(clients * requests_per_client)]
+                    for future in futures:
+                        latency, status = future.result()
+                        statuses.append(status)
+                        if status == 200:
+                            latencies.append(latency)
+                wall = time.perf_counter() - start
+                entry[f"clients_{clients}"] = {
+                    "latency": summarize(latencies),
+                    "throughput_rps": round(len(latencies) / wall, 3),
+                    "audio_seconds_per_second": round(len(latencies) * seconds / wall, 2),
+                    "rejected": sum(1 for s in statuses if s in (429, 503)),
+                    "errors": sum(1 for s in statuses if s not in (200, 429, 503)),
+                }
+            results[f"{seconds:g}s"] = entry
+        results["queue"] = server.module.pool.snapshot()
+        results["models"] = server.module.models.snapshot()["stats"]
+    return results
+
+def bench_exporters(workdir, segment_counts):
+    from exporters import open_sinks, save_txt, save_docx, save_html, save_srt, save_vtt, save_json
+    results = {}
+    for count in segment_counts:
+        segments = stub_segments(count)
+        text = " ".join(seg["text"].strip() for seg in segments)
+        entry = {}
+        for name, fn, arg in (("txt", save_txt, text), ("docx", save_docx, text),
+                              ("html", save_html, text), ("srt", save_srt, segments),
+                              ("vtt", save_vtt, segments), ("json", save_json, segments)):
+            path = os.path.join(workdir, f"export_{count}.{name}")
+            start = time.perf_counter()
+            fn(arg, path)
+            entry[name] = {"seconds": round(time.perf_counter() - start, 4),
+                           "bytes": os.path.getsize(path) if os.path.exists(path) else 0}
+        # Wszystkie formaty naraz, segment po segmencie (tak jak w trakcie transkrypcji)
+        start = time.perf_counter()
+        sink = open_sinks(["txt", "docx", "html", "srt", "vtt", "json"], os.path.join(workdir, f"single_pass_{count}"))
+        sink.write_all(stub_segments(count))
+        sink.close()
+        entry["single_pass_all"] = {"seconds": round(time.perf_counter() - start, 4)}
+        results[f"{count}_segments"] = entry
+    return results
+
+# -------------------------------------------------
+# Reprezentacja segmentów: JSON (lista słowników) a SegmentStore (binarnie)
+# -------------------------------------------------
+def traced(fn, *args):
+    # (wynik, sekundy, szczytowa pamięć MB) - pamięć liczona przez tracemalloc, bez samego wejścia
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, round(seconds, 4), round(peak / 1e6, 2)
+
+def bench_segments(workdir, segment_counts):
+    from exporters import save_srt
+    from segment_store import SegmentStore
+    results = {}
+    for count in segment_counts:
+        segments = stub_segments(count)
+        text = " ".join(seg["text"].strip() for seg in segments)
+        as_json = json.dumps({"text": text, "segments": segments}, ensure_ascii=False).encode("utf-8")
+        as_binary = SegmentStore.from_dicts(segments).to_bytes()
+        parsed, json_seconds, json_peak = traced(json.loads, as_json)
+        (store, _), binary_seconds, binary_peak = traced(SegmentStore.from_bytes, as_binary)
+        _, build_seconds, _ = traced(SegmentStore.from_dicts, segments)
+        entry = {
+            "json": {"bytes": len(as_json), "parse_seconds": json_seconds, "parse_peak_mb": json_peak},
+            "binary": {"bytes": len(as_binary), "parse_seconds": binary_seconds, "parse_peak_mb": binary_peak},
+            "store_build_seconds": build_seconds,
+        }
+        for name, data in (("json", parsed["segments"]), ("binary", store)):
+            path = os.path.join(workdir, f"segments_{name}_{count}.srt")
+            start = time.perf_counter()
+            save_srt(data, path)
+            entry[name]["srt_seconds"] = round(time.perf_counter() - start, 4)
+        results[f"{count}_segments"] = entry
+    return results
+
+# -------------------------------------------------
+# Indeks wyszukiwania fraz
+# -------------------------------------------------
+def synth_vocabulary(size, seed=0):
+    rng = random.Random(seed)
+    syllables = ["ka", "to", "mi", "ra", "le", "no", "su", "wy", "dze", "prze", "sta", "ją", "ść", "ło", "gę"]
+    return list(dict.fromkeys("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)))
+
+def bench_search(workdir, hours_list, segment_seconds=4.0, repeat=20):
+    from search_index import SearchIndex
+    results = {}
+    vocabulary = synth_vocabulary(20000)
+    # Rozkład Zipfa: kilka bardzo częstych słów i długi ogon rzadkich
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    rng = random.Random(1)
+    for hours in hours_list:
+        index = SearchIndex(os.path.join(workdir, f"search_{hours:g}h.sqlite"))
+        per_doc = int(3600 / segment_seconds)
+        start = time.perf_counter()
+        for doc in range(int(hours)):
+            words = rng.choices(vocabulary, weights, k=per_doc * 12)
+            segments = [{"start": i * segment_seconds, "end": (i + 1) * segment_seconds,
+                         "text": " ".join(words[i * 12:(i + 1) * 12])} for i in range(per_doc)]
+            index.add(f"doc{doc}", segments, title=f"Nagranie {doc}")
+        entry = {"index_seconds": round(time.perf_counter() - start, 2), **index.stats()}
+        entry.pop("path")
+        for name, query in (("common_word", vocabulary[0]), ("rare_word", vocabulary[5000]),
+                            ("phrase", " ".join(words[100:102])), ("missing", "nieistniejącesłowo")):
+            latencies = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                index.search(query, 20)
+                latencies.append(time.perf_counter() - t)
+            entry[name] = summarize(latencies)
+        index.close()
+        results[f"{hours:g}h"] = entry
+    return results
+
+# -------------------------------------------------
+# Lokalny zamiennik API OpenAI (transkrypcja online)
+# -------------------------------------------------
+def multipart_fields(body, content_type):
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    fields = {}
+    for part in body.split(b"--" + boundary):
+        head, sep, data = part.partition(b"\r\n\r\n")
+        if not sep or b'name="' not in head:
+            continue
+        name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+        fields[name] = data[:-2] if data.endswith(b"\r\n") else data
+    return fields
+
+def upload_duration(data):
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data)) as w:
+            return w.getnframes() / w.getframerate()
+    from openai_chunked import CHUNK_BITRATE
+    return len(data) * 8 / CHUNK_BITRATE
+
+class StandInOpenAI:
+    # POST /v1/audio/transcriptions|translations -> verbose_json z segmentami co segment_seconds.
+    # fail_every=N: co N-te żądanie kończy się 429 (Retry-After: 0) - sprawdza ponawianie.
+    # rtf: czas odpowiedzi proporcjonalny do długości przesłanego audio.
+    def __init__(self, segment_seconds=4.0, fail_every=0, rtf=0.01):
+        self.segment_seconds = segment_seconds
+        self.fail_every = fail_every
+        self.rtf = rtf
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive - widać ponowne użycie połączeń
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = stand_in.respond(self.path, self.headers.get("Content-Type", ""), body,
+                                                   self.client_address)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def respond(self, path, content_type, body, client_address):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(client_address)
+            if self.fail_every and self.requests % self.fail_every == 0:
+                self.failures += 1
+                return 429, {"error": {"message": "Rate limit", "type": "rate_limit_error"}}
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            fields = multipart_fields(body, content_type)
+            duration = upload_duration(fields["file"])
+            time.sleep(duration * self.rtf)
+            count = max(1, int(math.ceil(duration / self.segment_seconds)))
+            segments = [{"id": i, "seek": 0, "start": i * self.segment_seconds,
+                         "end": min(duration, (i + 1) * self.segment_seconds), "text": f" Segment {i}.",
+                         "tokens": [], "temperature": 0.0, "avg_logprob": 0.0, "compression_ratio": 1.0,
+                         "no_speech_prob": 0.0} for i in range(count)]
+            task = "translate" if path.endswith("/translations") else "transcribe"
+            return 200, {"task": task, "language": "english", "duration": duration,
+                         "text": "".join(seg["text"] for seg in segments), "segments": segments}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def bench_openai(workdir, durations, workers_list, chunk_mb, fail_every):
+    from openai_chunked import transcribe_openai
+    results = {}
+    for seconds in durations:
+        audio = write_wav(os.path.join(workdir, f"online_{seconds:g}s.wav"), "speech", seconds)
+        entry = {}
+        for workers in workers_list:
+            with StandInOpenAI(fail_every=fail_every) as server:
+                start = time.perf_counter()
+                segments, stats = transcribe_openai(audio, "sk-bench", workers=workers, max_mb=chunk_mb,
+                                                    base_url=server.url)
+                entry[f"workers_{workers}"] = {
+                    "seconds": round(time.perf_counter() - start, 4),
+                    "segments": len(segments),
+                    "covered_seconds": round(segments[-1]["end"], 1) if segments else 0.0,
+                    **stats,
+                    "requests": server.requests,
+                    "rate_limited": server.failures,
+                    "max_in_flight": server.max_in_flight,
+                    "connections": len(server.connections),
+                }
+        results[f"{seconds:g}s"] = entry
+    return results
+
+# -------------------------------------------------
+# Pobieranie: lokalny serwer plików multimedialnych
+# -------------------------------------------------
+class StandInMedia:
+    # GET /<nazwa>.wav -> plik z katalogu, wysyłany z ograniczoną przepustowością (bytes_per_second),
+    # żeby równoległe pobierania było widać w czasie. Liczy żądania GET i najwyższą współbieżność.
+    def __init__(self, directory, bytes_per_second=4_000_000):
+        self.directory = directory
+        self.bytes_per_second = bytes_per_second
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_head(self):
+                path = os.path.join(stand_in.directory, os.path.basename(self.path.split("?", 1)[0]))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return None
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Content-Length", str(os.path.getsize(path)))
+                self.end_headers()
+                return path
+
+            def do_HEAD(self):
+                self.send_head()
+
+            def do_GET(self):
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                try:
+                    path = self.send_head()
+                    if path is None:
+                        return
+                    block = max(1, stand_in.bytes_per_second // 20)
+                    with open(path, "rb") as f:
+                        while data := f.read(block):
+                            time.sleep(len(data) / stand_in.bytes_per_second)
+                            self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stand_in._lock:
+                        stand_in.in_flight -= 1
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def bench_downloads(workdir, count, parallel_list, seconds=60.0):
+    # N różnych nagrań naraz, potem te same adresy ponownie (z parametrem śledzącym) - drugi przebieg
+    # powinien obyć się bez żadnego żądania. None, gdy yt-dlp nie jest zainstalowany.
+    try:
+        import yt_dlp  # noqa: F401
+    except ImportError:
+        return None
+    from download_manager import DownloadManager
+    media = os.path.join(workdir, "media")
+    os.makedirs(media, exist_ok=True)
+    for i in range(count):
+        write_wav(os.path.join(media, f"clip_{i}.wav"), "tone", seconds)
+    results = {}
+    for parallel in parallel_list:
+        manager = DownloadManager(os.path.join(workdir, f"downloads_{parallel}"), parallel=parallel)
+        with StandInMedia(media) as server:
+            urls = [f"{server.url}/clip_{i}.wav" for i in range(count)]
+            with ThreadPoolExecutor(max_workers=count) as pool:
+                start = time.perf_counter()
+                first = list(pool.map(lambda url: manager.download(url, "original"), urls))
+                cold = time.perf_counter() - start
+                requests = server.requests
+                start = time.perf_counter()
+                again = list(pool.map(lambda url: manager.download(url + "?utm_source=bench", "original"), urls))
+                warm = time.perf_counter() - start
+            results[f"parallel_{parallel}"] = {
+                "seconds": round(cold, 4),
+                "repeat_seconds": round(warm, 4),
+                "requests": requests,
+                "repeat_requests": server.requests - requests,
+                "max_in_flight": server.max_in_flight,
+                "distinct_files": len({r["path"] for r in first}),
+                "repeat_from_index": sum(r["cached"] for r in again),
+            }
+    return results
+
+# -------------------------------------------------
+# Zimny start: czas importu modułów i gotowości serwera
+# -------------------------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_MODULES = ("transcriber_core", "batch_cli", "faster_server", "yt_transcriber")
+
+def import_seconds(module, repeat=3):
+    # Każdy pomiar w świeżym interpreterze; None, gdy moduł nie importuje się w tym środowisku
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    best = None
+    for _ in range(repeat):
+        r = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=HERE)
+        if r.returncode != 0:
+            return None
+        seconds = float(r.stdout.strip().splitlines()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return round(best, 4)
+
+def bench_startup(modules=STARTUP_MODULES):
+    from transcriber_core import server_health, wait_for_server
+    results = {"import_seconds": {m: import_seconds(m) for m in modules}}
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, "faster_server.py"), "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env={**os.environ, "FASTER_WHISPER_CACHE": "0"})
+    try:
+        wait_for_server(lambda: process.poll() is None, url)
+        results["time_to_ready"] = round(time.perf_counter() - start, 4)
+        # Ponowne użycie działającego serwera to tylko jedno zapytanie /health
+        start = time.perf_counter()
+        server_health(url)
+        results["reuse_check"] = round(time.perf_counter() - start, 4)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return results
+
+# -------------------------------------------------
+# Porównanie z poprzednim wynikiem
+# -------------------------------------------------
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(base, current):
+    base_flat = flatten(base.get("results", {}))
+    lines = []
+    for name, value in sorted(flatten(current.get("results", {})).items()):
+        old = base_flat.get(name)
+        if old in (None, 0):
+            continue
+        change = (value - old) / abs(old) * 100
+        if abs(change) >= 1:
+            lines.append(f"{name:70} {old:>12} -> {value:<12} {change:+.1f}%")
+    return lines
+
+def git_commit():
+    if not shutil.which("git"):
+        return None
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def parse_list(value, cast=int):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark potoku transkrypcji (atrapa modelu, syntetyczne audio)")
+    parser.add_argument("--suites", default="server,exporters", help="server,exporters,segments,search,startup,openai,downloads")
+    parser.add_argument("--durations", default="30,300", help="długości audio w sekundach")
+    parser.add_argument("--clients", default="1,4", help="liczby równoległych klientów")
+    parser.add_argument("--requests", type=int, default=2, help="żądań na klienta")
+    parser.add_argument("--segments", default="1000,20000", help="liczby segmentów dla eksporterów")
+    parser.add_argument("--stub-rtf", type=float, default=0.01, help="współczynnik czasu rzeczywistego atrapy")
+    parser.add_argument("--search-hours", default="100", help="godziny transkryptów w indeksie (suite search)")
+    parser.add_argument("--openai-workers", default="1,4", help="równoległe wysyłanie fragmentów (suite openai)")
+    parser.add_argument("--openai-chunk-mb", type=float, default=1.0, help="limit fragmentu w MB (suite openai)")
+    parser.add_argument("--openai-fail-every", type=int, default=5, help="co które żądanie zwraca 429 (0 = nigdy)")
+    parser.add_argument("--download-count", type=int, default=8, help="liczba nagrań (suite downloads)")
+    parser.add_argument("--download-parallel", default="1,4", help="równoległe pobierania (suite downloads)")
+    parser.add_argument("--real-model", default=None, help="użyj prawdziwego modelu (np. small) zamiast atrapy")
+    parser.add_argument("--output", default=None, help="zapis wyników JSON")
+    parser.add_argument("--compare", default=None, help="poprzedni plik JSON do porównania")
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    report = {
+        "meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpu_count": os.cpu_count(), "model": args.real_model or "stub",
+                 "stub_rtf": None if args.real_model else args.stub_rtf, "args": vars(args)},
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="yt_bench_")
+    try:
+        if "server" in suites:
+            report["results"]["server"] = bench_server(
+                workdir, parse_list(args.durations, float), parse_list(args.clients), args.requests,
+                args.stub_rtf, args.real_model or "stub", bool(args.real_model))
+        if "exporters" in suites:
+            report["results"]["exporters"] = bench_exporters(workdir, parse_list(args.segments))
+        if "segments" in suites:
+            report["results"]["segments"] = bench_segments(workdir, parse_list(args.segments))
+        if "search" in suites:
+            report["results"]["search"] = bench_search(workdir, parse_list(args.search_hours, float))
+        if "openai" in suites:
+            report["results"]["openai"] = bench_openai(
+                workdir, parse_list(args.durations, float), parse_list(args.openai_workers), args.openai_chunk_mb,
+                args.openai_fail_every)
+        if "downloads" in suites:
+            report["results"]["downloads"] = bench_downloads(workdir, args.download_count,
+                                                             parse_list(args.download_parallel))
+        if "startup" in suites:
+            report["results"]["startup"] = bench_startup()
+        report["results"]["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report["results"], indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"== Zmiany względem {base.get('meta', {}).get('commit') or args.compare} ==")
+        for line in compare(base, report):
+            print(line)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from audio_pcm import decode_to_pcm, load_pcm
+from model_manager import decode_options
+
+SAMPLE_RATE = 16000
+
+# -------------------------------------------------
+# Podział na fragmenty w miejscach ciszy (VAD)
+# -------------------------------------------------
+def plan_chunks(speech, total_samples, target_seconds=600, overlap_seconds=0.5):
+    # speech: [{"start": próbka, "end": próbka}, ...] z detektora mowy.
+    # Zwraca [(początek, koniec, rdzeń_od, rdzeń_do)] w próbkach: cięcia wypadają
+    # w połowie przerwy między wypowiedziami, a fragment jest poszerzony o zakładkę.
+    if total_samples <= 0:
+        return []
+    target = int(target_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    cuts = [0]
+    for current, following in zip(speech, speech[1:]):
+        if current["end"] - cuts[-1] >= target:
+            cuts.append((current["end"] + following["start"]) // 2)
+    cuts.append(total_samples)
+
+    chunks = []
+    for core_start, core_end in zip(cuts, cuts[1:]):
+        if core_end <= core_start:
+            continue
+        chunks.append((max(0, core_start - overlap), min(total_samples, core_end + overlap), core_start, core_end))
+    return chunks
+
+def is_overlap_duplicate(last, seg):
+    # Ten sam tekst na styku dwóch fragmentów (zakładka) - zostaje jeden
+    return seg["start"] < last["end"] and seg["text"].strip() == last["text"].strip()
+
+def merge_chunk_segments(chunk_results):
+    # chunk_results: listy segmentów (czasy globalne) w kolejności fragmentów
+    merged = []
+    for segments in chunk_results:
+        for seg in segments:
+            if merged and is_overlap_duplicate(merged[-1], seg):
+                continue
+            merged.append(seg)
+    return merged
+
+# -------------------------------------------------
+# Procesy robocze (każdy z własnym WhisperModel)
+# -------------------------------------------------
+_worker_model = None
+_worker_options = {}
+
+def _init_worker(model, device, compute_type, cpu_threads):
+    global _worker_model, _worker_options
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(model, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+    _worker_options = decode_options(model, device)
+
+def _detect_language(pcm_path, start, end):
+    _, info = _worker_model.transcribe(load_pcm(pcm_path, start, end))
+    return info.language
+
+def _transcribe_chunk(pcm_path, start, end, core_start, core_end, language):
+    # Proces roboczy mapuje swój fragment z pliku PCM - audio nie jest przesyłane przez potok
+    audio = load_pcm(pcm_path, start, end)
+    offset = start / SAMPLE_RATE
+    core_from = core_start / SAMPLE_RATE
+    core_to = core_end / SAMPLE_RATE
+    segments, _ = _worker_model.transcribe(audio, language=language, **_worker_options)
+    result = []
+    for seg in segments:
+        seg_start = seg.start + offset
+        seg_end = seg.end + offset
+        # Segment należy do fragmentu, którego rdzeń zawiera jego środek
+        middle = (seg_start + seg_end) / 2
+        if core_from <= middle < core_to:
+            result.append({"start": seg_start, "end": seg_end, "text": seg.text})
+    return result
+
+class SharedPool:
+    def __init__(self, executor, workers):
+        self.executor = executor
+        self.workers = workers
+        self.users = 0  # żądania w toku, które wysyłają fragmenty do tej puli
+        self.retired = False
+
+_executors = {}  # (model, device, compute_type) -> SharedPool
+_retired = []  # pule zastąpione nowszą, zamykane po zakończeniu ostatniego żądania
+_executors_lock = threading.Lock()
+
+def parallel_supported():
+    # Proces demoniczny (multiprocessing, daemon=True) nie może mieć procesów potomnych
+    return not multiprocessing.current_process().daemon
+
+@contextmanager
+def borrow_executor(model, device, compute_type, workers):
+    # Pule procesów są trzymane między żądaniami - modele w procesach ładują się raz.
+    # Jedna pula na model: zmiana liczby procesów tworzy nową, a poprzednia jest zamykana
+    # dopiero, gdy skończą ją używać trwające żądania - ich fragmenty nie są anulowane
+    key = (model, device, compute_type)
+    with _executors_lock:
+        pool = _executors.get(key)
+        if pool is not None and pool.workers != workers:
+            _retire(pool)
+            pool = None
+        if pool is None:
+            # Rdzenie dostępne dla procesu (w sharded_server - tylko przydzielone)
+            cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+            cpu_threads = max(1, cpus // workers)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_worker,
+                                           initargs=(model, device, compute_type, cpu_threads))
+            pool = _executors[key] = SharedPool(executor, workers)
+        pool.users += 1
+    try:
+        yield pool.executor
+    finally:
+        with _executors_lock:
+            pool.users -= 1
+            if pool.retired and pool.users == 0 and pool in _retired:
+                _retired.remove(pool)
+                pool.executor.shutdown(wait=False)
+
+def _retire(pool):
+    # Wywoływane pod _executors_lock
+    pool.retired = True
+    if pool.users == 0:
+        pool.executor.shutdown(wait=False)
+    else:
+        _retired.append(pool)
+
+def shutdown_executors():
+    # Zamknięcie serwera: pozostałe fragmenty wszystkich pul są anulowane
+    with _executors_lock:
+        for pool in [*_executors.values(), *_retired]:
+            pool.retired = True
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+        _retired.clear()
+
+# -------------------------------------------------
+# Równoległa transkrypcja długiego nagrania
+# -------------------------------------------------
+def transcribe_parallel(audio_path, model, device="cpu", compute_type="int8", workers=None, language=None,
+                        target_chunk_seconds=600, on_info=None, on_segment=None, stop=None):
+    # Zwraca listę segmentów {"start", "end", "text"} z czasami względem całego pliku.
+    # on_segment dostaje segmenty w kolejności, gdy tylko kolejne fragmenty są gotowe.
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    pcm_path = decode_to_pcm(audio_path)
+    audio = load_pcm(pcm_path)
+    total_samples = len(audio)
+    duration = total_samples / SAMPLE_RATE
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+    del audio
+    chunks = plan_chunks(speech, total_samples, target_chunk_seconds)
+    # Pula o stałym rozmiarze (procesy startują przy pierwszych zadaniach), niezależnie od liczby fragmentów
+    with borrow_executor(model, device, compute_type, max(1, workers or os.cpu_count() or 1)) as executor:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(chunks) or 1))
+
+        if language is None and chunks:
+            language = executor.submit(_detect_language, pcm_path, 0, 30 * SAMPLE_RATE).result()
+        if on_info:
+            on_info({"duration": duration, "language": language, "chunks": len(chunks), "workers": workers})
+
+        futures = {executor.submit(_transcribe_chunk, pcm_path, start, end, core_start, core_end, language): i
+                   for i, (start, end, core_start, core_end) in enumerate(chunks)}
+        results = [None] * len(chunks)
+        emitted = 0
+        merged = []
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                # Segmenty wysyłane po kolei - fragment N dopiero gdy gotowe są 0..N-1
+                while emitted < len(results) and results[emitted] is not None:
+                    for seg in results[emitted]:
+                        if merged and is_overlap_duplicate(merged[-1], seg):
+                            continue
+                        merged.append(seg)
+                        if on_segment:
+                            on_segment(seg)
+                    results[emitted] = ()
+                    emitted += 1
+                if stop is not None and stop.is_set():
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+        return merged
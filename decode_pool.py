@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+class QueueFullError(RuntimeError):
+    pass
+
+# -------------------------------------------------
+# Pula dekodowania z ograniczoną kolejką
+# -------------------------------------------------
+# Dekodowanie (i ładowanie modelu) działa w wątkach puli, a nie w pętli
+# zdarzeń serwera. Zadania czekają w kolejkach per model i trafiają do wątku
+# dopiero, gdy model ma wolne miejsce (per_model) - wątek nigdy nie stoi na
+# limicie modelu, więc żądanie do bezczynnego modelu nie czeka za zajętym.
+# Kolejki modeli są obsługiwane po kolei (round-robin); max_queue ogranicza
+# łączną liczbę oczekujących zadań.
+class DecodePool:
+    def __init__(self, workers=2, per_model=1, max_queue=8, per_key=None):
+        # per_key(key) -> większy limit dla konkretnego modelu (np. num_workers z profilu) albo None
+        self.workers = workers
+        self.per_model = per_model
+        self.per_key = per_key
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # klucz -> deque[(future, fn, args, kwargs, czas zgłoszenia)]
+        self._active = {}  # klucz -> liczba wykonywanych zadań
+        self._limits = {}
+        self._local = threading.local()
+        self._closed = False
+        self.waiting = 0
+        self.running = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0,
+                      "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "wait_seconds_last": 0.0}
+
+    def full(self):
+        with self._lock:
+            return self.waiting >= self.max_queue
+
+    def submit(self, key, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pula dekodowania jest zamknięta")
+            if self.waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise QueueFullError(f"Kolejka pełna ({self.waiting} oczekujących zadań)")
+            self.waiting += 1
+            self.stats["submitted"] += 1
+            if key not in self._limits:
+                self._limits[key] = max(self.per_model, (self.per_key(key) or 0) if self.per_key else 0)
+            self._pending.setdefault(key, deque()).append((future, fn, args, kwargs, time.perf_counter()))
+            future.add_done_callback(self._on_done)
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        # Wywoływane pod self._lock: przydziela wolne wątki zadaniom modeli, które mają wolne miejsce
+        while self.running < self.workers:
+            for key, queue in self._pending.items():
+                if self._active.get(key, 0) < self._limits[key]:
+                    break
+            else:
+                return
+            future, fn, args, kwargs, enqueued = queue.popleft()
+            if not queue:
+                del self._pending[key]
+            else:
+                self._pending.move_to_end(key)  # następne wolne miejsce dla innego modelu
+            if not future.set_running_or_notify_cancel():
+                continue  # anulowane w kolejce (_on_done już zdjęło je z licznika)
+            waited = time.perf_counter() - enqueued
+            self.waiting -= 1
+            self.running += 1
+            self._active[key] = self._active.get(key, 0) + 1
+            self.stats["wait_seconds_total"] += waited
+            self.stats["wait_seconds_last"] = waited
+            self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+            work = self.executor.submit(self._run, key, future, fn, args, kwargs, waited)
+            # Zamknięcie puli przed startem wątku: wynik to CancelledError, jak dla zadań w kolejce
+            work.add_done_callback(lambda w, future=future: w.cancelled() and future.set_exception(CancelledError()))
+
+    def _run(self, key, future, fn, args, kwargs, waited):
+        self._local.wait = waited
+        error = None
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            error = e
+        # Liczniki przed wynikiem - kto odebrał wynik, widzi już aktualny snapshot()
+        with self._lock:
+            self.running -= 1
+            self._active[key] -= 1
+            self.stats["failed" if error is not None else "completed"] += 1
+            if not self._closed:
+                self._dispatch()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def current_wait(self):
+        # Czas oczekiwania w kolejce zadania wykonywanego w bieżącym wątku
+        return getattr(self._local, "wait", 0.0)
+
+    def _on_done(self, future):
+        # Zadanie anulowane przed startem nigdy nie zdjęło się z kolejki
+        if future.cancelled():
+            with self._lock:
+                self.waiting -= 1
+                self.stats["cancelled"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            started = self.stats["completed"] + self.stats["failed"] + self.running
+            return {
+                "workers": self.workers,
+                "per_model": self.per_model,
+                "max_queue": self.max_queue,
+                "waiting": self.waiting,
+                "running": self.running,
+                "wait_seconds_avg": self.stats["wait_seconds_total"] / started if started else 0.0,
+                "stats": dict(self.stats),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            pending = [item[0] for queue in self._pending.values() for item in queue]
+            self._pending.clear()
+        for future in pending:
+            future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def pool_from_env(per_key=None):
+    return DecodePool(workers=int(os.environ.get("FASTER_WHISPER_WORKERS", "2")),
+                      per_model=int(os.environ.get("FASTER_WHISPER_DECODES_PER_MODEL", "1")),
+                      max_queue=int(os.environ.get("FASTER_WHISPER_MAX_QUEUE", "8")),
+                      per_key=per_key)
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from transcript_cache import youtube_video_id
+
+# Równoległe pobierania (cały proces) i fragmenty HLS/DASH pobierane naraz w ramach jednego pliku
+DOWNLOAD_PARALLEL = int(os.environ.get("YT_TRANSCRIBER_DOWNLOADS", "3"))
+FRAGMENT_PARALLEL = int(os.environ.get("YT_TRANSCRIBER_FRAGMENTS", "4"))
+INDEX_NAME = "index.sqlite"
+# Parametry adresu bez wpływu na treść: śledzenie (wszystkie serwisy) oraz pozycja
+# startowa i źródło odtworzenia na YouTube - w innych serwisach t/start mogą wskazywać inny plik
+IGNORED_PARAMS = {"fbclid", "gclid"}
+YOUTUBE_PARAMS = {"si", "feature", "pp", "t", "start"}
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+
+# -------------------------------------------------
+# Menedżer pobierania z indeksem na dysku
+# -------------------------------------------------
+# Każdy film trafia do własnego katalogu ROOT/<ekstraktor>/<id>/ (równoległe
+# pobierania nie widzą swoich plików), a index.sqlite mapuje "ekstraktor:id"
+# na gotowe pliki (SQLite WAL: GUI i tryb wsadowy mogą dopisywać naraz bez
+# utraty wpisów). Ponowny adres tego samego filmu (także w innej postaci -
+# youtu.be, &t=30s) jest obsługiwany z dysku, bez żadnego zapytania sieciowego.
+# Ścieżka wyniku pochodzi z info_dict yt-dlp (po postprocesorach), nie z
+# przeszukiwania katalogu.
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    ignored = IGNORED_PARAMS | YOUTUBE_PARAMS if host.split(":")[0].endswith(YOUTUBE_HOSTS) else IGNORED_PARAMS
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in ignored and not k.startswith("utm_")]
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/") or "/", urlencode(sorted(query)), ""))
+
+def url_key(url):
+    # Klucz znany bez pytania serwisu: YouTube z samego adresu, inne po pierwszym pobraniu (indeks "urls")
+    video_id = youtube_video_id(url)
+    return f"youtube:{video_id}" if video_id else None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    webpage_url TEXT,
+    downloaded REAL NOT NULL,
+    PRIMARY KEY (key, mode)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    key TEXT NOT NULL
+);
+"""
+
+class DownloadError(Exception):
+    pass
+
+class DownloadManager:
+    def __init__(self, root, parallel=None, fragments=None):
+        self.root = root
+        self.fragments = fragments or FRAGMENT_PARALLEL
+        self.index_path = os.path.join(root, INDEX_NAME)
+        self._slots = threading.BoundedSemaphore(max(1, parallel or DOWNLOAD_PARALLEL))
+        self._lock = threading.Lock()
+        self._inflight = {}  # klucz lub adres -> Event (drugi wątek czeka zamiast pobierać to samo)
+        self.stats = {"hits": 0, "downloads": 0, "waited": 0}
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(self.index_path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def lookup(self, url, mode="mp3"):
+        # Wpis z indeksu, jeśli plik nadal istnieje i ma zapisany rozmiar
+        with self._lock:
+            key = url_key(url)
+            if key is None:
+                row = self.db.execute("SELECT key FROM urls WHERE url = ?", (normalize_url(url),)).fetchone()
+                key = row and row[0]
+            row = key and self.db.execute("SELECT path, size, title FROM files WHERE key = ? AND mode = ?",
+                                          (key, mode)).fetchone()
+        if row and os.path.exists(row[0]) and os.path.getsize(row[0]) == row[1]:
+            return {"key": key, "path": row[0], "title": row[2], "cached": True}
+        return None
+
+    def _record(self, url, info, mode, path):
+        key = f"{info.get('extractor_key', 'generic').lower()}:{info.get('id')}"
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO files (key, mode, path, size, title, webpage_url, downloaded) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (key, mode, path, os.path.getsize(path), info.get("title"),
+                             info.get("webpage_url") or url, time.time()))
+            self.db.execute("INSERT OR REPLACE INTO urls (url, key) VALUES (?, ?)", (normalize_url(url), key))
+        return key
+
+    def download(self, url, mode="mp3", progress_hooks=(), postprocessor_hooks=()):
+        # mode "mp3" (konwersja FFmpeg) lub "original" (kontener bestaudio, tryb PCM).
+        # Zwraca {"key", "path", "title", "cached"}.
+        while True:
+            found = self.lookup(url, mode)
+            if found is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                return found
+            flight = f"{url_key(url) or normalize_url(url)}|{mode}"
+            with self._lock:
+                event = self._inflight.get(flight)
+                if event is None:
+                    self._inflight[flight] = threading.Event()
+                    break
+                self.stats["waited"] += 1
+            event.wait()  # po zakończeniu tamtego pobierania plik jest w indeksie (albo próbujemy sami)
+        try:
+            with self._slots:
+                return self._fetch(url, mode, progress_hooks, postprocessor_hooks)
+        finally:
+            with self._lock:
+                self._inflight.pop(flight).set()
+
+    def _fetch(self, url, mode, progress_hooks, postprocessor_hooks):
+        final = {}
+
+        def postprocessor_hook(d):
+            # Po postprocesorze (np. FFmpegExtractAudio) filepath wskazuje plik wynikowy
+            if d.get("status") == "finished" and d.get("info_dict", {}).get("filepath"):
+                final["path"] = d["info_dict"]["filepath"]
+
+        ydl_opts = {
+            "format": "bestaudio/best",
+            "outtmpl": os.path.join(self.root, "%(extractor_key)s", "%(id)s", "%(title).150B.%(ext)s"),
+            "concurrent_fragment_downloads": self.fragments,
+            "progress_hooks": list(progress_hooks),
+            "postprocessor_hooks": [*postprocessor_hooks, postprocessor_hook],
+            "postprocessors": [dict(key="FFmpegExtractAudio", preferredcodec="mp3", preferredquality="192")],
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+            "noplaylist": True,
+        }
+        if mode != "mp3":
+            ydl_opts["postprocessors"] = []
+
+        import yt_dlp
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=True))
+        downloaded = info.get("requested_downloads") or [{}]
+        path = final.get("path") or downloaded[-1].get("filepath") or info.get("filepath")
+        if not path or not os.path.exists(path):
+            raise DownloadError("Nie udało się pobrać pliku audio.")
+        key = self._record(url, info, mode, path)
+        with self._lock:
+            self.stats["downloads"] += 1
+        return {"key": key, "path": path, "title": info.get("title"), "cached": False}
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_downloads(root, parallel=None, fragments=None):
+    # Jeden menedżer (i jeden limit równoległości) na katalog w procesie: GUI, tryb wsadowy
+    with _shared_lock:
+        if root not in _shared:
+            _shared[root] = DownloadManager(root, parallel, fragments)
+        return _shared[root]
@@ -0,0 +1,284 @@
+import html
+import json
+import os
+import time
+
+# -------------------------------------------------
+# Eksport przyrostowy: segmenty -> wszystkie formaty w jednym przebiegu
+# -------------------------------------------------
+# Każdy format to "sink": dostaje segmenty po kolei (write), co jakiś czas
+# opróżnia bufor na dysk (flush), a na końcu domyka plik (close). Plik
+# istnieje od początku transkrypcji, więc przy przerwaniu zostaje to, co
+# zdążyło się zdekodować. Sinki nie trzymają segmentów w pamięci (poza DOCX,
+# gdzie dokument python-docx jest budowany w całości).
+
+DEFAULT_FLUSH_SECONDS = 5.0
+
+def format_timestamp(seconds, separator=","):
+    h = int(seconds // 3600)
+    m = int((seconds % 3600) // 60)
+    s = int(seconds % 60)
+    ms = int((seconds * 1000) % 1000)
+    return f"{h:02}:{m:02}:{s:02}{separator}{ms:03}"
+
+# Format tekstowy to trzy zwykłe funkcje: nagłówek (tytuł), segment (segment,
+# tekst, numer) i stopka; TextSink tylko je wywołuje i pilnuje pliku.
+def html_header(title):
+    head = f"<title>{html.escape(title)}</title>" if title else ""
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'>{head}</head><body>\n"
+
+def html_segment(seg, text, index):
+    return f"<p>{html.escape(text)}</p>\n"
+
+def txt_segment(seg, text, index):
+    return f" {text}" if index else text
+
+def srt_segment(seg, text, index):
+    start = seg.get("start", 0)
+    end = seg.get("end", start)
+    return f"{index + 1}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+
+def vtt_header(title):
+    return "WEBVTT\n\n"
+
+def vtt_segment(seg, text, index):
+    start = seg.get("start", 0)
+    end = seg.get("end", start)
+    # WebVTT: "&", "<" i ">" (także w "-->") jako encje
+    text = html.escape(text, quote=False)
+    return f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n"
+
+def json_header(title):
+    return '{"title": ' + json.dumps(title, ensure_ascii=False) + ', "segments": ['
+
+def json_segment(seg, text, index):
+    record = {"start": seg.get("start", 0), "end": seg.get("end", seg.get("start", 0)), "text": text}
+    return ("," if index else "") + "\n" + json.dumps(record, ensure_ascii=False)
+
+# format -> (nagłówek, segment, stopka, czy zostawić plik bez segmentów)
+# Napisy bez żadnego segmentu nie są zapisywane (jak dawniej save_srt/save_vtt)
+TEXT_FORMATS = {
+    "txt": (None, txt_segment, "", True),
+    "html": (html_header, html_segment, "</body></html>", True),
+    "srt": (None, srt_segment, "", False),
+    "vtt": (vtt_header, vtt_segment, "", False),
+    "json": (json_header, json_segment, "\n]}\n", True),
+}
+
+class TextSink:
+    flush_seconds = DEFAULT_FLUSH_SECONDS
+
+    def __init__(self, path, title="", fmt="txt"):
+        header, self.render, self.footer, self.keep_empty = TEXT_FORMATS[fmt]
+        self.path = path
+        self.count = 0
+        self.f = open(path, "w", encoding="utf-8")
+        if header:
+            self.f.write(header(title))
+
+    def write(self, seg):
+        text = seg.get("text", "").strip()
+        if text:
+            self.f.write(self.render(seg, text, self.count))
+            self.count += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        # Zwraca ścieżkę zapisanego pliku albo None (pusty plik napisów usunięty)
+        self.f.write(self.footer)
+        self.f.close()
+        if not self.count and not self.keep_empty:
+            os.remove(self.path)
+            return None
+        return self.path
+
+class DocxSink:
+    # Zapis DOCX to serializacja całego dokumentu: pośrednie zapisy dopiero po podwojeniu
+    # liczby akapitów od poprzedniego (łącznie O(n) zamiast O(n²) dla długich nagrań)
+    flush_seconds = 60.0
+    min_flush_runs = 200
+
+    def __init__(self, path, title=""):
+        from docx import Document
+        self.path = path
+        self.count = 0
+        self.saved_count = 0
+        self.doc = Document()
+        self.paragraph = self.doc.add_paragraph()
+
+    def write(self, seg):
+        text = seg.get("text", "").strip()
+        if text:
+            self.paragraph.add_run(f" {text}" if self.count else text)
+            self.count += 1
+
+    def flush(self):
+        if self.count >= max(self.min_flush_runs, 2 * self.saved_count):
+            self.doc.save(self.path)
+            self.saved_count = self.count
+
+    def close(self):
+        self.doc.save(self.path)
+        return self.path
+
+SINKS = {"txt": TextSink, "docx": DocxSink, "html": TextSink, "srt": TextSink, "vtt": TextSink, "json": TextSink}
+# Formaty, które mają sens dla samego tekstu bez czasów (napisy i JSON wymagają segmentów)
+PLAIN_FORMATS = ("txt", "docx", "html")
+
+def open_sink(fmt, path, title=""):
+    sink = SINKS[fmt]
+    return sink(path, title, fmt) if sink is TextSink else sink(path, title)
+
+class MultiSink:
+    # Rozsyła każdy segment do wszystkich formatów; mierzy czas i rozmiar każdego z nich
+    def __init__(self, sinks):
+        self.sinks = sinks  # {format: sink}
+        now = time.monotonic()
+        self.last_flush = {fmt: now for fmt in sinks}
+        self.seconds = {fmt: 0.0 for fmt in sinks}
+
+    def _timed(self, fmt, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.seconds[fmt] += time.perf_counter() - start
+
+    def write(self, seg):
+        now = time.monotonic()
+        for fmt, sink in self.sinks.items():
+            self._timed(fmt, sink.write, seg)
+            if now - self.last_flush[fmt] >= sink.flush_seconds:
+                self._timed(fmt, sink.flush)
+                self.last_flush[fmt] = now
+
+    def write_all(self, segments):
+        for seg in segments:
+            self.write(seg)
+
+    def write_text(self, text):
+        # Sam tekst (np. wynik z pamięci podręcznej bez segmentów) - tylko do formatów tekstowych
+        for fmt, sink in self.sinks.items():
+            if fmt in PLAIN_FORMATS:
+                self._timed(fmt, sink.write, {"text": text})
+
+    def close(self):
+        # Zwraca [(format, ścieżka, sekundy, bajty)]; błąd jednego formatu nie blokuje pozostałych
+        results = []
+        error = None
+        for fmt, sink in self.sinks.items():
+            try:
+                path = self._timed(fmt, sink.close)
+            except Exception as e:
+                error = error or e
+                continue
+            if path is not None:
+                results.append((fmt, path, self.seconds[fmt], os.path.getsize(path)))
+        if error is not None:
+            raise error
+        return results
+
+def open_sinks(formats, base_path, title=""):
+    # base_path bez rozszerzenia; nieznane formaty są pomijane
+    sinks = {}
+    try:
+        for fmt in formats:
+            if fmt in SINKS and fmt not in sinks:
+                sinks[fmt] = open_sink(fmt, f"{base_path}.{fmt}", title)
+    except Exception:
+        for sink in sinks.values():
+            sink.close()
+        raise
+    return MultiSink(sinks)
+
+# -------------------------------------------------
+# Pliki szkicu (tryb draft-then-refine)
+# -------------------------------------------------
+# "<nazwa>.draft.<fmt>" powstają od razu z szybkiego szkicu. Dokładne segmenty
+# zastępują szkic od początku nagrania, a pliki są przepisywane w całości co
+# rewrite_seconds. Po zakończeniu dokładnego przebiegu szkic jest usuwany.
+class DraftPreview:
+    rewrite_seconds = 5.0
+
+    def __init__(self, formats, base_path, title=""):
+        self.formats = [fmt for fmt in formats if fmt in SINKS]
+        self.base_path = f"{base_path}.draft"
+        self.title = title
+        self.draft = []
+        self.refined = []
+        self.paths = []
+        self.dirty = False
+        self.last_write = 0.0
+
+    def add_draft(self, seg):
+        self.draft.append(seg)
+        self._changed()
+
+    def add_refined(self, seg):
+        self.refined.append(seg)
+        self._changed()
+
+    def merged(self):
+        if not self.refined:
+            return self.draft
+        edge = self.refined[-1].get("end", 0)
+        return self.refined + [seg for seg in self.draft if seg.get("start", 0) >= edge]
+
+    def _changed(self):
+        self.dirty = True
+        if time.monotonic() - self.last_write >= self.rewrite_seconds:
+            self.write()
+
+    def write(self):
+        if not self.dirty:
+            return self.paths
+        sink = open_sinks(self.formats, self.base_path, self.title)
+        sink.write_all(self.merged())
+        self.paths = [path for _, path, _, _ in sink.close()]
+        self.dirty = False
+        self.last_write = time.monotonic()
+        return self.paths
+
+    def remove(self):
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.paths = []
+
+# -------------------------------------------------
+# Zapis gotowego tekstu / segmentów (jeden format)
+# -------------------------------------------------
+def export_segments(segments, path, fmt=None, title=""):
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    sink = open_sink(fmt, path, title)
+    try:
+        for seg in segments:
+            sink.write(seg)
+    finally:
+        sink.close()
+
+def _text_segments(text):
+    return [{"start": 0, "end": 0, "text": line} for line in text.splitlines()]
+
+def save_txt(text, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def save_docx(text, path):
+    export_segments([{"text": text}], path, "docx")
+
+def save_html(text, path):
+    export_segments(_text_segments(text), path, "html")
+
+def save_srt(segments, path):
+    export_segments(segments, path, "srt")
+
+def save_vtt(segments, path):
+    export_segments(segments, path, "vtt")
+
+def save_json(segments, path):
+    export_segments(segments, path, "json")
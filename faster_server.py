@@ -1,35 +1,777 @@
 import uvicorn
-from fastapi import FastAPI, UploadFile, Form
-from faster_whisper import WhisperModel
+try:
+    import python_multipart as multipart
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
+from model_manager import decode_options, manager_from_env, model_settings, parse_model_list
+from decode_pool import QueueFullError, pool_from_env
+from transcript_cache import DEFAULT_CACHE_DIR, TranscriptCache, audio_fingerprint, cache_key, cache_params
+from chunked_transcribe import parallel_supported, transcribe_parallel, shutdown_executors
+from audio_pcm import DEFAULT_PCM_DIR, SAMPLE_RATE, decode_to_pcm, load_pcm, pcm_duration
+from jobs import CHECKPOINT_SECONDS, CHECKPOINT_SEGMENTS, TERMINAL, JobScheduler, JobStore, probe_duration
+from search_index import shared_index
+from segment_store import SEGMENTS_MEDIA_TYPE, SegmentStore
+from metrics import Registry, Counter, Histogram, Gauge, RTF_BUCKETS, run_profiled
+import argparse
+import sqlite3
+import sys
 import tempfile
+import asyncio
+import threading
+import json
+import time
 import os
 
 app = FastAPI()
-loaded_models = {}
+SERVICE_NAME = "yt-transcriber-faster-whisper"
+STARTED_AT = time.time()
+models = manager_from_env()
+# Model z num_workers > 1 (profil autotune) może dekodować tyle żądań naraz
+pool = pool_from_env(per_key=lambda key: model_settings(*key)["num_workers"])
+# FASTER_WHISPER_CACHE=0 wyłącza pamięć podręczną transkrypcji
+transcripts = TranscriptCache(os.environ.get("FASTER_WHISPER_CACHE_DIR")) if os.environ.get("FASTER_WHISPER_CACHE", "1") != "0" else None
+# Trwałe zadania asynchroniczne (/jobs): baza i przesłane pliki przeżywają restart serwera
+job_store = JobStore(os.environ.get("FASTER_WHISPER_JOBS_DIR"))
 
-@app.post("/transcribe")
-async def transcribe(file: UploadFile, model: str = Form("large-v2"), device: str = Form("cpu")):
+MAX_FIELD_BYTES = 64 * 1024
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+# Katalogi (rozdzielone os.pathsep), z których wolno czytać pliki po ścieżce; domyślnie pobrane
+# pliki aplikacji i pamięci podręczne - inne pliki klient wysyła jako upload
+BASE_PATH = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+ALLOWED_DIRS = [os.path.realpath(d) for d in os.environ.get(
+    "FASTER_WHISPER_ALLOWED_DIRS",
+    os.pathsep.join((os.path.join(BASE_PATH, "downloads"), DEFAULT_PCM_DIR, DEFAULT_CACHE_DIR))).split(os.pathsep) if d]
+# Opcjonalnie: zrzut cProfile każdego zadania dekodowania do tego katalogu
+PROFILE_DIR = os.environ.get("FASTER_WHISPER_PROFILE_DIR")
+
+# -------------------------------------------------
+# Metryki (/metrics, format Prometheusa)
+# -------------------------------------------------
+registry = Registry()
+http_requests = registry.add(Counter("whisper_http_requests_total", "Liczba żądań HTTP",
+                                     ("route", "method", "status")))
+http_latency = registry.add(Histogram("whisper_http_request_duration_seconds",
+                                      "Czas do wysłania odpowiedzi (dla strumieni - do nagłówków)", ("route",)))
+queue_wait = registry.add(Histogram("whisper_queue_wait_seconds", "Czas oczekiwania zadania w kolejce", ("model",)))
+load_latency = registry.add(Histogram("whisper_model_load_seconds", "Czas pobrania modelu z menedżera (ładowanie lub trafienie)",
+                                      ("model", "device")))
+decode_latency = registry.add(Histogram("whisper_decode_seconds", "Czas dekodowania", ("model", "device")))
+decode_rtf = registry.add(Histogram("whisper_decode_rtf", "Współczynnik czasu rzeczywistego dekodowania",
+                                    ("model", "device"), RTF_BUCKETS))
+audio_total = registry.add(Counter("whisper_audio_seconds_total", "Sekundy przetranskrybowanego audio",
+                                   ("model", "device")))
+cache_lookups = registry.add(Counter("whisper_transcript_cache_lookups_total", "Wyszukiwania w pamięci podręcznej",
+                                     ("result",)))
+registry.add(Gauge("whisper_queue_waiting", "Zadania oczekujące w kolejce", lambda: pool.snapshot()["waiting"]))
+registry.add(Gauge("whisper_queue_running", "Zadania w trakcie dekodowania", lambda: pool.snapshot()["running"]))
+registry.add(Gauge("whisper_queue_events", "Liczniki puli dekodowania", lambda: {
+    (k,): v for k, v in pool.snapshot()["stats"].items() if not k.startswith("wait_")}, ("event",)))
+registry.add(Gauge("whisper_models_loaded", "Modele w pamięci", lambda: {
+    (m, d): 1 for m, d in models.loaded()}, ("model", "device")))
+registry.add(Gauge("whisper_models_memory_mb", "Szacowana pamięć modeli", lambda: {
+    (d,): mb for d, mb in models.snapshot()["used_mb"].items()}, ("device",)))
+registry.add(Gauge("whisper_models_cache_events", "Liczniki menedżera modeli", lambda: {
+    (k,): v for k, v in models.snapshot()["stats"].items()}, ("event",)))
+registry.add(Gauge("whisper_jobs", "Zadania asynchroniczne według statusu", lambda: {
+    (status,): n for status, n in job_store.counts().items()}, ("status",)))
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "other")
+        http_requests.inc(route, request.method, status)
+        http_latency.observe(time.perf_counter() - start, route)
+
+@app.get("/health")
+async def health():
+    # Lekka kontrola gotowości - klienci rozpoznają po "service" serwer, którego mogą użyć ponownie
+    queue = pool.snapshot()
+    return {
+        "service": SERVICE_NAME,
+        "status": "ok",
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - STARTED_AT, 1),
+        "models": [{"model": m, "device": d} for m, d in models.loaded()],
+        "queue": {"waiting": queue["waiting"], "running": queue["running"]},
+        "jobs": scheduler.load(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def record_decode(model, device, timings):
+    queue_wait.observe(timings.get("queue_wait_seconds", 0.0), model)
+    if "load_seconds" in timings:
+        load_latency.observe(timings["load_seconds"], model, device)
+    decode_latency.observe(timings["decode_seconds"], model, device)
+    audio = timings.get("audio_seconds") or 0
+    if audio:
+        timings["rtf"] = round(timings["decode_seconds"] / audio, 4)
+        decode_rtf.observe(timings["rtf"], model, device)
+        audio_total.inc(model, device, amount=audio)
+
+@app.on_event("startup")
+async def preload_models():
+    # FASTER_WHISPER_PRELOAD="small:cpu,large-v3:cuda" - ładowanie (i rozgrzewka) przed pierwszym żądaniem
+    preload = parse_model_list(os.environ.get("FASTER_WHISPER_PRELOAD", ""))
+    if preload:
+        warmup = os.environ.get("FASTER_WHISPER_WARMUP", "1") != "0"
+        await asyncio.to_thread(models.preload, preload, warmup)
+
+@app.on_event("startup")
+async def start_jobs():
+    # Zadania niedokończone przed restartem wracają do kolejki i wznawiają się od checkpointu
+    await asyncio.to_thread(scheduler.start)
+
+@app.on_event("shutdown")
+async def release_workers():
+    # Najpierw zadania: zapisują checkpoint, zanim pula przestanie przyjmować pracę
+    await asyncio.to_thread(scheduler.shutdown)
+    pool.shutdown()
+    shutdown_executors()
+
+@app.get("/models")
+async def model_stats():
+    return models.snapshot()
+
+def segment_to_dict(seg):
+    return {"start": seg.start, "end": seg.end, "text": seg.text}
+
+def ndjson_line(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+# -------------------------------------------------
+# Dane wejściowe: upload albo ścieżka lokalna
+# -------------------------------------------------
+async def read_form(request, directory=None):
+    # Ciało multipart czytane wprost z request.stream(): plik trafia na dysk raz, w kawałkach
+    # (bez tymczasowej kopii Starlette/UploadFile), pola tekstowe zbierane w pamięci.
+    # Zwraca (pola, ścieżka zapisanego pliku albo None).
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        return {name: value for name, value in form.items() if isinstance(value, str)}, None
+    _, params = multipart.multipart.parse_options_header(content_type)
+    if not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Brak granicy (boundary) w nagłówku multipart")
+
+    fields = {}
+    part = {}
+    upload = {"path": None}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, field=b"", value=b"", data=[], out=None)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].decode("latin-1").lower()] = part["value"]
+        part["field"] = part["value"] = b""
+
+    def on_headers_finished():
+        _, options = multipart.multipart.parse_options_header(part["headers"].get("content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8")
+        filename = options.get(b"filename")
+        if filename is not None and part["name"] == "file" and upload["path"] is None:
+            suffix = os.path.splitext(filename.decode("utf-8", "replace"))[1] or ".mp3"
+            part["out"] = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+            upload["path"] = part["out"].name
+
+    def on_part_data(data, start, end):
+        if part["out"] is not None:
+            part["out"].write(data[start:end])
+        elif "name" in part:
+            part["data"].append(data[start:end])
+            if sum(map(len, part["data"])) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Pole formularza {part['name']} jest za duże")
+
+    def on_part_end():
+        if part["out"] is not None:
+            part["out"].close()
+        elif part.get("name"):
+            fields[part["name"]] = b"".join(part["data"]).decode("utf-8")
+
+    parser = multipart.MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field, "on_header_value": on_header_value,
+        "on_header_end": on_header_end, "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data, "on_part_end": on_part_end})
     try:
-        if (model, device) not in loaded_models:
-            loaded_models[(model, device)] = WhisperModel(model, device=device, compute_type="int8")
-        whisper_model = loaded_models[(model, device)]
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except BaseException as e:
+        if part.get("out") is not None:
+            part["out"].close()
+        remove_temp(upload["path"])
+        if isinstance(e, multipart.exceptions.FormParserError):
+            raise HTTPException(status_code=400, detail=f"Niepoprawne dane multipart: {e}")
+        raise
+    return fields, upload["path"]
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
+def form_value(fields, name, default=None, cast=str):
+    value = fields.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Niepoprawna wartość pola {name}: {value!r}")
+
+def resolve_local_path(request, path):
+    # Tryb "ten sam host": model czyta plik bezpośrednio, bez uploadu i kopii
+    if request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="Ścieżki lokalne są dozwolone tylko dla klientów z localhost")
+    if not os.path.isabs(path):
+        raise HTTPException(status_code=400, detail="Ścieżka musi być bezwzględna")
+    real_path = os.path.realpath(path)
+    if not any(os.path.commonpath([real_path, d]) == d for d in ALLOWED_DIRS):
+        raise HTTPException(status_code=403, detail=f"Ścieżka poza dozwolonymi katalogami: {path}")
+    if not os.path.isfile(real_path):
+        raise HTTPException(status_code=400, detail=f"Plik nie istnieje: {path}")
+    return real_path
+
+async def open_input(request, directory=None):
+    # Zwraca (pola formularza, ścieżka do dekodowania, plik do usunięcia albo None)
+    fields, upload_path = await read_form(request, directory)
+    try:
+        if fields.get("path"):
+            remove_temp(upload_path)  # ścieżka ma pierwszeństwo przed plikiem
+            return fields, resolve_local_path(request, fields["path"]), None
+        if upload_path is None:
+            raise HTTPException(status_code=400, detail="Podaj plik albo ścieżkę")
+    except BaseException:
+        remove_temp(upload_path)
+        raise
+    return fields, upload_path, upload_path
+
+def form_options(fields):
+    return (form_value(fields, "model", "large-v2"), form_value(fields, "device", "cpu"),
+            form_value(fields, "language"), form_value(fields, "parallel", 0, int), form_value(fields, "pcm", 0, int))
+
+def remove_temp(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
-        segments, info = whisper_model.transcribe(tmp_path)
-        text = ""
-        result_segments = []
+# -------------------------------------------------
+# Dekodowanie (w wątkach puli, poza pętlą zdarzeń)
+# -------------------------------------------------
+def decode_source(audio_path, pcm):
+    # pcm: jednorazowe dekodowanie do 16 kHz float32 i przekazanie modelowi tablicy z memmap
+    return load_pcm(decode_to_pcm(audio_path)) if pcm else audio_path
+
+def load_model(model, device, timings):
+    start = time.perf_counter()
+    whisper_model = models.get(model, device)
+    timings["load_seconds"] = round(time.perf_counter() - start, 4)
+    return whisper_model
+
+def decode_all(audio_path, model, device, language, key, parallel=0, pcm=0):
+    timings = {"queue_wait_seconds": round(pool.current_wait(), 4)}
+    if parallel and parallel_supported():
+        workers = models.reserve_workers(model, device, parallel)
+        start = time.perf_counter()
+        store = SegmentStore.from_dicts(
+            transcribe_parallel(audio_path, model, device, models.compute_type_for(model, device), workers, language))
+        timings["audio_seconds"] = store.ends[-1] if store else 0
+    else:
+        whisper_model = load_model(model, device, timings)
+        start = time.perf_counter()
+        segments, info = whisper_model.transcribe(decode_source(audio_path, pcm), language=language,
+                                                  **decode_options(model, device))
+        store = SegmentStore()
         for seg in segments:
-            seg_dict = {"start": seg.start, "end": seg.end, "text": seg.text}
-            result_segments.append(seg_dict)
-            text += seg.text.strip() + " "
+            store.append(seg.start, seg.end, seg.text)
+        timings["audio_seconds"] = info.duration
+    timings["decode_seconds"] = round(time.perf_counter() - start, 4)
+    record_decode(model, device, timings)
+    result = {"text": store.full_text(), "segments": store}
+    store_cached(key, result, model, device, language)
+    return {**result, "timings": timings}
+
+def transcript_response(request, result):
+    # Accept: application/x-yt-segments -> zwarty format binarny (segment_store), w przeciwnym razie JSON
+    segments = result.get("segments")
+    if segments is None:
+        return result
+    if SEGMENTS_MEDIA_TYPE in request.headers.get("accept", ""):
+        store = segments if isinstance(segments, SegmentStore) else SegmentStore.from_dicts(segments)
+        meta = {k: v for k, v in result.items() if k not in ("text", "segments")}
+        return Response(store.to_bytes(meta), media_type=SEGMENTS_MEDIA_TYPE)
+    if isinstance(segments, SegmentStore):
+        return {**result, "segments": segments.to_dicts()}
+    return result
+
+def decode_stream(audio_path, model, device, language, key, emit, stop, parallel=0, pcm=0):
+    timings = {"queue_wait_seconds": round(pool.current_wait(), 4)}
+    texts = []
+    result_segments = []
+
+    def on_segment(seg_dict):
+        result_segments.append(seg_dict)
+        texts.append(seg_dict["text"].strip())
+        emit({"type": "segment", **seg_dict})
+
+    def on_info(info):
+        timings["audio_seconds"] = info.get("duration")
+        emit({"type": "info", **info, **timings})
 
-        os.remove(tmp_path)
-        return {"text": text.strip(), "segments": result_segments}
+    if parallel and parallel_supported():
+        # Długie nagranie: fragmenty dekodowane równolegle w procesach, segmenty w kolejności
+        workers = models.reserve_workers(model, device, parallel)
+        start = time.perf_counter()
+        transcribe_parallel(audio_path, model, device, models.compute_type_for(model, device), workers, language,
+                            on_info=on_info, on_segment=on_segment, stop=stop)
+    else:
+        whisper_model = load_model(model, device, timings)
+        start = time.perf_counter()
+        segments, info = whisper_model.transcribe(decode_source(audio_path, pcm), language=language,
+                                                  **decode_options(model, device))
+        on_info({"duration": info.duration, "language": info.language})
+        for seg in segments:
+            if stop.is_set():
+                break
+            on_segment(segment_to_dict(seg))
+    if stop.is_set():
+        return
+    timings["decode_seconds"] = round(time.perf_counter() - start, 4)
+    record_decode(model, device, timings)
+    result = {"text": " ".join(texts).strip(), "segments": result_segments}
+    store_cached(key, result, model, device, language)
+    emit({"type": "done", "text": result["text"], **timings})
+
+def decode_draft(audio_path, model, device, language, emit, stop):
+    # Szybki szkic małym modelem (beam 1) - zdarzenia draft_*, równolegle z dokładnym przebiegiem
+    timings = {"queue_wait_seconds": round(pool.current_wait(), 4)}
+    whisper_model = load_model(model, device, timings)
+    start = time.perf_counter()
+    segments, info = whisper_model.transcribe(decode_source(audio_path, 1), language=language, beam_size=1)
+    emit({"type": "draft_info", "model": model, "duration": info.duration, "language": info.language, **timings})
+    for seg in segments:
+        if stop.is_set():
+            return
+        emit({"type": "draft_segment", **segment_to_dict(seg)})
+    emit({"type": "draft_done", "model": model, "decode_seconds": round(time.perf_counter() - start, 4)})
+
+def release_after(path, users):
+    # Plik tymczasowy usuwany, gdy skończy ostatni z wątków, które go czytają
+    lock = threading.Lock()
+    remaining = [users]
+
+    def release():
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            remove_temp(path)
+    return release
+
+# -------------------------------------------------
+# Pamięć podręczna transkrypcji (sprawdzana przed załadowaniem modelu)
+# -------------------------------------------------
+def transcript_params(model, device, language):
+    return cache_params(model, device, models.compute_type_for(model, device), language,
+                        decode=decode_options(model, device))
+
+def transcript_key(audio_path, model, device, language):
+    return cache_key(audio_fingerprint(audio_path), transcript_params(model, device, language))
+
+def lookup_cached(audio_path, model, device, language):
+    # Zwraca (klucz, wpis albo None); bez pamięci podręcznej (None, None)
+    if transcripts is None:
+        return None, None
+    key = transcript_key(audio_path, model, device, language)
+    entry = transcripts.get(key)
+    cache_lookups.inc("hit" if entry is not None else "miss")
+    return key, entry
+
+def store_cached(key, result, model, device, language):
+    if transcripts is not None and key is not None:
+        segments = result["segments"]
+        if isinstance(segments, SegmentStore):
+            segments = segments.to_dicts()
+        transcripts.put(key, result["text"], segments, transcript_params(model, device, language))
+
+def cached_events(entry):
+    segments = entry.get("segments") or []
+    duration = segments[-1]["end"] if segments else 0
+    yield {"type": "info", "duration": duration, "language": entry.get("params", {}).get("language"), "cached": True}
+    for seg in segments:
+        yield {"type": "segment", **seg}
+    yield {"type": "done", "text": entry.get("text", ""), "cached": True}
+
+@app.get("/search")
+async def search(q: str, limit: int = 20, raw: bool = False):
+    # Frazy we wszystkich zaindeksowanych transkryptach; trafienia z czasem i linkiem do miejsca w nagraniu
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Puste zapytanie.")
+    start = time.perf_counter()
+    try:
+        hits = await asyncio.to_thread(shared_index().search, q, max(1, min(limit, 200)), raw)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Błędne zapytanie: {e}")
+    return {"query": q, "hits": hits, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+@app.get("/cache")
+async def cache_stats():
+    return transcripts.stats() if transcripts is not None else {"enabled": False}
+
+def pool_submit(model, device, fn, *args):
+    if PROFILE_DIR:
+        args = (PROFILE_DIR, f"{model}_{device}", fn) + args
+        fn = run_profiled
+    return pool.submit((model, device), fn, *args)
+
+def submit_decode(model, device, fn, *args):
+    try:
+        return pool_submit(model, device, fn, *args)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def check_admission():
+    # Odrzucenie przed przyjęciem uploadu, żeby nie kopiować pliku na próżno
+    if pool.full():
+        raise HTTPException(status_code=503, detail="Kolejka transkrypcji jest pełna", headers={"Retry-After": "5"})
+
+@app.get("/queue")
+async def queue_stats():
+    return pool.snapshot()
+
+@app.post("/transcribe")
+async def transcribe(request: Request):
+    # Pola formularza: file albo path, model, device, language, parallel, pcm
+    check_admission()
+    fields, audio_path, tmp_path = await open_input(request)
+    try:
+        model, device, language, parallel, pcm = form_options(fields)
+        key, cached = await asyncio.to_thread(lookup_cached, audio_path, model, device, language)
+    except HTTPException:
+        remove_temp(tmp_path)
+        raise
     except Exception as e:
+        remove_temp(tmp_path)
         return {"error": str(e)}
+    if cached is not None:
+        remove_temp(tmp_path)
+        return transcript_response(request, {"text": cached.get("text", ""), "segments": cached.get("segments", []),
+                                             "cached": True})
+
+    def job():
+        try:
+            return decode_all(audio_path, model, device, language, key, parallel, pcm)
+        finally:
+            remove_temp(tmp_path)
+
+    try:
+        future = submit_decode(model, device, job)
+    except HTTPException:
+        remove_temp(tmp_path)
+        raise
+    future.add_done_callback(lambda f: f.cancelled() and remove_temp(tmp_path))
+    try:
+        return transcript_response(request, await asyncio.wrap_future(future))
+    except Exception as e:
+        return {"error": str(e)}
+
+# -------------------------------------------------
+# Strumieniowanie segmentów (NDJSON)
+# -------------------------------------------------
+# Kolejne linie: {"type": "info"} z długością audio, potem {"type": "segment"}
+# dla każdego zdekodowanego segmentu i na końcu {"type": "done"} z pełnym tekstem.
+# Błąd w trakcie dekodowania kończy strumień linią {"type": "error"}.
+# draft=MODEL (np. base): równolegle szybki szkic - zdarzenia draft_info, draft_segment,
+# draft_done; segmenty dokładnego modelu zastępują szkic od początku nagrania.
+# Oba przebiegi dekodują ten sam plik PCM i korzystają z tego samego menedżera modeli.
+@app.post("/transcribe/stream")
+async def transcribe_stream(request: Request):
+    # Pola jak w /transcribe oraz draft
+    check_admission()
+    fields, audio_path, tmp_path = await open_input(request)
+    try:
+        model, device, language, parallel, pcm = form_options(fields)
+        draft = form_value(fields, "draft")
+        key, cached = await asyncio.to_thread(lookup_cached, audio_path, model, device, language)
+    except BaseException:
+        remove_temp(tmp_path)
+        raise
+    if cached is not None:
+        remove_temp(tmp_path)
+        return StreamingResponse((ndjson_line(e) for e in cached_events(cached)), media_type="application/x-ndjson")
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    draft_stop = threading.Event()
+    draft = draft if draft and draft != model else None
+    # Plik usuwają wątki dekodujące - dopiero gdy żaden model go już nie czyta
+    release = release_after(tmp_path, 2 if draft else 1)
+
+    def emit(event):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            stop.set()  # pętla zamknięta - nie ma komu wysyłać
+            draft_stop.set()
+
+    def job():
+        try:
+            decode_stream(audio_path, model, device, language, key, emit, stop, parallel, pcm or bool(draft))
+        except Exception as e:
+            emit({"type": "error", "error": str(e)})
+        finally:
+            release()
+            emit(None)
+
+    def draft_job():
+        try:
+            decode_draft(audio_path, draft, device, language, emit, draft_stop)
+        except Exception as e:
+            # Szkic jest pomocniczy - błąd nie przerywa dokładnej transkrypcji
+            emit({"type": "draft_error", "error": str(e)})
+        finally:
+            release()
+
+    if draft:
+        try:
+            future = pool_submit(draft, device, draft_job)
+            future.add_done_callback(lambda f: f.cancelled() and release())
+        except QueueFullError:
+            release()
+    try:
+        submit_decode(model, device, job)
+    except HTTPException:
+        draft_stop.set()
+        release()
+        raise
+
+    async def events():
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield ndjson_line(event)
+        finally:
+            # Koniec lub klient rozłączony - przerwij dekodowanie (i szkic) po bieżącym segmencie
+            stop.set()
+            draft_stop.set()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# -------------------------------------------------
+# Zadania asynchroniczne (/jobs) - trwałe, z checkpointami i wznawianiem
+# -------------------------------------------------
+# POST /jobs zwraca od razu identyfikator; dekodowanie idzie w tle (kolejka
+# priorytetowa z jobs.py, wspólne limity puli z /transcribe), a segmenty są
+# co kilka sekund zapisywane w bazie zadań. Po restarcie lub wywłaszczeniu
+# zadanie rusza od ostatniego zapisanego segmentu, nie od początku.
+JOB_FIELDS = ("id", "status", "priority", "model", "device", "language", "duration", "checkpoint",
+              "segment_count", "attempts", "error", "timings", "created", "started", "finished")
+
+def decode_job(job, control):
+    if control.stop.is_set():
+        return None
+    job_id = job["id"]
+    model, device = job["model"], job["device"]
+    timings = {"queue_wait_seconds": round(pool.current_wait(), 4)}
+    # Zadania zawsze przez PCM - wznowienie to tylko przesunięcie w tablicy próbek
+    pcm_path = decode_to_pcm(job["audio_path"])
+    duration = pcm_duration(pcm_path)
+    offset = job["checkpoint"]
+    whisper_model = load_model(model, device, timings)
+    job_store.update(job_id, duration=duration, timings=timings)
+    start = time.perf_counter()
+    pending = []
+    if duration - offset > 0.1:
+        # Końcówka zapisanego tekstu jako kontekst - wznowienie nie gubi stylu i interpunkcji
+        prompt = job_store.tail_text(job_id) if offset else None
+        segments, info = whisper_model.transcribe(load_pcm(pcm_path, int(offset * SAMPLE_RATE)),
+                                                  language=job["language"], initial_prompt=prompt,
+                                                  **decode_options(model, device))
+        if job["language"] is None:
+            job_store.update(job_id, language=info.language)
+        last_checkpoint = time.monotonic()
+        for seg in segments:
+            pending.append({"start": seg.start + offset, "end": seg.end + offset, "text": seg.text})
+            if len(pending) >= CHECKPOINT_SEGMENTS or time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                job_store.checkpoint(job_id, pending)
+                pending = []
+                last_checkpoint = time.monotonic()
+            if control.stop.is_set():
+                break
+    job_store.checkpoint(job_id, pending)
+    if control.stop.is_set():
+        return None
+    timings["decode_seconds"] = round(time.perf_counter() - start, 4)
+    timings["audio_seconds"] = max(0.0, duration - offset)
+    record_decode(model, device, timings)
+    store = SegmentStore.from_dicts(job_store.segments(job_id))
+    result = {"text": store.full_text(), "segments": store}
+    store_cached(job["key"], result, model, device, job["language"])
+    return {"text": result["text"], "timings": timings}
+
+def run_job(job, control):
+    # Wątek harmonogramu czeka na miejsce w puli, a potem na wynik
+    while True:
+        try:
+            future = pool_submit(job["model"], job["device"], decode_job, job, control)
+            break
+        except QueueFullError:
+            if control.stop.wait(1.0):
+                return None
+    return future.result()
+
+scheduler = JobScheduler(job_store, run_job, int(os.environ.get("FASTER_WHISPER_JOB_WORKERS", "1")))
+
+def job_view(job):
+    view = {name: job[name] for name in JOB_FIELDS}
+    if job["status"] == "done":
+        view["progress"] = 1.0
+        view["text"] = job["text"]
+    else:
+        view["progress"] = round(min(1.0, job["checkpoint"] / job["duration"]), 4) if job["duration"] else 0.0
+    return view
+
+def get_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Brak zadania: {job_id}")
+    return job
+
+def finish_cached_job(job, cached, duration):
+    segments = cached.get("segments") or []
+    job_store.checkpoint(job["id"], segments)
+    job_store.update(job["id"], status="done", text=cached.get("text", ""), finished=time.time(),
+                     duration=segments[-1]["end"] if segments else duration, timings={"cached": True})
+    job_store.release_file(job)
+
+@app.post("/jobs")
+async def create_job(request: Request):
+    # Pola jak w /transcribe oraz priority. Upload trafia do katalogu zadań
+    # (nie do plików tymczasowych) - musi przetrwać restart
+    fields, audio_path, upload_path = await open_input(request, job_store.uploads_dir)
+    owned = upload_path is not None
+    try:
+        model, device, language, _, _ = form_options(fields)
+        priority = form_value(fields, "priority", 0, int)
+        key = await asyncio.to_thread(transcript_key, audio_path, model, device, language)
+        cached = await asyncio.to_thread(transcripts.get, key) if transcripts is not None else None
+        duration = await asyncio.to_thread(probe_duration, audio_path)
+        job, created = await asyncio.to_thread(job_store.create, audio_path, model, device, language,
+                                               priority, key, owned, duration)
+    except BaseException:
+        if owned:
+            remove_temp(audio_path)
+        raise
+    if not created:
+        # To samo nagranie z tymi samymi ustawieniami już czeka lub trwa - klient podłącza się do niego
+        if owned:
+            remove_temp(audio_path)
+        return job_view(job)
+    if transcripts is not None:
+        cache_lookups.inc("hit" if cached is not None else "miss")
+    if cached is not None:
+        await asyncio.to_thread(finish_cached_job, job, cached, duration)
+    else:
+        await asyncio.to_thread(scheduler.submit, job)
+    return job_view(await asyncio.to_thread(job_store.get, job["id"]))
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 100):
+    jobs = await asyncio.to_thread(job_store.list, max(1, min(limit, 1000)))
+    return {"jobs": [job_view(job) for job in jobs], **scheduler.snapshot()}
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str, segments: bool = False, after: int = 0):
+    # segments=true: z zapisanymi dotąd segmentami od numeru after
+    # (Accept: application/x-yt-segments - format binarny, tak pobiera je klient)
+    view = job_view(get_job(job_id))
+    if not segments:
+        return view
+    stored = await asyncio.to_thread(job_store.segments, job_id, max(0, after))
+    return transcript_response(request, {**view, "text": view.get("text") or "", "segments": stored})
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    get_job(job_id)
+    return job_view(scheduler.cancel(job_id))
+
+# Podgląd na żywo: najpierw zapisane segmenty (od numeru "after"), potem nowe
+# w miarę checkpointów, zdarzenia jak w /transcribe/stream. Rozłączenie nie
+# przerywa zadania - klient może wrócić z after = liczba odebranych segmentów.
+JOB_POLL_SECONDS = 0.5
+
+@app.get("/jobs/{job_id}/stream")
+async def job_stream(job_id: str, after: int = 0):
+    get_job(job_id)
+
+    async def events():
+        sent = max(0, after)
+        status = None
+        info_sent = False
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job["status"] != status:
+                status = job["status"]
+                yield ndjson_line({"type": "status", "id": job_id, "status": status})
+            if not info_sent and (job["timings"] or status in TERMINAL):
+                info_sent = True
+                yield ndjson_line({"type": "info", "duration": job["duration"], "language": job["language"],
+                                   **{k: v for k, v in job["timings"].items() if k in ("queue_wait_seconds",
+                                                                                       "load_seconds", "cached")}})
+            # Segmenty czytane po statusie: zadanie zakończone ma już wszystkie zapisane
+            for seg in await asyncio.to_thread(job_store.segments, job_id, sent):
+                sent += 1
+                yield ndjson_line({"type": "segment", **seg})
+            if status == "done":
+                yield ndjson_line({"type": "done", "text": job["text"] or "", **job["timings"]})
+                return
+            if status == "failed":
+                yield ndjson_line({"type": "error", "error": job["error"]})
+                return
+            if status == "cancelled":
+                yield ndjson_line({"type": "cancelled", "id": job_id})
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def pin_cpus(spec):
+    # Proces (i jego procesy potomne) tylko na podanych rdzeniach, np. "0-7" - używane przez sharded_server
+    if not hasattr(os, "sched_setaffinity"):
+        print("Przypinanie do rdzeni nie jest dostępne w tym systemie - pomijam --cpus")
+        return
+    from sharded_server import parse_cpu_list
+    os.sched_setaffinity(0, parse_cpu_list(spec))
+
+def run(host="127.0.0.1", port=8000):
+    uvicorn.run(app, host=host, port=port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serwer transkrypcji Faster-Whisper")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FASTER_WHISPER_PORT", "8000")))
+    parser.add_argument("--cpus", default=None, help="przypnij proces do rdzeni, np. 0-7")
+    args = parser.parse_args(argv)
+    if args.cpus:
+        pin_cpus(args.cpus)
+    run(args.host, args.port)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    main()
@@ -0,0 +1,321 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+
+DEFAULT_JOBS_DIR = os.environ.get("FASTER_WHISPER_JOBS_DIR",
+                                  os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "jobs"))
+TERMINAL = ("done", "failed", "cancelled")
+# Zapis postępu (segmentów) co tyle sekund lub segmentów - tyle najwyżej trzeba zdekodować ponownie po awarii
+CHECKPOINT_SECONDS = float(os.environ.get("FASTER_WHISPER_CHECKPOINT_SECONDS", "2"))
+CHECKPOINT_SEGMENTS = 20
+# Zadanie, któremu zostało mniej audio, nie jest wywłaszczane
+PREEMPT_MIN_SECONDS = 300
+UNKNOWN_DURATION = 1e12
+
+# -------------------------------------------------
+# Trwały magazyn zadań (SQLite)
+# -------------------------------------------------
+# Zadanie = wiersz w jobs, zdekodowane segmenty = wiersze w job_segments
+# (numerowane od 0). checkpoint to koniec ostatniego zapisanego segmentu:
+# po restarcie dekodowanie rusza od tego miejsca, a nie od początku.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    key TEXT,
+    audio_path TEXT NOT NULL,
+    owned_file INTEGER NOT NULL DEFAULT 0,
+    model TEXT NOT NULL,
+    device TEXT NOT NULL,
+    language TEXT,
+    duration REAL,
+    checkpoint REAL NOT NULL DEFAULT 0,
+    segment_count INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    text TEXT,
+    error TEXT,
+    timings TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs(key, status);
+CREATE TABLE IF NOT EXISTS job_segments (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+def probe_duration(audio_path):
+    # Długość z nagłówka kontenera (PyAV, zależność faster-whisper) - bez dekodowania
+    try:
+        import av
+        with av.open(audio_path) as container:
+            if container.duration:
+                return container.duration / 1_000_000
+    except Exception:
+        pass
+    return None
+
+class JobStore:
+    def __init__(self, jobs_dir=None):
+        self.jobs_dir = jobs_dir or DEFAULT_JOBS_DIR
+        self.uploads_dir = os.path.join(self.jobs_dir, "uploads")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(self.jobs_dir, "jobs.sqlite"), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+        return job
+
+    def create(self, audio_path, model, device, language=None, priority=0, key=None, owned_file=False,
+               duration=None):
+        # Zwraca (zadanie, utworzone). Niezakończone zadanie dla tego samego pliku i ustawień jest
+        # zwracane zamiast nowego (ponowne zgłoszenie podłącza się do niego) - sprawdzenie i zapis
+        # w jednej transakcji, BEGIN IMMEDIATE blokuje zapis także innym procesom
+        job_id = uuid.uuid4().hex[:16]
+        with self._lock, self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            if key is not None:
+                row = self.db.execute("SELECT * FROM jobs WHERE key = ? AND status IN ('queued', 'running') "
+                                      "ORDER BY created LIMIT 1", (key,)).fetchone()
+                if row is not None:
+                    return self._job(row), False
+            self.db.execute(
+                "INSERT INTO jobs (id, status, priority, key, audio_path, owned_file, model, device, language, "
+                "duration, created) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, key, audio_path, int(owned_file), model, device, language, duration, time.time()))
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._job(self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, limit=100):
+        with self._lock:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def unfinished(self):
+        with self._lock:
+            rows = self.db.execute("SELECT * FROM jobs WHERE status IN ('queued', 'running') "
+                                   "ORDER BY created").fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def update(self, job_id, **fields):
+        if "timings" in fields:
+            fields["timings"] = json.dumps(fields["timings"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self.db:
+            self.db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def checkpoint(self, job_id, segments):
+        # Segmenty i nowy punkt wznowienia zapisywane razem, w jednej transakcji
+        if not segments:
+            return
+        with self._lock, self.db:
+            first = self.db.execute("SELECT segment_count FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            self.db.executemany("INSERT INTO job_segments (job_id, seq, start, end, text) VALUES (?, ?, ?, ?, ?)",
+                                ((job_id, first + i, seg["start"], seg["end"], seg["text"])
+                                 for i, seg in enumerate(segments)))
+            self.db.execute("UPDATE jobs SET segment_count = ?, checkpoint = ? WHERE id = ?",
+                            (first + len(segments), segments[-1]["end"], job_id))
+
+    def segments(self, job_id, after=0, limit=-1):
+        with self._lock:
+            rows = self.db.execute("SELECT start, end, text FROM job_segments WHERE job_id = ? AND seq >= ? "
+                                   "ORDER BY seq LIMIT ?", (job_id, after, limit)).fetchall()
+        return [{"start": start, "end": end, "text": text} for start, end, text in rows]
+
+    def tail_text(self, job_id, chars=200):
+        # Końcówka zapisanego tekstu - podpowiedź dla modelu przy wznowieniu
+        with self._lock:
+            rows = self.db.execute("SELECT text FROM job_segments WHERE job_id = ? ORDER BY seq DESC LIMIT 5",
+                                   (job_id,)).fetchall()
+        return " ".join(text.strip() for (text,) in reversed(rows))[-chars:]
+
+    def release_file(self, job):
+        # Plik przesłany przez klienta (uploads/) jest usuwany po zakończeniu zadania
+        if job["owned_file"]:
+            try:
+                os.remove(job["audio_path"])
+            except OSError:
+                pass
+
+# -------------------------------------------------
+# Kolejka priorytetowa z wywłaszczaniem
+# -------------------------------------------------
+# Kolejność: wyższy priority, potem mniej pozostałego audio (krótkie nagrania
+# nie czekają za wielogodzinnym plikiem). Gdy wszystkie wątki są zajęte,
+# a przychodzi zadanie o lepszej pozycji, najdłuższe trwające zadanie jest
+# zatrzymywane po bieżącym segmencie i wraca do kolejki - wznowi się od checkpointu.
+class JobControl:
+    def __init__(self):
+        self.stop = threading.Event()
+        self.reason = None  # "cancel", "preempt" albo "shutdown"
+
+    def request_stop(self, reason):
+        # Anulowanie ma pierwszeństwo - wywłaszczone zadanie nie może wrócić do kolejki
+        if self.reason is None or reason == "cancel":
+            self.reason = reason
+        self.stop.set()
+
+def sort_key(job):
+    remaining = UNKNOWN_DURATION if job["duration"] is None else job["duration"] - job["checkpoint"]
+    return (-job["priority"], remaining, job["created"])
+
+class JobScheduler:
+    def __init__(self, store, run_job, workers=1):
+        # run_job(job, control) dekoduje zadanie, zapisując checkpointy; zwraca pola do zapisania po sukcesie
+        self.store = store
+        self.run_job = run_job
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._heap = []
+        self._running = {}  # id -> JobControl
+        self._closed = False
+        self._threads = []
+
+    def start(self):
+        # Zadania przerwane restartem wracają do kolejki (status "running" w bazie = przerwane)
+        for job in self.store.unfinished():
+            self.store.update(job["id"], status="queued")
+            self._push(job)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._runner, name=f"jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _push(self, job):
+        with self._cond:
+            heapq.heappush(self._heap, (sort_key(job), job["id"]))
+            self._cond.notify()
+
+    def submit(self, job):
+        self._push(job)
+        self._maybe_preempt(job)
+
+    def _maybe_preempt(self, job):
+        with self._cond:
+            if len(self._running) < self.workers:
+                return
+            running = [self.store.get(job_id) for job_id in self._running]
+        candidates = [j for j in running if j is not None and j["duration"] is not None
+                      and j["duration"] - j["checkpoint"] > PREEMPT_MIN_SECONDS]
+        if not candidates:
+            return
+        victim = max(candidates, key=sort_key)
+        if sort_key(job) < sort_key(victim):
+            with self._cond:
+                control = self._running.get(victim["id"])
+                if control is not None:
+                    control.request_stop("preempt")
+
+    def cancel(self, job_id):
+        # Pod _cond: _next i _runner zmieniają status pod tą samą blokadą, więc zadanie jest
+        # albo w kolejce (anulujemy od razu), albo trwa (zatrzyma je jego wątek)
+        with self._cond:
+            job = self.store.get(job_id)
+            if job is None or job["status"] in TERMINAL:
+                return job
+            control = self._running.get(job_id)
+            if control is not None:
+                control.request_stop("cancel")  # wątek zadania zapisze status po zatrzymaniu
+            else:
+                self.store.update(job_id, status="cancelled", finished=time.time())
+        if control is None:
+            self.store.release_file(job)
+        return self.store.get(job_id)
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None, None
+                while self._heap:
+                    _, job_id = heapq.heappop(self._heap)
+                    job = self.store.get(job_id)
+                    if job is not None and job["status"] == "queued" and job_id not in self._running:
+                        control = JobControl()
+                        self._running[job_id] = control
+                        self.store.update(job_id, status="running", started=job["started"] or time.time(),
+                                          attempts=job["attempts"] + 1)
+                        return job, control
+                self._cond.wait()
+
+    def _runner(self):
+        while True:
+            job, control = self._next()
+            if job is None:
+                return
+            result = error = None
+            interrupted = requeue = False
+            try:
+                result = self.run_job(job, control)
+            except CancelledError:
+                # Pula dekodowania zamknięta razem z serwerem - zadanie wznowi się jak po "shutdown"
+                interrupted = True
+            except Exception as e:
+                error = e
+            with self._cond:
+                # Status zapisywany razem ze zdjęciem z _running - cancel() widzi albo trwające
+                # zadanie, albo już zapisany wynik
+                self._running.pop(job["id"], None)
+                if error is not None:
+                    fields = {"status": "failed", "error": str(error), "finished": time.time()}
+                elif control.reason == "cancel":
+                    fields = {"status": "cancelled", "finished": time.time()}
+                elif interrupted or control.stop.is_set():
+                    # Wywłaszczenie lub zamknięcie serwera: postęp jest w checkpoincie
+                    fields = {"status": "queued"}
+                    requeue = not self._closed if interrupted else control.reason == "preempt"
+                else:
+                    fields = {"status": "done", "finished": time.time(), **(result or {})}
+                self.store.update(job["id"], **fields)
+            if fields["status"] != "queued":
+                self.store.release_file(job)
+            elif requeue:
+                # Dopiero po zdjęciu z _running - inaczej _next innego wątku odrzuciłby je jako trwające
+                self._push(self.store.get(job["id"]))
+
+    def load(self):
+        with self._cond:
+            return {"queued": len(self._heap), "running": len(self._running)}
+
+    def snapshot(self):
+        with self._cond:
+            return {"workers": self.workers, "running": list(self._running), "queued": len(self._heap),
+                    "statuses": self.store.counts()}
+
+    def shutdown(self, timeout=10):
+        # Trwające zadania zapisują checkpoint i wracają do kolejki - wznowią się po restarcie
+        with self._cond:
+            self._closed = True
+            controls = list(self._running.values())
+            self._cond.notify_all()
+        for control in controls:
+            control.request_stop("shutdown")
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
@@ -0,0 +1,187 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# -------------------------------------------------
+# Pomiar etapów zadania (klient: GUI / tryb wsadowy)
+# -------------------------------------------------
+# Każdy etap (pobieranie, konwersja, transkrypcja, eksport...) to "span"
+# z czasem trwania, liczbą bajtów, sekundami audio i współczynnikiem czasu
+# rzeczywistego (RTF = czas etapu / czas audio). Spany trafiają do logu GUI
+# przez emit oraz jako linie JSON do pliku log_path.
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+class JobTrace:
+    def __init__(self, name="", emit=None, log_path=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.emit = emit
+        self.log_path = log_path
+        self.spans = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **fields):
+        # Pola (bytes, audio_seconds, ...) można uzupełnić w trakcie: with trace.span(...) as s: s["bytes"] = n
+        fields = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(stage, time.perf_counter() - start, **fields)
+
+    def record(self, stage, seconds, **fields):
+        span = {"stage": stage, "seconds": round(seconds, 4)}
+        span.update({k: v for k, v in fields.items() if v is not None})
+        audio = span.get("audio_seconds")
+        if audio:
+            span["rtf"] = round(seconds / audio, 4)
+        with self._lock:
+            self.spans.append(span)
+        if self.emit:
+            self.emit(self.describe(span))
+        self._write({"type": "span", **span})
+        return span
+
+    def describe(self, span):
+        parts = [f"⏱ {span['stage']}: {span['seconds']:.2f} s"]
+        if span.get("bytes"):
+            parts.append(format_bytes(span["bytes"]))
+        if span.get("audio_seconds"):
+            parts.append(f"audio {span['audio_seconds']:.0f} s, RTF {span['rtf']:.3f}")
+        return " | ".join(parts)
+
+    def finish(self, status="ok", **fields):
+        with self._lock:
+            spans = list(self.spans)
+        summary = {"type": "job", "status": status, "total_seconds": round(time.time() - self.started, 4),
+                   "stages": {s["stage"]: s["seconds"] for s in spans}, **fields}
+        self._write(summary)
+        return summary
+
+    def _write(self, record):
+        if not self.log_path:
+            return
+        record = {"job": self.job_id, "name": self.name, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), **record}
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+# -------------------------------------------------
+# Metryki serwera w formacie tekstowym Prometheusa
+# -------------------------------------------------
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # etykiety -> [liczniki kubełków..., suma, liczba]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self.values.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, entry in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {round(entry[-2], 6)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {entry[-1]}")
+        return lines
+
+class Gauge:
+    # Wartości liczone w chwili odczytu: fn() -> {krotka etykiet: wartość} albo liczba
+    def __init__(self, name, help_text, fn, labels=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# -------------------------------------------------
+# Profilowanie pojedynczego zadania (opcjonalne)
+# -------------------------------------------------
+def run_profiled(profile_dir, label, fn, *args, **kwargs):
+    # Zrzut cProfile do <profile_dir>/<czas>_<label>.prof (podgląd: python -m pstats plik.prof)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        os.makedirs(profile_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{threading.get_ident()}_{safe_label}.prof"
+        profiler.dump_stats(os.path.join(profile_dir, name))
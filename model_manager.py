@@ -0,0 +1,221 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from autotune import tuned_settings
+
+DEFAULT_COMPUTE_TYPE = "int8"
+
+# -------------------------------------------------
+# Szacowany rozmiar modeli w pamięci (MB, int8)
+# -------------------------------------------------
+MODEL_SIZES_MB = {
+    "tiny": 80, "tiny.en": 80,
+    "base": 150, "base.en": 150,
+    "small": 500, "small.en": 500,
+    "medium": 1500, "medium.en": 1500,
+    "distil-large-v3": 1600, "turbo": 1700, "large-v3-turbo": 1700,
+    "large-v1": 3100, "large-v2": 3100, "large-v3": 3100, "large": 3100,
+}
+DEFAULT_SIZE_MB = 3100
+COMPUTE_TYPE_FACTORS = {"int8": 1, "int8_float16": 1, "int8_float32": 1, "int8_bfloat16": 1,
+                        "float16": 2, "bfloat16": 2, "float32": 4}
+
+def configured_compute_type():
+    return os.environ.get("FASTER_WHISPER_COMPUTE_TYPE", DEFAULT_COMPUTE_TYPE)
+
+def estimate_model_mb(model, compute_type=DEFAULT_COMPUTE_TYPE):
+    size = MODEL_SIZES_MB.get(model, DEFAULT_SIZE_MB)
+    return size * COMPUTE_TYPE_FACTORS.get(compute_type, 1)
+
+def parse_model_list(spec):
+    # "small:cpu,large-v3:cuda" -> [("small", "cpu"), ("large-v3", "cuda")]
+    result = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, device = item.partition(":")
+        result.append((model.strip(), device.strip() or "cpu"))
+    return result
+
+# Ustawienia ładowania i dekodowania: jawne zmienne środowiskowe > profil hosta
+# (python autotune.py calibrate) > domyślne. FASTER_WHISPER_CPU_THREADS ustawia
+# też sharded_server - na liczbę rdzeni przydzielonych procesowi.
+SETTING_VARS = (("compute_type", "FASTER_WHISPER_COMPUTE_TYPE", str),
+                ("cpu_threads", "FASTER_WHISPER_CPU_THREADS", int),
+                ("num_workers", "FASTER_WHISPER_NUM_WORKERS", int),
+                ("beam_size", "FASTER_WHISPER_BEAM_SIZE", int))
+
+def model_settings(model, device, compute_type=None):
+    settings = {"compute_type": compute_type or DEFAULT_COMPUTE_TYPE, "cpu_threads": 0, "num_workers": 1,
+                "beam_size": 5}
+    settings.update(tuned_settings(model, device))
+    for name, var, cast in SETTING_VARS:
+        value = os.environ.get(var)
+        if value:
+            settings[name] = cast(value)
+    return settings
+
+def decode_options(model, device):
+    # Argumenty WhisperModel.transcribe wynikające z profilu
+    return {"beam_size": model_settings(model, device)["beam_size"]}
+
+def default_loader(model, device, compute_type):
+    from faster_whisper import WhisperModel
+    settings = model_settings(model, device, compute_type)
+    return WhisperModel(model, device=device, compute_type=settings["compute_type"],
+                        cpu_threads=settings["cpu_threads"], num_workers=settings["num_workers"])
+
+def warmup_model(whisper_model):
+    # Krótkie dekodowanie ciszy - pierwsze prawdziwe żądanie nie płaci za inicjalizację
+    import numpy as np
+    segments, _ = whisper_model.transcribe(np.zeros(16000, dtype=np.float32), language="en",
+                                           beam_size=1, vad_filter=False)
+    for _ in segments:
+        pass
+
+# -------------------------------------------------
+# Menedżer modeli z budżetem pamięci i LRU
+# -------------------------------------------------
+class ModelManager:
+    def __init__(self, budgets_mb=None, loader=None, compute_type=DEFAULT_COMPUTE_TYPE):
+        # budgets_mb: {"cpu": MB RAM, "cuda": MB VRAM}; brak wpisu = bez limitu
+        self.budgets_mb = dict(budgets_mb or {})
+        self.loader = loader or default_loader
+        self.compute_type = compute_type
+        self._models = OrderedDict()  # (model, device) -> (instancja, rozmiar MB)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._reserved = {}  # (model, device) -> MB zajęte przez procesy równoległego dekodowania
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "warmups": 0, "load_seconds": 0.0}
+
+    def get(self, model, device="cpu"):
+        key = (model, device)
+        with self._lock:
+            cached = self._hit(key)
+            if cached is not None:
+                return cached
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Blokada per klucz: dwa równoległe pierwsze żądania ładują model tylko raz
+        with key_lock:
+            with self._lock:
+                cached = self._hit(key)
+                if cached is not None:
+                    return cached
+                compute_type = self.compute_type_for(model, device)
+                size_mb = estimate_model_mb(model, compute_type)
+                evicted = self._evict_for(device, size_mb)
+            self._release(evicted)
+
+            start = time.perf_counter()
+            instance = self.loader(model, device, compute_type)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._models[key] = (instance, size_mb)
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += elapsed
+                evicted = self._evict_for(device, 0, keep=key)
+            self._release(evicted)
+        return instance
+
+    def compute_type_for(self, model, device="cpu"):
+        # compute_type z profilu hosta, jeśli jest; self.compute_type to wartość domyślna
+        return model_settings(model, device, self.compute_type)["compute_type"]
+
+    def reserve_workers(self, model, device, workers):
+        # Procesy chunked_transcribe ładują własne kopie modelu: ich liczba jest ograniczona
+        # budżetem, a zajęta pamięć liczona jak modele tutaj (może wyrzucić nieużywane modele)
+        size_mb = estimate_model_mb(model, self.compute_type_for(model, device))
+        with self._lock:
+            budget = self.budgets_mb.get(device)
+            if budget:
+                others = sum(mb for key, mb in self._reserved.items() if key[1] == device and key != (model, device))
+                workers = max(1, min(workers, (budget - others) // size_mb))
+            self._reserved[(model, device)] = size_mb * workers
+            evicted = self._evict_for(device, 0)
+        self._release(evicted)
+        return workers
+
+    def preload(self, keys, warmup=True):
+        for model, device in keys:
+            instance = self.get(model, device)
+            if warmup:
+                warmup_model(instance)
+                with self._lock:
+                    self.stats["warmups"] += 1
+
+    def evict(self, model, device="cpu"):
+        with self._lock:
+            entry = self._models.pop((model, device), None)
+            if entry is not None:
+                self.stats["evictions"] += 1
+        self._release([entry] if entry else [])
+        return entry is not None
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def used_mb(self, device):
+        with self._lock:
+            return self._used_mb(device)
+
+    def snapshot(self):
+        with self._lock:
+            devices = sorted({d for _, d in self._models} | set(self.budgets_mb))
+            return {
+                "models": [{"model": m, "device": d, "size_mb": size}
+                           for (m, d), (_, size) in self._models.items()],
+                "budgets_mb": dict(self.budgets_mb),
+                "used_mb": {d: self._used_mb(d) for d in devices},
+                "reserved_mb": {f"{m}:{d}": mb for (m, d), mb in self._reserved.items()},
+                "compute_type": self.compute_type,
+                "stats": dict(self.stats),
+            }
+
+    # --- wewnętrzne (wywoływane pod self._lock) ---
+    def _hit(self, key):
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def _used_mb(self, device):
+        return (sum(size for (_, d), (_, size) in self._models.items() if d == device)
+                + sum(mb for (_, d), mb in self._reserved.items() if d == device))
+
+    def _evict_for(self, device, extra_mb, keep=None):
+        budget = self.budgets_mb.get(device)
+        evicted = []
+        if not budget:
+            return evicted
+        for key in list(self._models.keys()):
+            if self._used_mb(device) + extra_mb <= budget:
+                break
+            if key[1] != device or key == keep:
+                continue
+            evicted.append(self._models.pop(key))
+            self.stats["evictions"] += 1
+        return evicted
+
+    def _release(self, evicted):
+        if not evicted:
+            return
+        # Żądania w toku trzymają własną referencję - pamięć zwolni się po ich zakończeniu
+        # (CTranslate2 zwalnia RAM/VRAM przy usunięciu ostatniej referencji)
+        evicted.clear()
+        gc.collect()
+
+def manager_from_env(loader=None):
+    budgets = {}
+    for device, var in (("cpu", "FASTER_WHISPER_RAM_BUDGET_MB"), ("cuda", "FASTER_WHISPER_VRAM_BUDGET_MB")):
+        value = os.environ.get(var)
+        if value:
+            budgets[device] = int(value)
+    return ModelManager(budgets, loader=loader, compute_type=configured_compute_type())
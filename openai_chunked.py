@@ -0,0 +1,211 @@
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from chunked_transcribe import is_overlap_duplicate
+
+# -------------------------------------------------
+# Transkrypcja online (OpenAI) w równoległych fragmentach
+# -------------------------------------------------
+# API przyjmuje pliki do 25 MB i zwraca znaczniki czasu tylko dla whisper-1
+# (response_format=verbose_json). Długie nagranie jest kodowane do mono MP3
+# i cięte na fragmenty z zakładką; fragmenty są wysyłane równolegle przez
+# jednego klienta HTTP z pulą połączeń, a segmenty składane z przesunięciem.
+
+OPENAI_MODEL = "whisper-1"
+MAX_UPLOAD_MB = float(os.environ.get("YT_TRANSCRIBER_OPENAI_CHUNK_MB", "24"))
+CHUNK_BITRATE = 64000  # bit/s, mono 16 kHz - wystarcza dla mowy
+DEFAULT_WORKERS = int(os.environ.get("YT_TRANSCRIBER_OPENAI_WORKERS", "4"))
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key, base_url=None, max_connections=DEFAULT_WORKERS):
+    # Klient (i pula połączeń keep-alive) jest wspólny dla fragmentów i kolejnych zadań
+    key = (api_key, base_url, max_connections)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+            http_client = httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                           max_keepalive_connections=max_connections),
+                                       timeout=httpx.Timeout(600, connect=10))
+            # Ponawianie obsługujemy sami (z uwzględnieniem Retry-After), stąd max_retries=0
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+            _clients[key] = client
+        return client
+
+# -------------------------------------------------
+# Podział pliku
+# -------------------------------------------------
+def probe_duration(audio_path):
+    if not shutil.which("ffprobe"):
+        return None
+    r = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+                       capture_output=True, text=True)
+    try:
+        return float(r.stdout.strip())
+    except ValueError:
+        return None
+
+def chunk_seconds_for(max_mb=MAX_UPLOAD_MB, bitrate=CHUNK_BITRATE):
+    # Długość fragmentu mieszcząca się w limicie po zakodowaniu (10% zapasu na nagłówki)
+    return int(max_mb * 1024 * 1024 * 8 * 0.9 / bitrate)
+
+def plan_fixed_chunks(duration, chunk_seconds, overlap_seconds=1.0):
+    # [(początek, koniec, rdzeń_od, rdzeń_do)] w sekundach - jak plan_chunks, ale cięcia co chunk_seconds
+    chunks = []
+    core_start = 0.0
+    while core_start < duration:
+        core_end = min(duration, core_start + chunk_seconds)
+        chunks.append((max(0.0, core_start - overlap_seconds), min(duration, core_end + overlap_seconds),
+                       core_start, core_end))
+        core_start = core_end
+    return chunks
+
+def extract_chunk(audio_path, start, end, out_path):
+    subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+                    "-i", audio_path, "-vn", "-ac", "1", "-ar", "16000", "-b:a", str(CHUNK_BITRATE),
+                    "-f", "mp3", out_path], check=True)
+    return out_path
+
+# -------------------------------------------------
+# Wysyłanie z ponawianiem
+# -------------------------------------------------
+def _field(obj, name, default=None):
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+def is_retryable(error):
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(RETRY_MAX_SECONDS, float(retry_after))
+    except ValueError:
+        pass
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def upload_chunk(client, path, task="transcribe", language=None, stats=None):
+    endpoint = client.audio.translations if task == "translate" else client.audio.transcriptions
+    kwargs = {"model": OPENAI_MODEL, "response_format": "verbose_json"}
+    if task != "translate":
+        kwargs["timestamp_granularities"] = ["segment"]
+        if language:
+            kwargs["language"] = language
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with open(path, "rb") as f:
+                return endpoint.create(file=f, **kwargs)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            if stats is not None:
+                stats["retries"] += 1
+            time.sleep(retry_delay(e, attempt))
+
+def response_segments(response, offset=0.0, core_from=0.0, core_to=float("inf")):
+    segments = _field(response, "segments") or []
+    if not segments:
+        # Odpowiedź bez znaczników czasu - cały tekst jako jeden segment
+        text = _field(response, "text", "") or ""
+        duration = _field(response, "duration") or 0.0
+        return [{"start": core_from, "end": offset + float(duration), "text": text}] if text.strip() else []
+    result = []
+    for seg in segments:
+        start = float(_field(seg, "start", 0.0)) + offset
+        end = float(_field(seg, "end", 0.0)) + offset
+        # Segment należy do fragmentu, którego rdzeń zawiera jego środek
+        if core_from <= (start + end) / 2 < core_to:
+            result.append({"start": start, "end": end, "text": _field(seg, "text", "")})
+    return result
+
+# -------------------------------------------------
+# Cały plik
+# -------------------------------------------------
+def transcribe_openai(audio_path, api_key, task="transcribe", language=None, workers=None, max_mb=MAX_UPLOAD_MB,
+                      base_url=None, on_info=None, on_segment=None, stop=None):
+    # Zwraca (segmenty, statystyki). on_segment dostaje segmenty w kolejności nagrania.
+    workers = max(1, workers or DEFAULT_WORKERS)
+    client = get_client(api_key, base_url, workers)
+    stats = {"chunks": 0, "retries": 0, "bytes": 0}
+
+    duration = probe_duration(audio_path)
+    size_mb = os.path.getsize(audio_path) / 1024 / 1024
+    if size_mb <= max_mb and (duration is None or duration <= chunk_seconds_for(max_mb)):
+        # Mały plik - wysyłany bez ponownego kodowania
+        chunks = None
+    elif duration is None or not shutil.which("ffmpeg"):
+        raise RuntimeError(f"Plik ma {size_mb:.0f} MB (limit API {max_mb:.0f} MB), a do podziału potrzebny jest ffmpeg.")
+    else:
+        chunks = plan_fixed_chunks(duration, chunk_seconds_for(max_mb))
+    stats["chunks"] = len(chunks) if chunks else 1
+    if on_info:
+        on_info({"duration": duration, "chunks": stats["chunks"], "workers": min(workers, stats["chunks"])})
+
+    if chunks is None:
+        stats["bytes"] = os.path.getsize(audio_path)
+        segments = response_segments(upload_chunk(client, audio_path, task, language, stats))
+        for seg in segments:
+            if on_segment:
+                on_segment(seg)
+        return segments, stats
+
+    work_dir = tempfile.mkdtemp(prefix="yt_openai_")
+    stats_lock = threading.Lock()
+
+    def run_chunk(index, start, end, core_start, core_end):
+        if stop is not None and stop.is_set():
+            return []
+        path = extract_chunk(audio_path, start, end, os.path.join(work_dir, f"chunk_{index:04}.mp3"))
+        try:
+            with stats_lock:
+                stats["bytes"] += os.path.getsize(path)
+            response = upload_chunk(client, path, task, language, stats)
+        finally:
+            os.remove(path)
+        # Ostatni fragment obejmuje wszystko do końca nagrania
+        core_to = float("inf") if index == len(chunks) - 1 else core_end
+        return response_segments(response, start, core_start, core_to)
+
+    results = [None] * len(chunks)
+    emitted = 0
+    merged = []
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(run_chunk, i, *chunk): i for i, chunk in enumerate(chunks)}
+    try:
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            # Segmenty wysyłane po kolei - fragment N dopiero gdy gotowe są 0..N-1
+            while emitted < len(results) and results[emitted] is not None:
+                for seg in results[emitted]:
+                    if merged and is_overlap_duplicate(merged[-1], seg):
+                        continue
+                    merged.append(seg)
+                    if on_segment:
+                        on_segment(seg)
+                results[emitted] = ()
+                emitted += 1
+            if stop is not None and stop.is_set():
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return merged, stats
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_INDEX_PATH = os.environ.get("YT_TRANSCRIBER_INDEX_PATH",
+                                    os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "search.sqlite"))
+SUBTITLE_EXTENSIONS = (".srt", ".vtt", ".json")
+# YT_TRANSCRIBER_INDEX=0 wyłącza indeksowanie zakończonych zadań
+INDEX_ENABLED = os.environ.get("YT_TRANSCRIBER_INDEX", "1") != "0"
+
+# -------------------------------------------------
+# Indeks pełnotekstowy transkryptów (SQLite FTS5)
+# -------------------------------------------------
+# Każdy segment to osobny wiersz FTS z czasem początku, więc trafienie od razu
+# wskazuje miejsce w nagraniu. unicode61 z remove_diacritics: "gesc" znajdzie "gęść"
+# (litera "ł" nie ma rozkładu Unicode i pozostaje odrębna).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    title TEXT,
+    video_id TEXT,
+    file TEXT,
+    mtime REAL,
+    duration REAL,
+    segment_count INTEGER,
+    first_row INTEGER,
+    indexed REAL
+);
+CREATE INDEX IF NOT EXISTS documents_file ON documents(file);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text, doc_id UNINDEXED, start UNINDEXED, end UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+TIMESTAMP_RE = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})")
+
+def parse_timestamp(value):
+    match = TIMESTAMP_RE.search(value)
+    if not match:
+        return 0.0
+    h, m, s, ms = match.groups()
+    return int(h or 0) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+class NotTranscriptError(ValueError):
+    pass
+
+def parse_subtitles(path):
+    # SRT/VTT (bloki: [numer], "początek --> koniec", tekst) lub JSON z eksportera
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Inne pliki JSON w katalogu (np. batch_manifest.json) nie są transkryptami
+        segments = data.get("segments") if isinstance(data, dict) else None
+        if not isinstance(segments, list) or not all(isinstance(seg, dict) for seg in segments):
+            raise NotTranscriptError(f"To nie jest plik transkryptu: {path}")
+        return segments
+    segments = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        blocks = re.split(r"\n\s*\n", f.read().replace("\r\n", "\n"))
+    for block in blocks:
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            if "-->" in line:
+                start, _, end = line.partition("-->")
+                text = " ".join(l.strip() for l in lines[i + 1:]).strip()
+                if text:
+                    segments.append({"start": parse_timestamp(start), "end": parse_timestamp(end), "text": text})
+                break
+    return segments
+
+def phrase_query(text):
+    # Cała fraza w cudzysłowie - bez interpretowania składni FTS5
+    return '"' + text.replace('"', '""') + '"'
+
+def jump_link(video_id, source, start):
+    seconds = int(start)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}&t={seconds}s"
+    return f"{source}#t={seconds}"
+
+class SearchIndex:
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_INDEX_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def add(self, source, segments, title=None, video_id=None, file=None, mtime=None):
+        # Dodaje lub zastępuje dokument; zwraca liczbę zaindeksowanych segmentów
+        rows = []
+        duration = 0.0
+        for seg in segments:
+            text = seg.get("text", "").strip()
+            if text:
+                start = seg.get("start", 0)
+                end = seg.get("end", start)
+                rows.append((text, start, end))
+                duration = max(duration, end)
+        with self._lock, self.db:
+            self._remove(source)
+            # Segmenty dokumentu dostają kolejne rowid - usuwanie to zakres, bez przeszukiwania tabeli FTS
+            first_row = self.db.execute("SELECT rowid FROM segments ORDER BY rowid DESC LIMIT 1").fetchone()
+            first_row = (first_row[0] if first_row else 0) + 1
+            cur = self.db.execute(
+                "INSERT INTO documents (source, title, video_id, file, mtime, duration, segment_count, first_row, indexed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, title, video_id, file, mtime, duration, len(rows), first_row, time.time()))
+            doc_id = cur.lastrowid
+            self.db.executemany("INSERT INTO segments (rowid, text, doc_id, start, end) VALUES (?, ?, ?, ?, ?)",
+                                ((first_row + i, text, doc_id, start, end) for i, (text, start, end) in enumerate(rows)))
+        return len(rows)
+
+    def remove(self, source):
+        with self._lock, self.db:
+            return self._remove(source)
+
+    def _remove(self, source):
+        row = self.db.execute("SELECT id, first_row, segment_count FROM documents WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            return False
+        doc_id, first_row, count = row
+        self.db.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?", (first_row, first_row + count - 1))
+        self.db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        return True
+
+    def is_current(self, file, mtime):
+        with self._lock:
+            row = self.db.execute("SELECT MAX(mtime) FROM documents WHERE file = ?", (file,)).fetchone()
+        return row[0] is not None and row[0] >= mtime
+
+    def ingest_file(self, path, force=False):
+        # Plik napisów; pomijany, jeśli już zaindeksowany (także jako wynik zadania) i niezmieniony
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        if not force and self.is_current(path, mtime):
+            return None
+        title = os.path.splitext(os.path.basename(path))[0]
+        return self.add(path, parse_subtitles(path), title=title, file=path, mtime=mtime)
+
+    def ingest(self, paths, force=False, on_file=None):
+        # Pliki lub katalogi (rekurencyjnie); zwraca (plików zaindeksowanych, pominiętych, segmentów)
+        indexed = skipped = total = 0
+        for path in paths:
+            if os.path.isdir(path):
+                files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names)
+                         if name.lower().endswith(SUBTITLE_EXTENSIONS)]
+            else:
+                files = [path]
+            for file in files:
+                try:
+                    count = self.ingest_file(file, force)
+                except NotTranscriptError:
+                    continue
+                except (OSError, ValueError) as e:
+                    if on_file:
+                        on_file(file, e)
+                    continue
+                if count is None:
+                    skipped += 1
+                    continue
+                indexed += 1
+                total += count
+                if on_file:
+                    on_file(file, count)
+        return indexed, skipped, total
+
+    def search(self, query, limit=20, raw=False):
+        # Trafienia od najlepszego (bm25); raw=True przekazuje zapytanie w składni FTS5 (AND, OR, NEAR, prefix*)
+        match = query if raw else phrase_query(query)
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT d.source, d.title, d.video_id, s.start, s.end, highlight(segments, 0, '[', ']'), "
+                "bm25(segments) FROM segments s JOIN documents d ON d.id = s.doc_id "
+                "WHERE segments MATCH ? ORDER BY rank LIMIT ?", (match, limit)).fetchall()
+        return [{"source": source, "title": title, "video_id": video_id, "start": start, "end": end,
+                 "text": text, "score": round(-score, 4), "link": jump_link(video_id, source, start)}
+                for source, title, video_id, start, end, text, score in rows]
+
+    def stats(self):
+        with self._lock:
+            documents, segments, hours = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(segment_count), 0), COALESCE(SUM(duration), 0) / 3600 "
+                "FROM documents").fetchone()
+        return {"path": self.path, "documents": documents, "segments": segments, "hours": round(hours, 2),
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_index():
+    # Jedno połączenie na proces (zadania GUI, tryb wsadowy, serwer)
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SearchIndex()
+        return _shared
+
+# -------------------------------------------------
+# CLI: python search_index.py search "fraza" | ingest KATALOG | stats | remove ŹRÓDŁO
+# -------------------------------------------------
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wyszukiwanie fraz we wszystkich transkryptach")
+    parser.add_argument("--index", default=None, help="plik indeksu (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search = sub.add_parser("search", help="szukaj frazy")
+    search.add_argument("query")
+    search.add_argument("-n", "--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true", help="zapytanie w składni FTS5 zamiast frazy")
+    search.add_argument("--json", action="store_true", help="wynik jako JSON")
+    ingest = sub.add_parser("ingest", help="zaindeksuj pliki SRT/VTT/JSON (pliki lub katalogi)")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--force", action="store_true", help="indeksuj ponownie niezmienione pliki")
+    sub.add_parser("stats", help="liczba dokumentów i segmentów")
+    remove = sub.add_parser("remove", help="usuń dokument z indeksu")
+    remove.add_argument("source")
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    if args.command == "search":
+        start = time.perf_counter()
+        hits = index.search(args.query, args.limit, args.raw)
+        took = (time.perf_counter() - start) * 1000
+        if args.json:
+            print(json.dumps({"hits": hits, "took_ms": round(took, 2)}, ensure_ascii=False, indent=2))
+        else:
+            for hit in hits:
+                print(f"{format_time(hit['start'])}  {hit['title'] or hit['source']}\n    {hit['text']}\n    {hit['link']}")
+            print(f"Trafień: {len(hits)} ({took:.1f} ms)", file=sys.stderr)
+    elif args.command == "ingest":
+        def report(path, result):
+            if isinstance(result, Exception):
+                print(f"Błąd: {path}: {result}", file=sys.stderr)
+            else:
+                print(f"{path}: {result} seg.")
+        indexed, skipped, total = index.ingest(args.paths, args.force, on_file=report)
+        print(f"Zaindeksowano plików: {indexed} ({total} segmentów), bez zmian: {skipped}")
+    elif args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+    elif args.command == "remove":
+        if not index.remove(args.source):
+            print(f"Brak dokumentu: {args.source}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
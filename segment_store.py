@@ -0,0 +1,157 @@
+import json
+import struct
+import sys
+from array import array
+
+# -------------------------------------------------
+# Zwarta, kolumnowa lista segmentów
+# -------------------------------------------------
+# Zamiast listy słowników {"start", "end", "text"}: czasy w dwóch tablicach
+# float64, tekst w jednym buforze UTF-8 z tablicą przesunięć. Segment to
+# lekki widok (__slots__) z .get() i [] jak w słowniku, więc eksportery i
+# reszta kodu działają bez zmian.
+
+SEGMENTS_MEDIA_TYPE = "application/x-yt-segments"
+MAGIC = b"YTSG"
+VERSION = 1
+# magic, wersja, zarezerwowane, liczba segmentów, bajty tekstu, bajty metadanych JSON
+HEADER = struct.Struct("<4sHHIQI")
+FIELDS = frozenset(("start", "end", "text"))
+
+class Segment:
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def start(self):
+        return self.store.starts[self.index]
+
+    @property
+    def end(self):
+        return self.store.ends[self.index]
+
+    @property
+    def text(self):
+        return self.store.text_at(self.index)
+
+    def __getitem__(self, key):
+        if key == "start":
+            return self.store.starts[self.index]
+        if key == "end":
+            return self.store.ends[self.index]
+        if key == "text":
+            return self.store.text_at(self.index)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in FIELDS else default
+
+    def to_dict(self):
+        return {"start": self.start, "end": self.end, "text": self.text}
+
+    def __repr__(self):
+        return f"Segment({self.start:.2f}-{self.end:.2f}, {self.text!r})"
+
+class SegmentStore:
+    __slots__ = ("starts", "ends", "offsets", "buffer")
+
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.offsets = array("q", [0])
+        self.buffer = bytearray()
+
+    @classmethod
+    def from_dicts(cls, segments):
+        store = cls()
+        store.extend(segments)
+        return store
+
+    def append(self, start, end, text):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.buffer += text.encode("utf-8")
+        self.offsets.append(len(self.buffer))
+
+    def extend(self, segments):
+        for seg in segments:
+            start = seg.get("start", 0)
+            self.append(start, seg.get("end", start), seg.get("text", ""))
+
+    def text_at(self, index):
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return Segment(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Segment(self, index)
+
+    def to_dicts(self):
+        return [seg.to_dict() for seg in self]
+
+    def full_text(self):
+        return " ".join(self.text_at(i).strip() for i in range(len(self))).strip()
+
+    @property
+    def nbytes(self):
+        return (len(self.starts) + len(self.ends)) * 8 + len(self.offsets) * 8 + len(self.buffer)
+
+    # --- format binarny (application/x-yt-segments) ---
+    # Nagłówek HEADER, potem starts (f64), ends (f64), offsets (i64, liczba+1),
+    # tekst UTF-8 i metadane JSON (pozostałe pola odpowiedzi); wszystko little-endian.
+    def to_bytes(self, meta=None):
+        meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+        columns = [self.starts, self.ends, self.offsets]
+        if sys.byteorder != "little":
+            columns = [array(c.typecode, c) for c in columns]
+            for column in columns:
+                column.byteswap()
+        return b"".join([HEADER.pack(MAGIC, VERSION, 0, len(self), len(self.buffer), len(meta_bytes)),
+                         *(c.tobytes() for c in columns), bytes(self.buffer), meta_bytes])
+
+    @classmethod
+    def from_bytes(cls, data):
+        # Zwraca (store, metadane); rozmiar musi zgadzać się z nagłówkiem, a przesunięcia rosnąć do końca tekstu
+        if len(data) < HEADER.size:
+            raise ValueError("Uszkodzone dane segmentów: za krótki nagłówek.")
+        magic, version, _, count, text_len, meta_len = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Nieobsługiwany format segmentów.")
+        expected = HEADER.size + (3 * count + 1) * 8 + text_len + meta_len
+        if len(data) != expected:
+            raise ValueError(f"Uszkodzone dane segmentów: {len(data)} bajtów zamiast {expected} "
+                             f"(segmentów: {count}, tekst: {text_len} B, metadane: {meta_len} B).")
+        view = memoryview(data)
+        pos = HEADER.size
+        store = cls()
+        columns = []
+        for typecode, items in (("d", count), ("d", count), ("q", count + 1)):
+            column = array(typecode)
+            column.frombytes(view[pos:pos + items * 8])
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns.append(column)
+            pos += items * 8
+        store.starts, store.ends, store.offsets = columns
+        offsets = store.offsets
+        if offsets[0] != 0 or offsets[-1] != text_len or any(a > b for a, b in zip(offsets, offsets[1:])):
+            raise ValueError("Uszkodzone dane segmentów: niepoprawne przesunięcia tekstu.")
+        store.buffer = bytearray(view[pos:pos + text_len])
+        pos += text_len
+        meta = json.loads(bytes(view[pos:pos + meta_len]).decode("utf-8")) if meta_len else {}
+        return store, meta
@@ -0,0 +1,579 @@
+import uvicorn
+try:
+    import python_multipart as multipart
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from metrics import Registry, Gauge
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+import json
+import os
+import re
+from urllib.parse import parse_qsl
+
+# -------------------------------------------------
+# Serwer z podziałem na procesy (shardy)
+# -------------------------------------------------
+# Front-end przyjmuje te same żądania co faster_server i przekazuje je do N
+# procesów faster_server. Każdy proces ma własny podzbiór rdzeni (sched_setaffinity),
+# własną liczbę wątków CTranslate2, modele, pulę dekodowania i bazę zadań.
+# Żądanie trafia do najmniej obciążonego procesu, z preferencją dla tego, który
+# ma już załadowany potrzebny model. Proces, który padł lub przestał odpowiadać
+# na /health, jest uruchamiany ponownie (jego zadania /jobs wznowią się od checkpointu).
+
+app = FastAPI()
+SERVICE_NAME = "yt-transcriber-faster-whisper"
+STARTED_AT = time.time()
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faster_server.py")
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+DEFAULT_SHARD_CPUS = 8  # FASTER_WHISPER_SHARDS=auto: jeden proces na tyle rdzeni
+HEALTH_INTERVAL = 2.0
+HEALTH_TIMEOUT = 2.0
+HEALTH_FAILURES = 3  # tyle nieudanych sprawdzeń z rzędu -> restart procesu
+START_TIMEOUT = float(os.environ.get("FASTER_WHISPER_START_TIMEOUT", "60"))
+# Koszt braku modelu w procesie, w "żądaniach w toku" - ładowanie to kilka-kilkadziesiąt sekund
+AFFINITY_PENALTY = float(os.environ.get("FASTER_WHISPER_SHARD_AFFINITY", "2"))
+# Formularz: tyle bajtów przed plikiem jest buforowane (pola model/device wybierają proces)
+PREFETCH_BYTES = 1024 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+router = None
+http = None
+monitor_task = None
+job_shards = {}  # id zadania -> shard (uzupełniane przy POST /jobs i wyszukiwaniu)
+
+# -------------------------------------------------
+# Podział rdzeni
+# -------------------------------------------------
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def parse_cpu_list(spec):
+    # "0-3,8" -> [0, 1, 2, 3, 8]
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(cpus))
+
+def format_cpu_list(cpus):
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def plan_shards(count, cpus=None):
+    # Ciągłe, możliwie równe grupy rdzeni (sąsiednie rdzenie częściej dzielą cache L2/L3)
+    cpus = sorted(cpus or available_cpus())
+    count = max(1, min(count, len(cpus)))
+    size, extra = divmod(len(cpus), count)
+    groups = []
+    pos = 0
+    for i in range(count):
+        n = size + (1 if i < extra else 0)
+        groups.append(cpus[pos:pos + n])
+        pos += n
+    return groups
+
+def shard_count(value=None, cpus=None):
+    value = value or os.environ.get("FASTER_WHISPER_SHARDS", "1")
+    if value == "auto":
+        return max(1, len(cpus or available_cpus()) // DEFAULT_SHARD_CPUS)
+    return max(1, int(value))
+
+# -------------------------------------------------
+# Procesy robocze
+# -------------------------------------------------
+class Shard:
+    def __init__(self, index, port, cpus, jobs_dir=None):
+        self.index = index
+        self.port = port
+        self.cpus = cpus
+        self.jobs_dir = jobs_dir
+        self.process = None
+        self.started = 0.0
+        self.healthy = False
+        self.failures = 0
+        self.restarts = 0
+        self.inflight = 0  # żądania przekazane przez front-end, jeszcze bez pełnej odpowiedzi
+        self.jobs = 0  # zadania /jobs oczekujące lub trwające (z /health, +1 przy zgłoszeniu)
+        self.queue = {}
+        self.models = set()
+        self.assigned = {}  # (model, urządzenie) -> czas skierowania; model może się jeszcze ładować
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        env = {**os.environ, "FASTER_WHISPER_CPU_THREADS": str(len(self.cpus))}
+        if self.jobs_dir:
+            env["FASTER_WHISPER_JOBS_DIR"] = self.jobs_dir
+        command = [sys.executable, SERVER_SCRIPT, "--host", "127.0.0.1", "--port", str(self.port),
+                   "--cpus", format_cpu_list(self.cpus)]
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, env=env)
+        self.started = time.monotonic()
+        self.healthy = False
+        self.failures = 0
+        self.models = set()
+        self.assigned = {}
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout=15):
+        # SIGTERM: uvicorn kończy się łagodnie, zadania /jobs zapisują checkpoint
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def update(self, health):
+        self.healthy = True
+        self.failures = 0
+        self.models = {(m["model"], m["device"]) for m in health.get("models", [])}
+        self.queue = health.get("queue", {})
+        jobs = health.get("jobs") or {}
+        self.jobs = jobs.get("queued", 0) + jobs.get("running", 0)
+
+    def has_model(self, key):
+        if key in self.models:
+            return True
+        assigned = self.assigned.get(key)
+        return assigned is not None and time.monotonic() - assigned < START_TIMEOUT
+
+    def load(self):
+        return self.inflight + self.jobs
+
+    def snapshot(self):
+        return {"index": self.index, "url": self.url, "pid": self.process.pid if self.process else None,
+                "cpus": format_cpu_list(self.cpus), "healthy": self.healthy, "restarts": self.restarts,
+                "inflight": self.inflight, "jobs": self.jobs, "queue": self.queue,
+                "models": [{"model": m, "device": d} for m, d in sorted(self.models)]}
+
+class ShardRouter:
+    def __init__(self, shards, affinity_penalty=AFFINITY_PENALTY):
+        self.shards = shards
+        self.affinity_penalty = affinity_penalty
+
+    def healthy(self):
+        return [shard for shard in self.shards if shard.healthy]
+
+    def pick(self, model, device):
+        # Najmniejsze obciążenie; proces bez modelu "płaci" affinity_penalty za jego załadowanie
+        shards = self.healthy()
+        if not shards:
+            raise HTTPException(status_code=503, detail="Brak działających procesów transkrypcji",
+                                headers={"Retry-After": "5"})
+        key = (model, device)
+        def cost(shard):
+            has_model = shard.has_model(key)
+            return shard.load() + (0 if has_model else self.affinity_penalty), not has_model, shard.index
+        shard = min(shards, key=cost)
+        shard.assigned[key] = time.monotonic()
+        return shard
+
+def router_from_env(shards=None, cpus=None, base_port=8001, jobs_dir=None):
+    cpus = cpus or available_cpus()
+    groups = plan_shards(shard_count(shards, cpus), cpus)
+    jobs_dir = jobs_dir or os.environ.get("FASTER_WHISPER_JOBS_DIR",
+                                          os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "jobs"))
+    # Osobna baza zadań dla każdego procesu - po restarcie shard wznawia swoje zadania
+    return ShardRouter([Shard(i, base_port + i, group, os.path.join(jobs_dir, f"shard-{i}"))
+                        for i, group in enumerate(groups)])
+
+# -------------------------------------------------
+# Monitorowanie
+# -------------------------------------------------
+async def check_shard(shard):
+    import httpx
+    if not shard.alive():
+        print(f"Proces {shard.index} zakończył działanie - uruchamiam ponownie", file=sys.stderr)
+        shard.healthy = False
+        await asyncio.to_thread(shard.restart)
+        return
+    try:
+        r = await http.get(f"{shard.url}/health", timeout=HEALTH_TIMEOUT)
+        r.raise_for_status()
+        shard.update(r.json())
+    except (httpx.HTTPError, ValueError):
+        shard.failures += 1
+        # Podczas uruchamiania (import, ładowanie modeli) brak odpowiedzi jest normalny
+        starting = not shard.healthy and time.monotonic() - shard.started < START_TIMEOUT
+        if shard.failures >= HEALTH_FAILURES and not starting:
+            print(f"Proces {shard.index} nie odpowiada - uruchamiam ponownie", file=sys.stderr)
+            shard.healthy = False
+            await asyncio.to_thread(shard.restart)
+
+async def monitor():
+    while True:
+        await asyncio.gather(*(check_shard(shard) for shard in router.shards))
+        await asyncio.sleep(HEALTH_INTERVAL if router.healthy() else 0.2)
+
+@app.on_event("startup")
+async def start_shards():
+    global http, monitor_task
+    import httpx
+    # Bez limitu czasu odczytu - strumienie i długie dekodowania
+    http = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5),
+                             limits=httpx.Limits(max_connections=None, max_keepalive_connections=64))
+    for shard in router.shards:
+        shard.start()
+    monitor_task = asyncio.create_task(monitor())
+
+@app.on_event("shutdown")
+async def stop_shards():
+    if monitor_task is not None:
+        monitor_task.cancel()
+    for shard in router.shards:
+        if shard.alive():
+            shard.process.terminate()
+    await asyncio.gather(*(asyncio.to_thread(shard.stop) for shard in router.shards))
+    await http.aclose()
+
+# -------------------------------------------------
+# Metryki front-endu i złożone /metrics procesów
+# -------------------------------------------------
+registry = Registry()
+registry.add(Gauge("whisper_shard_healthy", "Proces odpowiada na /health", lambda: {
+    (str(s.index),): int(s.healthy) for s in router.shards}, ("shard",)))
+registry.add(Gauge("whisper_shard_inflight", "Żądania w toku w procesie", lambda: {
+    (str(s.index),): s.inflight for s in router.shards}, ("shard",)))
+registry.add(Gauge("whisper_shard_restarts", "Ponowne uruchomienia procesu", lambda: {
+    (str(s.index),): s.restarts for s in router.shards}, ("shard",)))
+
+SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (.+)$")
+
+def merge_metrics(texts):
+    # texts: {indeks procesu: tekst /metrics}. Próbki dostają etykietę shard, a rodziny
+    # (HELP/TYPE + próbki) z wszystkich procesów są zebrane razem, jak wymaga format Prometheusa
+    families = {}
+    for index, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                family = families.setdefault(line.split()[2], {"meta": [], "samples": []})
+            if line.startswith("#"):
+                if family is not None and line not in family["meta"]:
+                    family["meta"].append(line)
+                continue
+            match = SAMPLE_RE.match(line)
+            if match is None or family is None:
+                continue
+            name, labels, value = match.groups()
+            labels = f'shard="{index}"' + (f",{labels}" if labels else "")
+            family["samples"].append(f"{name}{{{labels}}} {value}")
+    lines = []
+    for family in families.values():
+        lines.extend(family["meta"])
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n" if lines else ""
+
+# -------------------------------------------------
+# Przekazywanie żądań
+# -------------------------------------------------
+def is_local(request):
+    return request.client is not None and request.client.host in LOCAL_CLIENTS
+
+class FormRelay:
+    # Ciało formularza idzie do procesu strumieniowo, bez kopii na dysku front-endu. Pola przed
+    # plikiem (model, device) są buforowane i wybierają proces. Parser widzi całe ciało: pole path
+    # od zdalnego klienta przerywa przekazywanie, zanim proces dostanie koniec formularza
+    # (a proces czyta cały formularz, zanim użyje ścieżki).
+    def __init__(self, request):
+        self.local = is_local(request)
+        self.fields = {}
+        self.headers = {name: request.headers[name] for name in ("content-type", "content-length")
+                        if name in request.headers}
+        self._chunks = request.stream().__aiter__()
+        self._buffered = []
+        self._finished = False
+        self._in_file = False
+        self._part = {}
+        self._parser = None
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            _, params = multipart.multipart.parse_options_header(content_type)
+            if not params.get(b"boundary"):
+                raise HTTPException(status_code=400, detail="Brak granicy (boundary) w nagłówku multipart")
+            self._parser = multipart.MultipartParser(params[b"boundary"], {
+                "on_part_begin": self._part_begin, "on_header_field": self._header_field,
+                "on_header_value": self._header_value, "on_header_end": self._header_end,
+                "on_headers_finished": self._headers_finished, "on_part_data": self._part_data,
+                "on_part_end": self._part_end})
+
+    def _part_begin(self):
+        self._part = {"headers": {}, "field": b"", "value": b"", "data": [], "file": False}
+
+    def _header_field(self, data, start, end):
+        self._part["field"] += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._part["value"] += data[start:end]
+
+    def _header_end(self):
+        self._part["headers"][self._part["field"].decode("latin-1").lower()] = self._part["value"]
+        self._part["field"] = self._part["value"] = b""
+
+    def _headers_finished(self):
+        _, options = multipart.multipart.parse_options_header(self._part["headers"].get("content-disposition", b""))
+        self._part["name"] = options.get(b"name", b"").decode("utf-8")
+        self._part["file"] = options.get(b"filename") is not None
+        self._in_file = self._in_file or self._part["file"]
+
+    def _part_data(self, data, start, end):
+        if not self._part["file"]:
+            self._part["data"].append(data[start:end])
+            if sum(map(len, self._part["data"])) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Pole formularza {self._part['name']} jest za duże")
+
+    def _part_end(self):
+        if not self._part["file"] and self._part.get("name"):
+            self._field(self._part["name"], b"".join(self._part["data"]).decode("utf-8"))
+
+    def _field(self, name, value):
+        # Front-end łączy się z procesami z localhost - sprawdzenie klienta musi być tutaj
+        if name == "path" and value and not self.local:
+            raise HTTPException(status_code=403, detail="Ścieżki lokalne są dozwolone tylko dla klientów z localhost")
+        self.fields[name] = value
+
+    def _feed(self, chunk):
+        if self._parser is None:
+            return
+        try:
+            self._parser.write(chunk)
+        except multipart.exceptions.FormParserError as e:
+            raise HTTPException(status_code=400, detail=f"Niepoprawne dane multipart: {e}")
+
+    def _finish(self):
+        self._finished = True
+        if self._parser is not None:
+            self._parser.finalize()
+        else:
+            # application/x-www-form-urlencoded (np. sama ścieżka) - całe ciało jest już w buforze
+            for name, value in parse_qsl(b"".join(self._buffered).decode("utf-8"), keep_blank_values=True):
+                self._field(name, value)
+
+    async def prefetch(self):
+        size = 0
+        async for chunk in self._chunks:
+            self._feed(chunk)
+            self._buffered.append(chunk)
+            size += len(chunk)
+            if size > PREFETCH_BYTES and self._parser is None:
+                raise HTTPException(status_code=413, detail="Formularz bez pliku jest za duży")
+            if self._in_file or size > PREFETCH_BYTES:
+                return self
+        self._finish()
+        return self
+
+    def pick(self):
+        return router.pick(self.fields.get("model") or "large-v2", self.fields.get("device") or "cpu")
+
+    async def body(self):
+        buffered, self._buffered = self._buffered, []
+        for chunk in buffered:
+            yield chunk
+        if self._finished:
+            return
+        async for chunk in self._chunks:
+            self._feed(chunk)  # przed wysłaniem: odrzucone pole nie dociera do procesu
+            yield chunk
+        self._finish()
+
+def forward_headers(request):
+    return {"accept": request.headers["accept"]} if "accept" in request.headers else {}
+
+async def send(shard, method, path, request, headers=None, **kwargs):
+    import httpx
+    upstream = http.build_request(method, f"{shard.url}{path}", params=request.query_params,
+                                  headers={**forward_headers(request), **(headers or {})}, **kwargs)
+    try:
+        return await http.send(upstream, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Proces {shard.index}: {e}")
+
+async def proxy(shard, method, path, request, **kwargs):
+    # Odpowiedź przekazywana strumieniowo (NDJSON na bieżąco); licznik obciążenia do jej końca
+    shard.inflight += 1
+    try:
+        response = await send(shard, method, path, request, **kwargs)
+    except BaseException:
+        shard.inflight -= 1
+        raise
+
+    async def close():
+        await response.aclose()
+        shard.inflight -= 1
+
+    headers = {name: response.headers[name] for name in ("content-type", "retry-after") if name in response.headers}
+    return StreamingResponse(response.aiter_raw(), status_code=response.status_code, headers=headers,
+                             background=BackgroundTask(close))
+
+async def fetch_json(shard, path, params=None):
+    import httpx
+    try:
+        r = await http.get(f"{shard.url}{path}", params=params, timeout=HEALTH_TIMEOUT * 5)
+        return r.status_code, r.json()
+    except (httpx.HTTPError, ValueError):
+        return None, None
+
+def any_shard():
+    shards = router.healthy()
+    if not shards:
+        raise HTTPException(status_code=503, detail="Brak działających procesów transkrypcji")
+    return min(shards, key=lambda s: (s.load(), s.index))
+
+@app.get("/health")
+async def health():
+    shards = router.healthy()
+    body = {
+        "service": SERVICE_NAME,
+        "status": "ok" if shards else "starting",
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - STARTED_AT, 1),
+        "models": [{"model": m, "device": d} for m, d in sorted(set().union(*(s.models for s in shards)))],
+        "queue": {"waiting": sum(s.queue.get("waiting", 0) for s in shards),
+                  "running": sum(s.queue.get("running", 0) for s in shards)},
+        "shards": {"total": len(router.shards), "healthy": len(shards)},
+    }
+    # 503 dopóki żaden proces nie jest gotowy - klient czeka jak na pojedynczy serwer
+    return JSONResponse(body, status_code=200 if shards else 503)
+
+@app.get("/workers")
+async def workers():
+    return {"shards": [shard.snapshot() for shard in router.shards]}
+
+@app.get("/metrics")
+async def metrics():
+    import httpx
+    texts = {}
+    for shard in router.healthy():
+        try:
+            r = await http.get(f"{shard.url}/metrics", timeout=HEALTH_TIMEOUT * 5)
+            texts[shard.index] = r.text
+        except httpx.HTTPError:
+            continue
+    return PlainTextResponse(registry.render() + merge_metrics(texts), media_type="text/plain; version=0.0.4")
+
+async def gather_shards(path):
+    shards = router.healthy()
+    results = await asyncio.gather(*(fetch_json(shard, path) for shard in shards))
+    return {"shards": [{"index": shard.index, **(body if isinstance(body, dict) else {})}
+                       for shard, (_, body) in zip(shards, results)]}
+
+@app.get("/models")
+async def model_stats():
+    return await gather_shards("/models")
+
+@app.get("/queue")
+async def queue_stats():
+    return await gather_shards("/queue")
+
+# Pamięć podręczna transkrypcji i indeks wyszukiwania są wspólne (pliki na dysku) - wystarczy jeden proces
+@app.get("/cache")
+async def cache_stats(request: Request):
+    return await proxy(any_shard(), "GET", "/cache", request)
+
+@app.get("/search")
+async def search(request: Request):
+    return await proxy(any_shard(), "GET", "/search", request)
+
+@app.post("/transcribe")
+async def transcribe(request: Request):
+    relay = await FormRelay(request).prefetch()
+    return await proxy(relay.pick(), "POST", "/transcribe", request, content=relay.body(), headers=relay.headers)
+
+@app.post("/transcribe/stream")
+async def transcribe_stream(request: Request):
+    relay = await FormRelay(request).prefetch()
+    return await proxy(relay.pick(), "POST", "/transcribe/stream", request, content=relay.body(),
+                       headers=relay.headers)
+
+# -------------------------------------------------
+# Zadania (/jobs) - każde żyje w bazie procesu, który je przyjął
+# -------------------------------------------------
+@app.post("/jobs")
+async def create_job(request: Request):
+    relay = await FormRelay(request).prefetch()
+    shard = relay.pick()
+    response = await send(shard, "POST", "/jobs", request, content=relay.body(), headers=relay.headers)
+    body = await response.aread()
+    await response.aclose()
+    if response.status_code == 200:
+        job_shards[json.loads(body)["id"]] = shard
+        shard.jobs += 1
+    return Response(body, status_code=response.status_code, media_type=response.headers.get("content-type"))
+
+async def locate_job(job_id):
+    shard = job_shards.get(job_id)
+    if shard is not None and shard.healthy:
+        return shard
+    # Po restarcie front-endu mapowanie jest puste - pytamy procesy po kolei
+    for shard in router.healthy():
+        status, _ = await fetch_json(shard, f"/jobs/{job_id}")
+        if status == 200:
+            job_shards[job_id] = shard
+            return shard
+    raise HTTPException(status_code=404, detail=f"Brak zadania: {job_id}")
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 100):
+    results = await asyncio.gather(*(fetch_json(shard, "/jobs", {"limit": limit}) for shard in router.healthy()))
+    jobs = [job for _, body in results if body for job in body.get("jobs", [])]
+    jobs.sort(key=lambda job: job["created"], reverse=True)
+    return {"jobs": jobs[:limit], "shards": len(results)}
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    return await proxy(await locate_job(job_id), "GET", f"/jobs/{job_id}", request)
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(request: Request, job_id: str):
+    return await proxy(await locate_job(job_id), "POST", f"/jobs/{job_id}/cancel", request)
+
+@app.get("/jobs/{job_id}/stream")
+async def job_stream(request: Request, job_id: str):
+    return await proxy(await locate_job(job_id), "GET", f"/jobs/{job_id}/stream", request)
+
+def run(host="127.0.0.1", port=8000, shards=None, cpus=None, base_port=None):
+    global router
+    base_port = base_port or int(os.environ.get("FASTER_WHISPER_SHARD_BASE_PORT", port + 1))
+    router = router_from_env(shards, cpus, base_port)
+    uvicorn.run(app, host=host, port=port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serwer transkrypcji Faster-Whisper w kilku procesach")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FASTER_WHISPER_PORT", "8000")))
+    parser.add_argument("--shards", default=None, help="liczba procesów albo auto (domyślnie FASTER_WHISPER_SHARDS)")
+    parser.add_argument("--cpus", default=None, help="rdzenie do podziału, np. 0-31 (domyślnie wszystkie dostępne)")
+    parser.add_argument("--base-port", type=int, default=None, help="port pierwszego procesu (domyślnie port+1)")
+    args = parser.parse_args(argv)
+    run(args.host, args.port, args.shards, parse_cpu_list(args.cpus) if args.cpus else None, args.base_port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import pytest
+
+from benchmark import StandInMedia, write_wav
+from download_manager import DownloadManager, normalize_url, url_key
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+# -------------------------------------------------
+# Adresy
+# -------------------------------------------------
+def test_youtube_url_forms_share_key():
+    forms = [f"https://www.youtube.com/watch?v={VIDEO_ID}",
+             f"https://youtu.be/{VIDEO_ID}?t=30",
+             f"https://m.youtube.com/watch?v={VIDEO_ID}&feature=share&si=abc"]
+    assert {url_key(url) for url in forms} == {f"youtube:{VIDEO_ID}"}
+
+def test_position_params_stripped_only_on_youtube():
+    assert normalize_url(f"https://youtu.be/{VIDEO_ID}?t=30&start=5") == f"https://youtu.be/{VIDEO_ID}"
+    assert normalize_url("https://vimeo.com/123?t=30") == "https://vimeo.com/123?t=30"
+    assert normalize_url("https://vimeo.com/123?t=30") != normalize_url("https://vimeo.com/123?t=60")
+
+def test_tracking_params_stripped_everywhere():
+    assert (normalize_url("https://Example.com/v/1/?utm_source=x&fbclid=y&id=2&gclid=z")
+            == "https://example.com/v/1?id=2")
+
+# -------------------------------------------------
+# Indeks pobrań
+# -------------------------------------------------
+def record(manager, root, url, video_id, size=10):
+    path = os.path.join(root, f"{video_id}.mp3")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    manager._record(url, {"extractor_key": "Generic", "id": video_id, "title": video_id}, "mp3", path)
+    return path
+
+def test_index_shared_between_managers(tmp_path):
+    # Dwa menedżery na jednym katalogu (jak GUI i tryb wsadowy) widzą nawzajem swoje wpisy
+    first = DownloadManager(str(tmp_path))
+    second = DownloadManager(str(tmp_path))
+    record(first, str(tmp_path), "https://example.com/a", "a")
+    record(second, str(tmp_path), "https://example.com/b", "b")
+    assert second.lookup("https://example.com/a?utm_source=x")["key"] == "generic:a"
+    assert first.lookup("https://example.com/b")["key"] == "generic:b"
+    assert first.lookup("https://example.com/b", "original") is None
+
+def test_lookup_ignores_changed_file(tmp_path):
+    manager = DownloadManager(str(tmp_path))
+    path = record(manager, str(tmp_path), "https://example.com/a", "a")
+    with open(path, "ab") as f:
+        f.write(b"more")
+    assert manager.lookup("https://example.com/a") is None
+
+# -------------------------------------------------
+# Pobieranie z lokalnego serwera (StandInMedia)
+# -------------------------------------------------
+@pytest.fixture
+def media(tmp_path):
+    pytest.importorskip("yt_dlp")
+    directory = tmp_path / "media"
+    directory.mkdir()
+    for i in range(2):
+        write_wav(str(directory / f"clip_{i}.wav"), "tone", 2.0)
+    with StandInMedia(str(directory)) as server:
+        yield server
+
+def test_repeat_url_served_from_disk(tmp_path, media):
+    manager = DownloadManager(str(tmp_path / "downloads"))
+    first = manager.download(f"{media.url}/clip_0.wav", "original")
+    requests = media.requests
+    again = manager.download(f"{media.url}/clip_0.wav?utm_source=test", "original")
+    assert media.requests == requests
+    assert again["cached"] and again["path"] == first["path"]
+    assert manager.stats["hits"] == 1
+
+def test_concurrent_requests_download_once(tmp_path, media):
+    manager = DownloadManager(str(tmp_path / "downloads"), parallel=4)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.download(f"{media.url}/clip_1.wav",
+                                                                               "original")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert media.requests == 1
+    assert manager.stats["downloads"] == 1
+    assert len({r["path"] for r in results}) == 1
@@ -0,0 +1,101 @@
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+import openai_chunked
+from benchmark import StandInOpenAI, write_wav
+from openai_chunked import plan_fixed_chunks, response_segments, retry_delay
+
+# -------------------------------------------------
+# Podział i składanie segmentów
+# -------------------------------------------------
+def test_fixed_chunks_cover_recording():
+    chunks = plan_fixed_chunks(95.0, 20, overlap_seconds=1.0)
+    assert [(core_start, core_end) for _, _, core_start, core_end in chunks] == [
+        (0.0, 20.0), (20.0, 40.0), (40.0, 60.0), (60.0, 80.0), (80.0, 95.0)]
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 95.0
+    assert all(start == core_start - 1.0 for start, _, core_start, _ in chunks[1:])
+
+def test_response_segments_offset_and_core():
+    response = {"segments": [{"start": 0.0, "end": 2.0, "text": " a"},
+                             {"start": 2.0, "end": 4.0, "text": " b"},
+                             {"start": 20.0, "end": 22.0, "text": " c"}]}
+    # Fragment od 19 s z rdzeniem 20-40 s: pierwszy segment (środek 20 s) należy do niego, trzeci nie
+    assert response_segments(response, 19.0, 20.0, 40.0) == [
+        {"start": 19.0, "end": 21.0, "text": " a"}, {"start": 21.0, "end": 23.0, "text": " b"}]
+
+def test_response_without_segments_is_one_segment():
+    assert response_segments({"text": " całość", "duration": 12.5}, 0.0) == [
+        {"start": 0.0, "end": 12.5, "text": " całość"}]
+
+# -------------------------------------------------
+# Ponawianie
+# -------------------------------------------------
+def test_retry_delay_uses_retry_after():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "3"}))
+    assert retry_delay(error, 0) == 3.0
+    error.response.headers["retry-after"] = "600"
+    assert retry_delay(error, 0) == openai_chunked.RETRY_MAX_SECONDS
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(openai_chunked.random, "uniform", lambda low, high: high)
+    error = SimpleNamespace(response=None)
+    delays = [retry_delay(error, attempt) for attempt in range(7)]
+    assert delays == [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "soon"}))
+    assert retry_delay(error, 2) == 4.0
+
+# -------------------------------------------------
+# Całe nagranie przez lokalny serwer (StandInOpenAI)
+# -------------------------------------------------
+def wav_seconds(path):
+    with wave.open(path, "rb") as w:
+        return w.getnframes() / w.getframerate()
+
+def slice_wav(audio_path, start, end, out_path):
+    # Zamiast ffmpeg: fragment WAV (serwer zastępczy rozpoznaje WAV po nagłówku)
+    with wave.open(audio_path, "rb") as src:
+        rate = src.getframerate()
+        src.setpos(int(start * rate))
+        frames = src.readframes(int((end - start) * rate))
+        params = src.getparams()
+    with wave.open(out_path, "wb") as dst:
+        dst.setparams(params)
+        dst.writeframes(frames)
+    return out_path
+
+@pytest.fixture
+def wav_chunks(monkeypatch):
+    pytest.importorskip("openai")
+    pytest.importorskip("httpx")
+    monkeypatch.setattr(openai_chunked, "extract_chunk", slice_wav)
+    monkeypatch.setattr(openai_chunked, "probe_duration", wav_seconds)
+    monkeypatch.setattr(openai_chunked.shutil, "which", lambda name: f"/usr/bin/{name}")
+
+def transcribe(audio, server, workers=4):
+    received = []
+    segments, stats = openai_chunked.transcribe_openai(audio, "sk-test", workers=workers, max_mb=0.17,
+                                                       base_url=server.url, on_segment=received.append)
+    assert received == segments
+    return segments, stats
+
+def test_chunks_merged_in_recording_order(tmp_path, wav_chunks):
+    audio = write_wav(str(tmp_path / "long.wav"), "tone", 100.0)
+    with StandInOpenAI(rtf=0.001) as server:
+        segments, stats = transcribe(audio, server)
+    assert stats["chunks"] == 5 and server.requests == 5
+    starts = [seg["start"] for seg in segments]
+    assert starts == sorted(starts) and len(set(starts)) == len(starts)
+    assert segments[0]["start"] == 0.0
+    assert segments[-1]["end"] == pytest.approx(100.0)
+
+def test_rate_limited_chunks_are_retried(tmp_path, wav_chunks):
+    audio = write_wav(str(tmp_path / "long.wav"), "tone", 100.0)
+    with StandInOpenAI(rtf=0.001) as server:
+        expected, _ = transcribe(audio, server)
+    with StandInOpenAI(rtf=0.001, fail_every=3) as server:
+        segments, stats = transcribe(audio, server)
+    assert server.failures > 0
+    assert stats["retries"] == server.failures
+    assert segments == expected
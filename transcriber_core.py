@@ -0,0 +1,585 @@
+import sys
+import os
+import atexit
+import json
+import time
+import threading
+import sqlite3
+import subprocess
+from contextlib import contextmanager
+from multiprocessing import Process
+from download_manager import shared_downloads
+from exporters import DraftPreview, format_timestamp, open_sinks
+from metrics import JobTrace
+from search_index import INDEX_ENABLED, SUBTITLE_EXTENSIONS, shared_index
+from segment_store import SEGMENTS_MEDIA_TYPE, SegmentStore
+from model_manager import decode_options, model_settings
+from openai_chunked import OPENAI_MODEL, transcribe_openai
+from transcript_cache import TranscriptCache, audio_fingerprint, cache_key, cache_params, youtube_video_id
+
+# Część wspólna GUI i trybu wsadowego - bez zależności od Qt.
+# Ciężkie biblioteki (requests, yt_dlp, docx, openai) są importowane dopiero
+# przy pierwszym użyciu, żeby start aplikacji nie czekał na nieużywane moduły.
+
+# -------------------------------------------------
+# Ścieżki
+# -------------------------------------------------
+base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+downloads_dir = os.path.join(base_path, "downloads")
+os.makedirs(downloads_dir, exist_ok=True)
+# Logi poza katalogiem programu (jak pamięci podręczne) - nie trafiają do repozytorium ani do paczki
+log_dir = os.environ.get("YT_TRANSCRIBER_LOG_DIR",
+                         os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "logs"))
+# Czasy etapów każdego zadania (JSON w wierszu)
+trace_log = os.environ.get("YT_TRANSCRIBER_TRACE_LOG", os.path.join(log_dir, "jobs.jsonl"))
+
+server_process = None
+server_lock = threading.Lock()
+FASTER_SERVER_HOST = "127.0.0.1"
+FASTER_SERVER_PORT = int(os.environ.get("FASTER_WHISPER_PORT", "8000"))
+FASTER_SERVER_URL = f"http://{FASTER_SERVER_HOST}:{FASTER_SERVER_PORT}"
+FASTER_SERVER_SERVICE = "yt-transcriber-faster-whisper"
+FASTER_SERVER_START_TIMEOUT = float(os.environ.get("FASTER_WHISPER_START_TIMEOUT", "60"))
+# YT_TRANSCRIBER_SERVER_DAEMON=1: serwer działa dalej po zamknięciu aplikacji i jest
+# używany ponownie przy kolejnym uruchomieniu (model zostaje w pamięci)
+SERVER_DAEMON = os.environ.get("YT_TRANSCRIBER_SERVER_DAEMON", "0") == "1"
+# Transkrypcja lokalna jako trwałe zadanie serwera (/jobs): przeżywa zamknięcie GUI i restart serwera.
+# YT_TRANSCRIBER_SERVER_JOBS=0 - bezpośredni strumień /transcribe/stream
+SERVER_JOBS = os.environ.get("YT_TRANSCRIBER_SERVER_JOBS", "1") != "0"
+JOB_RECONNECTS = 3
+# Model szybkiego szkicu w trybie draft-then-refine
+DRAFT_MODEL = os.environ.get("YT_TRANSCRIBER_DRAFT_MODEL", "base")
+# FASTER_WHISPER_SHARDS=N (lub auto): serwer jako front-end z N procesami przypiętymi do rdzeni (sharded_server)
+SERVER_SHARDS = os.environ.get("FASTER_WHISPER_SHARDS", "1") not in ("", "0", "1")
+
+# -------------------------------------------------
+# Serwer Faster-Whisper (zintegrowany)
+# -------------------------------------------------
+def run_faster_server():
+    # Procesy shardów to osobne skrypty - w wersji spakowanej zawsze pojedynczy serwer
+    if SERVER_SHARDS and not getattr(sys, 'frozen', False):
+        import sharded_server
+        sharded_server.run(FASTER_SERVER_HOST, FASTER_SERVER_PORT)
+        return
+    import faster_server
+    faster_server.run(FASTER_SERVER_HOST, FASTER_SERVER_PORT)
+
+def stop_faster_server():
+    # Zatrzymuje tylko serwer uruchomiony jako proces potomny - demon działa dalej
+    if server_process is not None and server_process.is_alive():
+        server_process.terminate()
+        server_process.join(5)
+
+def server_health(url=None, timeout=0.5):
+    # Odpowiedź /health, jeśli pod adresem działa nasz serwer; None w przeciwnym razie
+    import requests
+    try:
+        r = requests.get(f"{url or FASTER_SERVER_URL}/health", timeout=timeout)
+        if r.status_code != 200:
+            return None
+        health = r.json()
+    except (requests.RequestException, ValueError):
+        return None
+    return health if health.get("service") == FASTER_SERVER_SERVICE else None
+
+def wait_for_server(is_alive, url=None, timeout=None):
+    # Sprawdzanie gotowości z wykładniczo rosnącą przerwą (50 ms .. 1 s)
+    deadline = time.monotonic() + (FASTER_SERVER_START_TIMEOUT if timeout is None else timeout)
+    delay = 0.05
+    while True:
+        health = server_health(url)
+        if health is not None:
+            return health
+        if not is_alive():
+            raise RuntimeError("Serwer faster-whisper zakończył działanie podczas uruchamiania "
+                               f"(czy port {FASTER_SERVER_PORT} jest wolny?).")
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Serwer faster-whisper nie uruchomił się w czasie.")
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+def spawn_server_daemon():
+    # Niezależny proces (nie kończy się razem z aplikacją), wyjście w log_dir/faster_server.log
+    os.makedirs(log_dir, exist_ok=True)
+    script = "sharded_server.py" if SERVER_SHARDS else "faster_server.py"
+    command = [sys.executable, os.path.join(base_path, script),
+               "--host", FASTER_SERVER_HOST, "--port", str(FASTER_SERVER_PORT)]
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    with open(os.path.join(log_dir, "faster_server.log"), "ab") as log:
+        return subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **detach)
+
+def start_faster_server(daemon=None):
+    with server_lock:
+        _start_faster_server(SERVER_DAEMON if daemon is None else daemon)
+
+def _start_faster_server(daemon):
+    global server_process
+    # Działający serwer (z poprzedniego zadania, demon lub inne okno aplikacji) jest używany ponownie
+    if server_health() is not None:
+        return
+    # W wersji spakowanej (PyInstaller) nie ma osobnego skryptu serwera - zwykły proces potomny
+    if daemon and not getattr(sys, 'frozen', False):
+        process = spawn_server_daemon()
+        wait_for_server(lambda: process.poll() is None)
+        return
+    if server_process is None or not server_process.is_alive():
+        # Nie demon: serwer może uruchomić procesy równoległego dekodowania fragmentów
+        # (chunked_transcribe); zatrzymywany przez stop_faster_server, także przy wyjściu (atexit)
+        server_process = Process(target=run_faster_server)
+        server_process.start()
+        # Rejestracja po start(): wykona się przed oczekiwaniem multiprocessing na procesy potomne
+        atexit.register(stop_faster_server)
+    wait_for_server(server_process.is_alive)
+
+@contextmanager
+def faster_server_payload(audio_path, same_host=None):
+    # Serwer na tym samym hoście dostaje tylko ścieżkę i czyta plik na miejscu,
+    # zdalny - plik wysyłany strumieniowo jako multipart
+    if same_host is None:
+        same_host = FASTER_SERVER_HOST in ("127.0.0.1", "localhost", "::1")
+    if same_host:
+        yield {"path": os.path.abspath(audio_path)}, None
+    else:
+        with open(audio_path, "rb") as f:
+            yield {}, {"file": f}
+
+def post_audio(url, audio_path, data, same_host=None, **kwargs):
+    # Najpierw sama ścieżka; gdy serwer jej nie przyjmie (403 - plik poza dozwolonymi katalogami), upload
+    import requests
+    with faster_server_payload(audio_path, same_host) as (payload, files):
+        r = requests.post(url, files=files, data={**payload, **data}, **kwargs)
+    if r.status_code == 403 and payload:
+        r.close()
+        with faster_server_payload(audio_path, False) as (payload, files):
+            r = requests.post(url, files=files, data={**payload, **data}, **kwargs)
+    return r
+
+def transcribe_with_faster_whisper(audio_path, model_name="small", device="cpu", same_host=None, binary=True):
+    # binary: segmenty w formacie application/x-yt-segments (SegmentStore) zamiast listy słowników JSON
+    url = f"{FASTER_SERVER_URL}/transcribe"
+    headers = {"Accept": f"{SEGMENTS_MEDIA_TYPE}, application/json;q=0.5"} if binary else {}
+    r = post_audio(url, audio_path, {"model": model_name, "device": device}, same_host, headers=headers)
+    r.raise_for_status()
+    if r.headers.get("content-type", "").startswith(SEGMENTS_MEDIA_TYPE):
+        store, meta = SegmentStore.from_bytes(r.content)
+        return {**meta, "text": store.full_text(), "segments": store}
+    result = r.json()
+    if "error" in result:
+        raise RuntimeError(f"Błąd serwera faster-whisper: {result['error']}")
+    return result
+
+def stream_with_faster_whisper(audio_path, model_name="small", device="cpu", same_host=None, parallel=0, pcm=False,
+                               draft=None):
+    # Zwraca zdarzenia NDJSON z /transcribe/stream zaraz po ich zdekodowaniu.
+    # parallel > 0: długie nagranie dzielone w ciszy i dekodowane w tylu procesach naraz
+    # pcm: serwer dekoduje plik raz do 16 kHz float32 (pamięć podręczna PCM) zamiast przy każdym przebiegu
+    # draft: mały model (np. base) - równolegle szybki szkic (zdarzenia draft_*)
+    url = f"{FASTER_SERVER_URL}/transcribe/stream"
+    data = {"model": model_name, "device": device}
+    if parallel:
+        data["parallel"] = parallel
+    if pcm:
+        data["pcm"] = 1
+    if draft:
+        data["draft"] = draft
+    r = post_audio(url, audio_path, data, same_host, stream=True)
+    with r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event.get("type") == "error":
+                raise RuntimeError(f"Błąd serwera faster-whisper: {event.get('error')}")
+            yield event
+
+def fetch_job_segments(job_id, after=0):
+    # Zapisane segmenty zadania od numeru after jednym żądaniem, w formacie binarnym (segment_store);
+    # zwraca (SegmentStore, stan zadania)
+    import requests
+    r = requests.get(f"{FASTER_SERVER_URL}/jobs/{job_id}", params={"segments": "true", "after": after},
+                     headers={"Accept": f"{SEGMENTS_MEDIA_TYPE}, application/json;q=0.5"}, timeout=(5, 60))
+    r.raise_for_status()
+    if r.headers.get("content-type", "").startswith(SEGMENTS_MEDIA_TYPE):
+        return SegmentStore.from_bytes(r.content)
+    job = r.json()
+    return SegmentStore.from_dicts(job.pop("segments", [])), job
+
+def stream_server_job(audio_path, model_name="small", device="cpu", same_host=None, priority=0):
+    # Zgłasza zadanie (/jobs) i zwraca jego zdarzenia jak stream_with_faster_whisper.
+    # Zerwane połączenie (np. restart serwera) nie przerywa zadania: klient wznawia
+    # serwer w razie potrzeby i podłącza się ponownie od ostatniego odebranego segmentu.
+    # Segmenty, które już są na serwerze (wynik z pamięci podręcznej, zaległe po
+    # ponownym podłączeniu), przychodzą hurtem w formacie binarnym, nie linia po linii.
+    import requests
+    data = {"model": model_name, "device": device, "priority": priority}
+    r = post_audio(f"{FASTER_SERVER_URL}/jobs", audio_path, data, same_host)
+    r.raise_for_status()
+    job = r.json()
+    job_id = job["id"]
+    received = 0
+    texts = []  # pełny tekst bez jego kopii w odpowiedzi binarnej
+    reconnects = 0
+    info_seen = False
+    catch_up = job["status"] == "done"
+    while True:
+        try:
+            if catch_up:
+                store, job = fetch_job_segments(job_id, received)
+                if not info_seen:
+                    info_seen = True
+                    yield {"type": "info", "duration": job.get("duration"), "language": job.get("language"),
+                           **{k: v for k, v in (job.get("timings") or {}).items()
+                              if k in ("queue_wait_seconds", "load_seconds", "cached")}}
+                for seg in store:
+                    received += 1
+                    texts.append(seg.text.strip())
+                    yield {"type": "segment", **seg.to_dict()}
+                if job.get("status") == "done":
+                    yield {"type": "done", "text": " ".join(texts).strip(), **(job.get("timings") or {})}
+                    return
+            with requests.get(f"{FASTER_SERVER_URL}/jobs/{job_id}/stream", params={"after": received},
+                              stream=True, timeout=(5, None)) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    kind = event.get("type")
+                    if kind == "error":
+                        raise RuntimeError(f"Błąd serwera faster-whisper: {event.get('error')}")
+                    if kind == "cancelled":
+                        raise RuntimeError(f"Zadanie {job_id} zostało anulowane na serwerze")
+                    if kind == "segment":
+                        received += 1
+                        texts.append(event["text"].strip())
+                        reconnects = 0  # limit dotyczy kolejnych zerwań bez postępu, nie całego zadania
+                    elif kind == "info":
+                        # Po ponownym podłączeniu serwer wysyła info jeszcze raz
+                        if info_seen:
+                            continue
+                        info_seen = True
+                    yield event
+                    if kind == "done":
+                        return
+        except requests.RequestException as e:
+            # Zerwanie w trakcie strumienia to ChunkedEncodingError, nie tylko ConnectionError;
+            # odpowiedź 4xx (np. nieznane zadanie) nie zmieni się po ponowieniu
+            response = getattr(e, "response", None)
+            if reconnects >= JOB_RECONNECTS or (response is not None and response.status_code < 500):
+                raise
+            reconnects += 1
+            start_faster_server()
+            catch_up = True
+
+# -------------------------------------------------
+# Zadanie transkrypcji: pobranie -> transkrypcja -> eksport
+# -------------------------------------------------
+# progress(int) i status(str) to wywołania zwrotne - w GUI sygnały Qt,
+# w trybie wsadowym zwykłe funkcje.
+def _ignore(*args):
+    pass
+
+class TranscriptionJob:
+    def __init__(self, url, local_file, transcription_model, whisper_variant,
+                 translation_model, device, src_lang_code, tgt_lang_code, formats, openai_key,
+                 out_dir=None, progress=None, status=None, cache=None, parallel_chunks=0, pcm_pipeline=False,
+                 index=None, draft_model=None):
+        self.url = url
+        self.local_file = local_file
+        self.transcription_model = transcription_model
+        self.whisper_variant = whisper_variant
+        self.translation_model = translation_model
+        self.device = device
+        self.src_lang_code = src_lang_code
+        self.tgt_lang_code = tgt_lang_code
+        self.formats = formats
+        self.openai_key = openai_key
+        self.out_dir = out_dir or downloads_dir
+        self.progress = progress or _ignore
+        self.status = status or _ignore
+        self.cache = cache or TranscriptCache()
+        # Indeks wyszukiwania fraz (search_index); domyślnie wspólny dla procesu
+        self.index = index
+        self.parallel_chunks = parallel_chunks
+        # Tryb PCM: oryginalny kontener bestaudio bez konwersji do MP3, dekodowanie raz do 16 kHz
+        self.pcm_pipeline = pcm_pipeline
+        # Draft-then-refine: szybki szkic tym modelem w plikach *.draft.*, potem dokładny wynik
+        self.draft_model = draft_model if draft_model != whisper_variant else None
+        self.preview = None
+        # Czasy etapów: do logu (status) i do pliku trace_log
+        self.trace = JobTrace(url or local_file, emit=self.status, log_path=trace_log)
+
+        self.audio_path = None
+        self.audio_key = None
+        self.base_name = None
+        self.video_id = None
+        self.cached = None
+        self.text = ""
+        self.segments = SegmentStore()
+        self.outputs = []
+        self.sink = None
+
+    def run(self):
+        try:
+            self.prepare()
+            self.transcribe_source()
+            self.export()
+        except Exception as e:
+            self.finish(error=e)
+            raise
+        self.finish()
+        return f"Zakończono. Pliki zapisane w {self.out_dir}"
+
+    def finish(self, error=None):
+        if error is not None:
+            return self.trace.finish("failed", error=str(error))
+        return self.trace.finish("ok", audio_seconds=self.audio_seconds(), cached=self.cached is not None,
+                                 outputs=len(self.outputs))
+
+    def prepare(self):
+        params = self.cache_params()
+        # Adres podany razem z plikiem lokalnym (np. wznowienie z pobranego audio) zachowuje id filmu
+        self.video_id = youtube_video_id(self.url) if self.url else None
+        if self.video_id:
+            with self.trace.span("cache_lookup"):
+                self.cached = self.cache.get_video(self.video_id, params)
+
+        if self.cached is not None:
+            self.base_name = self.cached.get("title") or self.video_id
+            self.status(f"Transkrypcja filmu {self.video_id} z pamięci podręcznej - pomijam pobieranie")
+            return
+
+        if self.local_file:
+            self.audio_path = self.local_file
+            self.base_name = os.path.splitext(os.path.basename(self.audio_path))[0]
+            self.status(f"Używam lokalnego pliku: {self.audio_path}")
+        else:
+            self.status("Pobieranie audio...")
+            self.audio_path, self.base_name = self.download_audio(self.url)
+        with self.trace.span("cache_lookup", bytes=os.path.getsize(self.audio_path)):
+            self.audio_key = cache_key(audio_fingerprint(self.audio_path), params)
+            self.cached = self.cache.get(self.audio_key)
+        if self.cached is not None:
+            self.status("Transkrypcja z pamięci podręcznej")
+            if self.video_id:
+                self.cache.link_video(self.video_id, self.audio_key, params)
+
+    def transcribe_source(self):
+        if self.cached is not None:
+            self.text = self.cached.get("text", "")
+            self.segments = SegmentStore.from_dicts(self.cached.get("segments") or [])
+            return
+        # Pliki wyjściowe powstają od razu i rosną z każdym segmentem
+        self.open_exports()
+        try:
+            with self.trace.span("transcribe") as span:
+                self.text, self.segments = self.transcribe(self.audio_path)
+                span["audio_seconds"] = self.audio_seconds() or None
+        except Exception:
+            # To, co zdążyło się zdekodować, zostaje w plikach (razem z aktualnym szkicem)
+            self.close_exports()
+            if self.preview is not None:
+                self.preview.write()
+            raise
+        params = self.cache_params()
+        self.cache.put(self.audio_key, self.text, self.segments.to_dicts(), params, title=self.base_name)
+        if self.video_id:
+            self.cache.link_video(self.video_id, self.audio_key, params)
+
+    def open_exports(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.sink = open_sinks(self.formats, os.path.join(self.out_dir, self.base_name), title=self.base_name)
+
+    def write_segment(self, seg):
+        if self.sink is not None:
+            self.sink.write(seg)
+
+    def close_exports(self):
+        sink, self.sink = self.sink, None
+        return sink.close() if sink is not None else []
+
+    def export(self):
+        self.status("Zapisywanie plików...")
+        if self.sink is None:
+            # Transkrypcja z pamięci podręcznej - jeden przebieg po gotowych segmentach
+            self.open_exports()
+            if self.segments:
+                self.sink.write_all(self.segments)
+            elif self.text:
+                self.sink.write_text(self.text)
+        self.progress(90)
+        self.outputs = []
+        for fmt, path, seconds, size in self.close_exports():
+            self.trace.record(f"export_{fmt}", seconds, bytes=size)
+            self.outputs.append(path)
+        self.index_transcript()
+        self.progress(100)
+        return self.outputs
+
+    def index_transcript(self):
+        if not INDEX_ENABLED or not self.segments:
+            return
+        source = self.url or os.path.abspath(self.local_file or self.audio_path)
+        # Plik napisów zapisany przez zadanie - późniejszy "ingest" katalogu go pominie
+        subtitle = next((os.path.abspath(p) for p in self.outputs if p.endswith(SUBTITLE_EXTENSIONS)), None)
+        try:
+            with self.trace.span("index"):
+                (self.index or shared_index()).add(source, self.segments, title=self.base_name,
+                                                   video_id=self.video_id, file=subtitle,
+                                                   mtime=os.path.getmtime(subtitle) if subtitle else None)
+        except sqlite3.Error as e:
+            self.status(f"Nie udało się zaktualizować indeksu wyszukiwania: {e}")
+
+    def audio_seconds(self):
+        return self.segments[-1]["end"] if self.segments else 0.0
+
+    def cache_params(self):
+        if self.translation_model == "OpenAI (ASR+ST)":
+            return cache_params(OPENAI_MODEL, "openai", task="translate")
+        if self.transcription_model == "Faster-Whisper (lokalny)":
+            return cache_params(self.whisper_variant, self.device,
+                                model_settings(self.whisper_variant, self.device)["compute_type"],
+                                decode=decode_options(self.whisper_variant, self.device))
+        return cache_params(OPENAI_MODEL, "openai")
+
+    def transcribe(self, audio_path):
+        segments = SegmentStore()
+        text = ""
+
+        if self.translation_model == "Brak":
+            if self.transcription_model == "Faster-Whisper (lokalny)":
+                self.status("Uruchamianie serwera Faster-Whisper...")
+                start_faster_server()
+                self.status(f"Transkrypcja (Faster-Whisper, {self.whisper_variant})...")
+                text, segments = self.transcribe_local(audio_path)
+            else:
+                self.status("Transkrypcja online (OpenAI)...")
+                text, segments = self.transcribe_online(audio_path, "transcribe")
+
+        elif self.translation_model == "OpenAI (ASR+ST)":
+            self.status("Transkrypcja + tłumaczenie online (OpenAI)...")
+            text, segments = self.transcribe_online(audio_path, "translate")
+
+        return text, segments
+
+    def transcribe_online(self, audio_path, task):
+        if not self.openai_key:
+            raise RuntimeError("Brak klucza API OpenAI.")
+        duration = 0
+
+        def on_info(info):
+            nonlocal duration
+            duration = info.get("duration") or 0
+            self.progress(0)
+            if info["chunks"] > 1:
+                self.status(f"Fragmenty: {info['chunks']}, równoległe wysyłanie: {info['workers']}")
+
+        def on_segment(seg):
+            self.write_segment(seg)
+            if duration:
+                self.progress(min(80, int(seg["end"] / duration * 80)))
+            self.status(f"[{format_timestamp(seg['start'])}] {seg['text'].strip()}")
+
+        segments, stats = transcribe_openai(audio_path, self.openai_key, task, on_info=on_info, on_segment=on_segment)
+        if stats["retries"]:
+            self.status(f"Ponowione żądania do API: {stats['retries']}")
+        store = SegmentStore.from_dicts(segments)
+        return store.full_text(), store
+
+    def transcribe_local(self, audio_path):
+        duration = 0
+        text, segments = "", SegmentStore()
+        server_seconds = 0.0
+        start = time.perf_counter()
+        if self.draft_model:
+            self.preview = DraftPreview(self.formats, os.path.join(self.out_dir, self.base_name), self.base_name)
+        if SERVER_JOBS and not self.parallel_chunks and not self.draft_model:
+            events = stream_server_job(audio_path, model_name=self.whisper_variant, device=self.device)
+        else:
+            events = stream_with_faster_whisper(audio_path, model_name=self.whisper_variant, device=self.device,
+                                                parallel=self.parallel_chunks, pcm=self.pcm_pipeline,
+                                                draft=self.draft_model)
+        for event in events:
+            kind = event.get("type")
+            if kind == "info":
+                duration = event.get("duration") or 0
+                # Czasy po stronie serwera: oczekiwanie w kolejce i pobranie modelu
+                for stage in ("queue_wait", "load"):
+                    if f"{stage}_seconds" in event:
+                        seconds = event[f"{stage}_seconds"]
+                        server_seconds += seconds
+                        self.trace.record("model_load" if stage == "load" else stage, seconds)
+                self.progress(0)
+                self.status(f"Długość audio: {format_timestamp(duration)}")
+                if event.get("chunks"):
+                    self.status(f"Fragmenty: {event['chunks']}, procesy: {event.get('workers')}")
+            elif kind == "segment":
+                seg = {"start": event["start"], "end": event["end"], "text": event["text"]}
+                segments.append(seg["start"], seg["end"], seg["text"])
+                self.write_segment(seg)
+                if duration:
+                    self.progress(min(80, int(seg["end"] / duration * 80)))
+                self.status(f"[{format_timestamp(seg['start'])}] {seg['text'].strip()}")
+                if self.preview is not None:
+                    self.preview.add_refined(seg)
+            elif kind == "draft_info":
+                self.status(f"Szkic ({event.get('model')}) - pliki *.draft.* powstają na bieżąco")
+            elif kind == "draft_segment":
+                seg = {"start": event["start"], "end": event["end"], "text": event["text"]}
+                self.preview.add_draft(seg)
+                self.status(f"[szkic {format_timestamp(seg['start'])}] {seg['text'].strip()}")
+            elif kind == "draft_done":
+                self.preview.write()
+                self.trace.record("draft", event.get("decode_seconds", 0.0), model=event.get("model"))
+                self.status(f"Szkic gotowy ({event.get('decode_seconds', 0):.1f} s) - trwa dokładna transkrypcja")
+            elif kind == "draft_error":
+                self.status(f"Szkic niedostępny: {event.get('error')}")
+            elif kind == "done":
+                text = event.get("text", "")
+                if "decode_seconds" in event:
+                    server_seconds += event["decode_seconds"]
+                    self.trace.record("decode", event["decode_seconds"], audio_seconds=event.get("audio_seconds"))
+        if server_seconds:
+            # Reszta to HTTP, przesyłanie pliku i parsowanie zdarzeń
+            self.trace.record("http_overhead", max(0.0, time.perf_counter() - start - server_seconds))
+        if self.preview is not None:
+            # Dokładny wynik kompletny - szkic niepotrzebny (po błędzie zostaje jako jedyny wynik)
+            self.preview.remove()
+        return text, segments
+
+    def download_audio(self, url):
+        started = time.perf_counter()
+        postprocess_started = {}
+        def hook(d):
+            status = d.get("status")
+            if status == 'downloading':
+                percent_str = d.get('_percent_str', '0%').strip()
+                try:
+                    percent = float(percent_str.replace('%',''))
+                except:
+                    percent = 0
+                self.progress(int(percent))
+                self.status(f"Pobieranie audio... {percent_str}")
+            elif status == 'finished':
+                self.trace.record("download", time.perf_counter() - started,
+                                  bytes=d.get('total_bytes') or d.get('downloaded_bytes'))
+
+        def postprocessor_hook(d):
+            # Konwersja (np. FFmpegExtractAudio -> MP3) mierzona osobno od pobierania
+            name = d.get("postprocessor")
+            if d.get("status") == "started":
+                postprocess_started[name] = time.perf_counter()
+            elif d.get("status") == "finished" and name in postprocess_started:
+                self.trace.record(f"postprocess_{name}", time.perf_counter() - postprocess_started.pop(name))
+
+        # Bez konwersji do MP3 w trybie PCM - plik trafia do dekodera tylko raz
+        result = shared_downloads(self.out_dir).download(url, "original" if self.pcm_pipeline else "mp3",
+                                                         [hook], [postprocessor_hook])
+        if result["cached"]:
+            self.status(f"Audio z wcześniejszego pobrania: {result['path']}")
+        base_name = os.path.splitext(os.path.basename(result["path"]))[0]
+        return result["path"], base_name
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get("YT_TRANSCRIBER_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "yt_transcriber", "transcripts"))
+DEFAULT_MAX_MB = int(os.environ.get("YT_TRANSCRIBER_CACHE_MB", "512"))
+# Po przekroczeniu limitu usuwane są najstarsze wpisy aż do tej części limitu - skan katalogu raz na wiele zapisów
+EVICT_TARGET = 0.9
+SAMPLE_SIZE = 1024 * 1024
+
+YOUTUBE_ID_RE = re.compile(r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})")
+
+# -------------------------------------------------
+# Klucze
+# -------------------------------------------------
+def audio_fingerprint(path):
+    # Szybki skrót treści: rozmiar + początek, środek i koniec pliku (po 1 MB);
+    # małe pliki hashowane w całości
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 3 * SAMPLE_SIZE:
+            for chunk in iter(lambda: f.read(SAMPLE_SIZE), b""):
+                h.update(chunk)
+        else:
+            for offset in (0, size // 2 - SAMPLE_SIZE // 2, size - SAMPLE_SIZE):
+                f.seek(offset)
+                h.update(f.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+def youtube_video_id(url):
+    match = YOUTUBE_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+def cache_params(model, device="cpu", compute_type="", language=None, task="transcribe", decode=None):
+    # decode: opcje dekodowania zmieniające wynik (np. beam_size z profilu hosta) - inne ustawienia, inny klucz
+    return {"model": model, "device": device, "compute_type": compute_type,
+            "language": language or "auto", "task": task, **(decode or {})}
+
+def cache_key(source, params):
+    payload = json.dumps({"source": source, **params}, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+# -------------------------------------------------
+# Pamięć podręczna transkrypcji na dysku
+# -------------------------------------------------
+# Każdy wpis to <klucz>.json z {"text", "segments", "title", "params"}.
+# Wpis dla ID filmu YouTube jest aliasem ({"alias": klucz}) na wpis audio,
+# dzięki czemu ten sam film nie jest nawet pobierany ponownie.
+class TranscriptCache:
+    def __init__(self, cache_dir=None, max_mb=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = (DEFAULT_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Bieżący rozmiar wpisów: katalog skanowany przy pierwszym zapisie i dopiero po przekroczeniu
+        # limitu (wtedy liczony od nowa - obejmuje też zapisy innych procesów), nie przy każdym put
+        self._bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, key, touch=True):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if touch:
+                os.utime(path)  # LRU: odczyt odświeża czas modyfikacji
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+            size = f.tell()
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size - replaced
+
+    def get(self, key):
+        entry = self._read(key)
+        if entry is not None and "alias" in entry:
+            entry = self._read(entry["alias"])
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def get_audio(self, audio_path, params):
+        return self.get(cache_key(audio_fingerprint(audio_path), params))
+
+    def get_video(self, video_id, params):
+        return self.get(cache_key(f"youtube:{video_id}", params))
+
+    def put(self, key, text, segments, params, title=None):
+        self._write(key, {"text": text, "segments": segments, "title": title,
+                          "params": params, "created": time.time()})
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+        return key
+
+    def put_audio(self, audio_path, text, segments, params, title=None, video_id=None):
+        key = self.put(cache_key(audio_fingerprint(audio_path), params), text, segments, params, title)
+        if video_id:
+            self.link_video(video_id, key, params)
+        return key
+
+    def link_video(self, video_id, key, params):
+        self._write(cache_key(f"youtube:{video_id}", params), {"alias": key})
+
+    def entries(self):
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((name[:-5], st.st_size, st.st_mtime))
+        return result
+
+    def total_bytes(self):
+        with self._lock:
+            if self._bytes is not None:
+                return self._bytes
+        total = sum(size for _, size, _ in self.entries())
+        with self._lock:
+            self._bytes = total
+        return total
+
+    def evict(self, target=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            target = total  # poniżej limitu nic nie jest usuwane
+        elif target is None:
+            target = self.max_bytes * EVICT_TARGET
+        removed = 0
+        for key, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+        return removed
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        with self._lock:
+            self._bytes = None
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "dir": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# -------------------------------------------------
+# CLI: python transcript_cache.py stats|list|show KLUCZ|clear
+# -------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pamięć podręczna transkrypcji")
+    parser.add_argument("--dir", default=None, help="katalog pamięci podręcznej")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="liczba wpisów i zajęte miejsce")
+    sub.add_parser("list", help="lista wpisów od najnowszego")
+    show = sub.add_parser("show", help="pełny wpis")
+    show.add_argument("key")
+    sub.add_parser("clear", help="usuń wszystkie wpisy")
+    args = parser.parse_args(argv)
+
+    cache = TranscriptCache(args.dir)
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "list":
+        for key, size, mtime in sorted(cache.entries(), key=lambda e: e[2], reverse=True):
+            entry = cache._read(key, touch=False) or {}
+            if "alias" in entry:
+                desc = f"-> {entry['alias']}"
+            else:
+                params = entry.get("params", {})
+                desc = (f"{params.get('model')}/{params.get('device')} "
+                        f"{len(entry.get('segments') or [])} seg. {entry.get('title') or ''}")
+            print(f"{key}  {size:>9}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}  {desc}")
+    elif args.command == "show":
+        entry = cache.get(args.key)
+        if entry is None:
+            print(f"Brak wpisu: {args.key}", file=sys.stderr)
+            return 1
+        print(json.dumps(entry, ensure_ascii=False, indent=2))
+    elif args.command == "clear":
+        cache.clear()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
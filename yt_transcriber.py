@@ -1,28 +1,12 @@
 import sys
 import os
-import glob
-import subprocess
-import time
-import requests
 import traceback
-from multiprocessing import Process
 from PySide6.QtWidgets import (QApplication, QWidget, QLabel, QLineEdit,
                                QComboBox, QCheckBox, QPushButton, QProgressBar,
                                QVBoxLayout, QGridLayout, QMessageBox, QFileDialog,
                                QPlainTextEdit, QSizePolicy)
 from PySide6.QtCore import Qt, QThread, Signal
-import yt_dlp
-from docx import Document
-from openai import OpenAI
-
-# -------------------------------------------------
-# Ścieżki
-# -------------------------------------------------
-base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
-downloads_dir = os.path.join(base_path, "downloads")
-os.makedirs(downloads_dir, exist_ok=True)
-
-server_process = None
+from transcriber_core import base_path, DRAFT_MODEL, TranscriptionJob, stop_faster_server
 
 # -------------------------------------------------
 # API Keys
@@ -41,101 +25,6 @@ def save_api_key(file_name, key):
 
 openai_api_key = load_api_key("openai_api_key.txt")
 
-# -------------------------------------------------
-# Serwer Faster-Whisper (zintegrowany)
-# -------------------------------------------------
-def run_faster_server():
-    import tempfile
-    from fastapi import FastAPI, UploadFile, Form
-    import uvicorn
-    from faster_whisper import WhisperModel
-
-    app = FastAPI()
-    loaded_models = {}
-
-    @app.post("/transcribe")
-    async def transcribe(file: UploadFile, model: str = Form("small"), device: str = Form("cpu")):
-        if (model, device) not in loaded_models:
-            loaded_models[(model, device)] = WhisperModel(model, device=device, compute_type="int8")
-        whisper_model = loaded_models[(model, device)]
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        segments, info = whisper_model.transcribe(tmp_path)
-        text, result_segments = "", []
-        for seg in segments:
-            seg_dict = {"start": seg.start, "end": seg.end, "text": seg.text}
-            result_segments.append(seg_dict)
-            text += seg.text.strip() + " "
-
-        os.remove(tmp_path)
-        return {"text": text.strip(), "segments": result_segments}
-
-    uvicorn.run(app, host="127.0.0.1", port=8000)
-
-def start_faster_server():
-    global server_process
-    if server_process is None or not server_process.is_alive():
-        server_process = Process(target=run_faster_server, daemon=True)
-        server_process.start()
-        for _ in range(20):
-            try:
-                r = requests.get("http://127.0.0.1:8000/docs")
-                if r.status_code == 200:
-                    return
-            except:
-                time.sleep(0.5)
-        raise RuntimeError("Serwer faster-whisper nie uruchomił się w czasie.")
-
-def transcribe_with_faster_whisper(audio_path, model_name="small", device="cpu"):
-    url = "http://127.0.0.1:8000/transcribe"
-    with open(audio_path, "rb") as f:
-        r = requests.post(url, files={"file": f}, data={"model": model_name, "device": device})
-    r.raise_for_status()
-    return r.json()
-
-# -------------------------------------------------
-# Formatowanie i zapisywanie plików
-# -------------------------------------------------
-def format_timestamp(seconds):
-    h = int(seconds // 3600)
-    m = int((seconds % 3600) // 60)
-    s = int(seconds % 60)
-    ms = int((seconds * 1000) % 1000)
-    return f"{h:02}:{m:02}:{s:02},{ms:03}"
-
-def save_txt(text, path):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(text)
-
-def save_docx(text, path):
-    doc = Document()
-    doc.add_paragraph(text)
-    doc.save(path)
-
-def save_html(text, path):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write("<!DOCTYPE html><html><head><meta charset='utf-8'></head><body>\n")
-        for line in text.splitlines():
-            f.write(f"<p>{line}</p>\n")
-        f.write("</body></html>")
-
-def save_srt(segments, path):
-    if not segments:
-        return
-    with open(path, "w", encoding="utf-8") as f:
-        for i, seg in enumerate(segments, start=1):
-            start = format_timestamp(seg.get("start", 0))
-            end = format_timestamp(seg.get("end", seg.get("start", 0)))
-            text = seg.get("text", "").strip()
-            if not text:
-                continue
-            f.write(f"{i}\n")
-            f.write(f"{start} --> {end}\n")
-            f.write(f"{text}\n\n")
-
 # -------------------------------------------------
 # Wątek transkrypcji
 # -------------------------------------------------
@@ -145,126 +34,21 @@ class TranscriptionThread(QThread):
     finished_signal = Signal(str)
 
     def __init__(self, url, local_file, transcription_model, whisper_variant,
-                 translation_model, device, src_lang_code, tgt_lang_code, formats, openai_key):
+                 translation_model, device, src_lang_code, tgt_lang_code, formats, openai_key, parallel_chunks=0,
+                 pcm_pipeline=False, draft_model=None):
         super().__init__()
-        self.url = url
-        self.local_file = local_file
-        self.transcription_model = transcription_model
-        self.whisper_variant = whisper_variant
-        self.translation_model = translation_model
-        self.device = device
-        self.src_lang_code = src_lang_code
-        self.tgt_lang_code = tgt_lang_code
-        self.formats = formats
-        self.openai_key = openai_key
+        self.job = TranscriptionJob(url, local_file, transcription_model, whisper_variant,
+                                    translation_model, device, src_lang_code, tgt_lang_code, formats, openai_key,
+                                    progress=self.progress_signal.emit, status=self.status_signal.emit,
+                                    parallel_chunks=parallel_chunks, pcm_pipeline=pcm_pipeline,
+                                    draft_model=draft_model)
 
     def run(self):
         try:
-            if self.local_file:
-                audio_path = self.local_file
-                base_name = os.path.splitext(os.path.basename(audio_path))[0]
-                self.status_signal.emit(f"Używam lokalnego pliku: {audio_path}")
-            else:
-                self.status_signal.emit("Pobieranie audio...")
-                audio_path, base_name = self.download_audio(self.url)
-
-            segments = []
-            text = ""
-
-            client = None
-            if self.openai_key:
-                client = OpenAI(api_key=self.openai_key)
-
-            if self.translation_model == "Brak":
-                if self.transcription_model == "Faster-Whisper (lokalny)":
-                    self.status_signal.emit("Uruchamianie serwera Faster-Whisper...")
-                    start_faster_server()
-                    self.status_signal.emit(f"Transkrypcja (Faster-Whisper, {self.whisper_variant})...")
-                    result = transcribe_with_faster_whisper(audio_path, model_name=self.whisper_variant, device=self.device)
-                    segments = result.get("segments", [])
-                    text = result.get("text", "")
-                else:
-                    with open(audio_path, "rb") as f:
-                        self.status_signal.emit("Transkrypcja online (OpenAI)...")
-                        transcript = client.audio.transcriptions.create(
-                            model="gpt-4o-mini-transcribe",
-                            file=f
-                        )
-                        text = transcript.text
-
-            elif self.translation_model == "OpenAI (ASR+ST)":
-                self.status_signal.emit("Transkrypcja + tłumaczenie online (OpenAI)...")
-                with open(audio_path, "rb") as f:
-                    translation = client.audio.translations.create(
-                        model="gpt-4o-mini-transcribe",
-                        file=f
-                    )
-                    text = translation.text
-
-            self.status_signal.emit("Zapisywanie plików...")
-            for i, fmt in enumerate(self.formats, start=1):
-                percent = int(80 + (i / len(self.formats)) * 20)
-                self.progress_signal.emit(percent)
-                path = os.path.join(downloads_dir, f"{base_name}.{fmt}")
-                if fmt == "txt":
-                    save_txt(text, path)
-                elif fmt == "docx":
-                    save_docx(text, path)
-                elif fmt == "html":
-                    save_html(text, path)
-                elif fmt == "srt" and segments:
-                    save_srt(segments, path)
-
-            self.progress_signal.emit(100)
-            self.finished_signal.emit(f"Zakończono. Pliki zapisane w {downloads_dir}")
-
+            self.finished_signal.emit(self.job.run())
         except Exception as e:
             self.finished_signal.emit(f"Błąd: {str(e)}\n{traceback.format_exc()}")
 
-    def download_audio(self, url):
-        video_info = {}
-        def hook(d):
-            status = d.get("status")
-            if status == 'downloading':
-                percent_str = d.get('_percent_str', '0%').strip()
-                try:
-                    percent = float(percent_str.replace('%',''))
-                except:
-                    percent = 0
-                self.progress_signal.emit(int(percent))
-                self.status_signal.emit(f"Pobieranie audio... {percent_str}")
-            elif status == 'finished':
-                video_info['filename'] = d.get('filename')
-                video_info['title'] = d.get('info_dict', {}).get('title', video_info.get('title'))
-
-        output_template = os.path.join(downloads_dir, "%(title)s")
-        ydl_opts = {
-            "format": "bestaudio/best",
-            "outtmpl": output_template,
-            "progress_hooks": [hook],
-            "postprocessors": [dict(key="FFmpegExtractAudio", preferredcodec="mp3", preferredquality="192")],
-            "quiet": True,
-            "no_warnings": True,
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-
-        candidate = None
-        fname = video_info.get('filename')
-        if fname and os.path.exists(fname):
-            candidate = fname
-        else:
-            mp3s = glob.glob(os.path.join(downloads_dir, "*.mp3"))
-            if mp3s:
-                candidate = sorted(mp3s, key=os.path.getmtime, reverse=True)[0]
-
-        if not candidate or not os.path.exists(candidate):
-            raise FileNotFoundError("Nie udało się pobrać pliku audio.")
-
-        base_name = os.path.splitext(os.path.basename(candidate))[0]
-        return candidate, base_name
-
 # -------------------------------------------------
 # GUI
 # -------------------------------------------------
@@ -330,6 +114,16 @@ class MainWindow(QWidget):
         self.docx_cb = QCheckBox("DOCX"); self.docx_cb.setChecked(True); grid.addWidget(self.docx_cb, 10, 1)
         self.srt_cb = QCheckBox("SRT"); self.srt_cb.setChecked(True); grid.addWidget(self.srt_cb, 11, 1)
         self.html_cb = QCheckBox("HTML"); grid.addWidget(self.html_cb, 12, 1)
+        self.vtt_cb = QCheckBox("VTT"); grid.addWidget(self.vtt_cb, 13, 1)
+        self.json_cb = QCheckBox("JSON"); grid.addWidget(self.json_cb, 14, 1)
+
+        grid.addWidget(QLabel("Długie nagrania:"), 15, 0)
+        self.parallel_cb = QCheckBox("Dekoduj fragmenty równolegle (CPU)")
+        grid.addWidget(self.parallel_cb, 15, 1)
+        self.pcm_cb = QCheckBox("Bez konwersji do MP3 (PCM 16 kHz)")
+        grid.addWidget(self.pcm_cb, 16, 1)
+        self.draft_cb = QCheckBox(f"Najpierw szybki szkic ({DRAFT_MODEL}), potem dokładna transkrypcja")
+        grid.addWidget(self.draft_cb, 17, 1)
 
         self.start_btn = QPushButton("Start")
         self.start_btn.setFixedWidth(120)
@@ -369,6 +163,8 @@ class MainWindow(QWidget):
         if self.docx_cb.isChecked(): formats.append("docx")
         if self.srt_cb.isChecked(): formats.append("srt")
         if self.html_cb.isChecked(): formats.append("html")
+        if self.vtt_cb.isChecked(): formats.append("vtt")
+        if self.json_cb.isChecked(): formats.append("json")
         if not formats:
             QMessageBox.critical(self, "Błąd", "Wybierz przynajmniej jeden format pliku")
             return
@@ -410,7 +206,10 @@ class MainWindow(QWidget):
             src_lang_code=source_lang_code,
             tgt_lang_code=target_lang_code,
             formats=formats,
-            openai_key=openai_key
+            openai_key=openai_key,
+            parallel_chunks=max(1, (os.cpu_count() or 1) // 2) if self.parallel_cb.isChecked() else 0,
+            pcm_pipeline=self.pcm_cb.isChecked(),
+            draft_model=DRAFT_MODEL if self.draft_cb.isChecked() else None
         )
         self.thread.progress_signal.connect(self.progress_bar.setValue)
         self.thread.status_signal.connect(self.append_log)
@@ -475,7 +274,6 @@ if __name__ == "__main__":
     window.show()
     exit_code = app.exec()
 
-    if server_process is not None and server_process.is_alive():
-        server_process.terminate()
+    stop_faster_server()
 
     sys.exit(exit_code)
\ No newline at end of file